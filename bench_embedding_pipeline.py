@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark: embedding throughput in rag_embedding.
+
+Starts a local fake OpenAI embeddings endpoint (fixed latency per request) and
+compares the sequential batched path (embed_and_store) with the concurrent
+pipeline (run_embedding_pipeline). Chroma writes go to a no-op sink so only
+the embedding stage is measured.
+
+Usage:
+    python bench_embedding_pipeline.py --chunks 5000 --batch 64 --latency 0.2 --concurrency 8
+"""
+
+import argparse
+import array
+import asyncio
+import base64
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("CHROMA_DB_PATH", tempfile.mkdtemp(prefix="chroma_bench_"))
+os.environ.setdefault("EMBED_CACHE_PATH", "")
+
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from openai import OpenAI
+
+import rag_embedding
+
+
+def make_fake_app(latency, dim):
+    app = FastAPI()
+    vectors = {
+        "float": json.dumps([0.0] * dim),
+        # the OpenAI client asks for base64-encoded float32 unless encoding_format is given
+        "base64": json.dumps(base64.b64encode(array.array("f", [0.0] * dim).tobytes()).decode()),
+    }
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        vector = vectors[body.get("encoding_format") or "float"]
+        await asyncio.sleep(latency)
+        # pre-serialised response so the fake server itself is not the bottleneck
+        data = ",".join(f'{{"object":"embedding","index":{i},"embedding":{vector}}}' for i in range(len(inputs)))
+        body = f'{{"object":"list","model":"{body["model"]}","data":[{data}],"usage":{{"prompt_tokens":0,"total_tokens":0}}}}'
+        return Response(body, media_type="application/json")
+
+    return app
+
+
+def start_server(app):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}/v1"
+
+
+class NullCollection:
+    def upsert(self, **kwargs):
+        pass
+
+
+def make_records(n):
+    return (
+        {"id": f"doc{i // 10}_{i % 10}", "document": f"청크 본문 {i} " * 20, "metadata": {"source_path": f"doc{i // 10}.md"}}
+        for i in range(n)
+    )
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Benchmark the embedding pipeline against a fake endpoint")
+    ap.add_argument("--chunks", type=int, default=5000)
+    ap.add_argument("--batch", type=int, default=64, help="Chunks per embedding request")
+    ap.add_argument("--latency", type=float, default=0.2, help="Fake endpoint latency per request (seconds)")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--dim", type=int, default=1536)
+    args = ap.parse_args()
+
+    server, base_url = start_server(make_fake_app(args.latency, args.dim))
+    os.environ["OPENAI_BASE_URL"] = base_url
+    rag_embedding.client = OpenAI(api_key="bench", base_url=base_url)
+
+    t0 = time.perf_counter()
+    stored, _ = rag_embedding.embed_and_store(
+        make_records(args.chunks), max_items=args.batch, writer=rag_embedding.ChromaWriter(NullCollection())
+    )
+    seq = time.perf_counter() - t0
+    print(f"sequential : {stored} chunks in {seq:.2f}s ({stored / seq:.0f} chunks/s)")
+
+    stats = asyncio.run(
+        rag_embedding.run_embedding_pipeline(
+            make_records(args.chunks),
+            concurrency=args.concurrency,
+            rpm=0,
+            tpm=0,
+            max_items=args.batch,
+            writer=rag_embedding.ChromaWriter(NullCollection()),
+        )
+    )
+    print(
+        f"pipeline   : {stats['stored']} chunks in {stats['seconds']:.2f}s "
+        f"({stats['chunks_per_sec']:.0f} chunks/s, concurrency={args.concurrency})"
+    )
+    print(f"speedup    : {seq / stats['seconds']:.1f}x")
+    server.should_exit = True
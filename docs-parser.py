@@ -1,129 +1,687 @@
 from docx import Document
+from concurrent.futures import ProcessPoolExecutor
+import collections
+import hashlib
+import json
 import os
 import argparse
 import logging
 import pathlib
+import posixpath
+import shutil
 import sys
+import zipfile
+
+MANIFEST_NAME = ".docs_manifest.json"
+MANIFEST_VERSION = 1
+
+ENGINES = ("docx", "stream")
+# engine="auto" switches to the streaming engine for files at least this large
+STREAM_ENGINE_THRESHOLD = 50 * 1024 * 1024
+
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+R_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+A_NS = "http://schemas.openxmlformats.org/drawingml/2006/main"
+V_NS = "urn:schemas-microsoft-com:vml"
+
+
+def _w(tag):
+    return f"{{{W_NS}}}{tag}"
+
+
+W_P = _w("p")
+W_R = _w("r")
+W_T = _w("t")
+W_BR = _w("br")
+W_TYPE = _w("type")
+W_TBL = _w("tbl")
+W_HYPERLINK = _w("hyperlink")
+W_VAL = _w("val")
+R_ID = f"{{{R_NS}}}id"
+R_EMBED = f"{{{R_NS}}}embed"
+A_BLIP = f"{{{A_NS}}}blip"
+V_IMAGEDATA = f"{{{V_NS}}}imagedata"
+
+# run inner-content → text, mirroring python-docx's Run.text
+_RUN_TEXT = {_w("tab"): "\t", _w("ptab"): "\t", _w("cr"): "\n", _w("noBreakHyphen"): "-"}
+
+
+def _run_text(r):
+    parts = []
+    for child in r:
+        tag = child.tag
+        if tag == W_T:
+            parts.append(child.text or "")
+        elif tag == W_BR:
+            # only text-wrapping breaks (the default type) become newlines
+            if child.get(W_TYPE, "textWrapping") == "textWrapping":
+                parts.append("\n")
+        elif tag in _RUN_TEXT:
+            parts.append(_RUN_TEXT[tag])
+    return "".join(parts)
+
+
+def _paragraph_text(p):
+    """Text of a w:p element including hyperlink text (same as python-docx Paragraph.text)."""
+    parts = []
+    for child in p:
+        if child.tag == W_R:
+            parts.append(_run_text(child))
+        elif child.tag == W_HYPERLINK:
+            parts.extend(_run_text(r) for r in child if r.tag == W_R)
+    return "".join(parts)
+
+
+def _paragraph_style_names(styles_el):
+    """Map paragraph styleId → UI style name from a w:styles element.
+
+    Returns (names, default_name) where default_name is used for paragraphs
+    without (or with an unknown) w:pStyle, as python-docx does.
+    """
+    from docx.styles import BabelFish
+
+    names = {}
+    default_name = ""
+    if styles_el is None:
+        return names, default_name
+    for style in styles_el.iter(_w("style")):
+        if style.get(_w("type")) != "paragraph":
+            continue
+        name_el = style.find(_w("name"))
+        name = BabelFish.internal2ui(name_el.get(W_VAL)) if name_el is not None else ""
+        names[style.get(_w("styleId"))] = name
+        if style.get(_w("default")) in ("1", "true", "on"):
+            default_name = name
+    return names, default_name
+
+
+def _paragraph_style_name(p, style_names):
+    names, default_name = style_names
+    ppr = p.find(_w("pPr"))
+    pstyle = ppr.find(_w("pStyle")) if ppr is not None else None
+    if pstyle is None:
+        return default_name
+    return names.get(pstyle.get(W_VAL), default_name) or ""
+
+
+def _image_ext(partname, content_type):
+    """Pick a file extension from the part name, falling back to the content type."""
+    ext = pathlib.Path(partname).suffix if partname else ""
+    if not ext and content_type and "/" in content_type:
+        subtype = content_type.split("/")[1]
+        # handle image/svg+xml
+        subtype = subtype.split("+")[0]
+        ext = "." + ("jpg" if subtype == "jpeg" else subtype)
+    return ext or ".bin"
+
+
+class _MarkdownSink:
+    """Write Markdown blocks to md_path as they are produced.
+
+    Blocks are separated by a blank line, so the file matches what
+    "\n\n".join(blocks) would have produced without holding the document
+    in memory. Images are written once per part and referenced again on reuse.
+
+    With image_store set, images go to a content-addressed store shared by
+    all documents instead of image_dir (see _store_image).
+    """
+
+    def __init__(self, fh, md_path, image_dir, image_store=None):
+        self._fh = fh
+        self._first = True
+        self.md_dir = os.path.dirname(md_path)
+        self.image_dir = image_dir
+        self.image_store = image_store
+        self.image_count = 1
+        self.written_images = {}
+        self.image_paths = []
+
+    def block(self, text):
+        if not self._first:
+            self._fh.write("\n\n")
+        self._fh.write(text)
+        self._first = False
+
+    def block_lines(self, lines):
+        """Write one block made of several lines without joining them in memory."""
+        for i, line in enumerate(lines):
+            if i == 0:
+                self.block(line)
+            else:
+                self._fh.write("\n")
+                self._fh.write(line)
+
+    def image(self, partname, content_type, load_blob):
+        """Save an image part (if not saved yet) and emit its Markdown reference."""
+        if partname in self.written_images:
+            self.block(self.written_images[partname])
+            return
+        ext = _image_ext(partname, content_type)
+        base = f"image_{self.image_count}"
+        if self.image_store:
+            image_filename = _store_image(self.image_store, load_blob(), ext)
+        else:
+            fname = _unique_filename(self.image_dir, base, ext)
+            image_filename = os.path.join(self.image_dir, fname)
+            with open(image_filename, "wb") as f:
+                f.write(load_blob())
+        # add relative path to markdown (make path relative to md file)
+        relpath = os.path.relpath(image_filename, self.md_dir)
+        ref = f"![{base}]({relpath})"
+        self.written_images[partname] = ref
+        self.image_paths.append(image_filename)
+        self.image_count += 1
+        self.block(ref)
+
+
+def _unique_filename(dirpath, base, ext):
+    # ensure directory exists
+    os.makedirs(dirpath, exist_ok=True)
+    candidate = f"{base}{ext}"
+    i = 1
+    while os.path.exists(os.path.join(dirpath, candidate)):
+        candidate = f"{base}_{i}{ext}"
+        i += 1
+    return candidate
+
+
+def _store_image(store_dir, blob, ext):
+    """Write blob into a content-addressed store and return its path.
+
+    Files are named by sha256 (fanned out by the first two hex digits), so a
+    blob already stored by an earlier document — or by another worker — is
+    simply linked to. New files are written to a temp name and renamed into
+    place so concurrent writers never expose a partial image.
+    """
+    digest = hashlib.sha256(blob).hexdigest()
+    subdir = os.path.join(store_dir, digest[:2])
+    path = os.path.join(subdir, digest + ext.lower())
+    if not os.path.exists(path):
+        os.makedirs(subdir, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(blob)
+        os.replace(tmp, path)
+    return path
+
+
+def _render_paragraph(p, sink, style_names, hyperlink_target, image_part):
+    """Emit one w:p: heading/text line, its hyperlinks, then its inline images in order.
+
+    hyperlink_target(rid) returns a URL or None; image_part(rid) returns
+    (partname, content_type, load_blob) or None.
+    """
+    text = _paragraph_text(p).strip()
+    if text:
+        # Heading → Markdown 제목 변환
+        style_name = _paragraph_style_name(p, style_names)
+        if style_name.startswith("Heading"):
+            try:
+                level = int(style_name.replace("Heading ", ""))
+            except ValueError:
+                level = 1
+            sink.block("#" * level + " " + text)
+        else:
+            sink.block(text)
+
+        # 하이퍼링크 처리 (간단히 처리)
+        for link in p.iter(W_HYPERLINK):
+            rid = link.get(R_ID)
+            url = hyperlink_target(rid) if rid else None
+            if not url:
+                continue
+            link_text = "".join(_run_text(r) for r in link if r.tag == W_R).strip() or url
+            sink.block(f"[{link_text}]({url})")
+
+    # 인라인 이미지 (DrawingML blip / legacy VML imagedata)
+    for el in p.iter(A_BLIP, V_IMAGEDATA):
+        rid = el.get(R_EMBED) if el.tag == A_BLIP else el.get(R_ID)
+        if not rid:
+            continue
+        try:
+            part = image_part(rid)
+            if part:
+                sink.image(*part)
+        except Exception:
+            # ignore image extraction errors for robustness
+            continue
+
+
+W_TR = _w("tr")
+W_TC = _w("tc")
+W_TRPR = _w("trPr")
+W_TCPR = _w("tcPr")
+W_GRIDSPAN = _w("gridSpan")
+W_VMERGE = _w("vMerge")
+
+
+def _tc_props(tc):
+    """Return (grid_span, is_vmerge_continuation) for a w:tc element."""
+    tcpr = tc.find(W_TCPR)
+    if tcpr is None:
+        return 1, False
+    span_el = tcpr.find(W_GRIDSPAN)
+    try:
+        span = max(int(span_el.get(W_VAL)), 1) if span_el is not None else 1
+    except (TypeError, ValueError):
+        span = 1
+    vmerge = tcpr.find(W_VMERGE)
+    # <w:vMerge/> without a value means "continue"
+    return span, vmerge is not None and vmerge.get(W_VAL, "continue") == "continue"
+
+
+def _table_grid_cols(tbl):
+    grid = tbl.find(_w("tblGrid"))
+    return len(grid.findall(_w("gridCol"))) if grid is not None else 0
+
+
+def _iter_table_rows(tbl):
+    """Yield each w:tr of a w:tbl as a list of cell strings laid out on the table grid.
+
+    One pass over w:tr/w:tc: a gridSpan cell fills every grid column it spans
+    and a vMerge continuation repeats the value of the cell above it, which is
+    what python-docx's row.cells reports, without its per-row grid recomputation.
+    w:gridBefore/w:gridAfter columns are filled with empty strings.
+    """
+    above = []
+    for tr in tbl.iterchildren(W_TR):
+        cells = []
+        trpr = tr.find(W_TRPR)
+        if trpr is not None:
+            before = trpr.find(_w("gridBefore"))
+            try:
+                skipped = max(int(before.get(W_VAL)), 0) if before is not None else 0
+            except (TypeError, ValueError):
+                skipped = 0
+            cells.extend([""] * skipped)
+        for tc in tr.iterchildren(W_TC):
+            span, continued = _tc_props(tc)
+            col = len(cells)
+            if continued:
+                text = above[col] if col < len(above) else ""
+            else:
+                text = "\n".join(_paragraph_text(p) for p in tc.iterchildren(W_P)).strip()
+            cells.extend([text] * span)
+        above = cells
+        yield cells
+
+
+def _md_cell(text):
+    # a Markdown table row must stay on one line and pipes would split the cell
+    return text.replace("|", "\\|").replace("\r\n", "\n").replace("\n", "<br>")
+
+
+def _render_table(tbl, sink, t_idx):
+    """Emit a w:tbl as a Markdown table whose first row is the header.
+
+    Every row is padded to the widest row (or the table grid, if wider) so a
+    later row with more cells than the header still yields a valid table.
+    """
+    rows = list(_iter_table_rows(tbl))
+    if not rows:
+        return
+    ncols = max(_table_grid_cols(tbl), max(len(cells) for cells in rows))
+
+    def lines():
+        for i, cells in enumerate(rows):
+            cells = cells + [""] * (ncols - len(cells))
+            yield "| " + " | ".join(_md_cell(c) for c in cells) + " |"
+            if i == 0:
+                yield "|" + " --- |" * ncols
+
+    sink.block(f"### Table {t_idx}")
+    sink.block_lines(lines())
+
+
+def _docx_to_markdown_python_docx(docx_path, md_path, image_dir, image_store=None):
+    """python-docx engine: loads the whole document tree, then walks w:body once."""
+    doc = Document(docx_path)
+    rels = doc.part.rels
+    style_names = _paragraph_style_names(doc.styles.element)
+
+    def hyperlink_target(rid):
+        rel = rels.get(rid)
+        return rel.target_ref if rel is not None and rel.is_external else None
+
+    def image_part(rid):
+        rel = rels.get(rid)
+        if rel is None or rel.is_external or "image" not in rel.reltype:
+            return None
+        part = rel.target_part
+        return str(part.partname), getattr(part, "content_type", ""), lambda: part.blob
+
+    with open(md_path, "w", encoding="utf-8") as fh:
+        sink = _MarkdownSink(fh, md_path, image_dir, image_store)
+        t_idx = 0
+        for child in doc.element.body.iterchildren():
+            if child.tag == W_P:
+                _render_paragraph(child, sink, style_names, hyperlink_target, image_part)
+            elif child.tag == W_TBL:
+                # 테이블 처리
+                t_idx += 1
+                _render_table(child, sink, t_idx)
+
+        # images related to the document but never referenced from the body
+        for rel in rels.values():
+            try:
+                if "image" in rel.reltype and not rel.is_external:
+                    part = rel.target_part
+                    if str(part.partname) not in sink.written_images:
+                        sink.image(str(part.partname), getattr(part, "content_type", ""), lambda: part.blob)
+            except Exception:
+                continue
+    return sink.image_paths
+
+
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+CT_NS = "http://schemas.openxmlformats.org/package/2006/content-types"
+RT_OFFICE_DOCUMENT = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+
 
+def _read_rels(zf, rels_name, base_dir):
+    """Parse a .rels part into {rId: (reltype, target, is_external)}.
 
-def docx_to_markdown_full(docx_path, md_path, image_dir="images"):
+    Internal targets are resolved to zip member names relative to base_dir.
+    """
+    from lxml import etree
+
+    rels = {}
+    if rels_name not in zf.namelist():
+        return rels
+    with zf.open(rels_name) as fh:
+        root = etree.parse(fh).getroot()
+    for rel in root.iter(f"{{{PKG_REL_NS}}}Relationship"):
+        target = rel.get("Target", "")
+        is_external = rel.get("TargetMode") == "External"
+        if not is_external:
+            if target.startswith("/"):
+                target = target.lstrip("/")
+            else:
+                target = posixpath.normpath(posixpath.join(base_dir, target))
+        rels[rel.get("Id")] = (rel.get("Type", ""), target, is_external)
+    return rels
+
+
+def _read_content_types(zf):
+    """Return a function mapping a zip member name to its content type."""
+    from lxml import etree
+
+    defaults, overrides = {}, {}
+    with zf.open("[Content_Types].xml") as fh:
+        root = etree.parse(fh).getroot()
+    for el in root.iter(f"{{{CT_NS}}}Default"):
+        defaults[el.get("Extension", "").lower()] = el.get("ContentType", "")
+    for el in root.iter(f"{{{CT_NS}}}Override"):
+        overrides[el.get("PartName", "").lstrip("/")] = el.get("ContentType", "")
+
+    def content_type(name):
+        if name in overrides:
+            return overrides[name]
+        return defaults.get(posixpath.splitext(name)[1].lstrip(".").lower(), "")
+
+    return content_type
+
+
+def _docx_to_markdown_stream(docx_path, md_path, image_dir, image_store=None):
+    """Streaming engine: reads word/document.xml with lxml iterparse.
+
+    Each w:body child is rendered as soon as its end tag is parsed and then
+    cleared, so memory is bounded by the largest single paragraph/table rather
+    than by the document. Produces the same Markdown as the python-docx engine.
+    """
+    from lxml import etree
+
+    with zipfile.ZipFile(docx_path) as zf:
+        pkg_rels = _read_rels(zf, "_rels/.rels", "")
+        doc_name = next(
+            (target for reltype, target, _ in pkg_rels.values() if reltype == RT_OFFICE_DOCUMENT),
+            "word/document.xml",
+        )
+        doc_dir, doc_base = posixpath.split(doc_name)
+        rels = _read_rels(zf, posixpath.join(doc_dir, "_rels", doc_base + ".rels"), doc_dir)
+        content_type = _read_content_types(zf)
+
+        styles_el = None
+        for reltype, target, is_external in rels.values():
+            if reltype.endswith("/styles") and not is_external and target in zf.namelist():
+                with zf.open(target) as fh:
+                    styles_el = etree.parse(fh).getroot()
+                break
+        style_names = _paragraph_style_names(styles_el)
+
+        def hyperlink_target(rid):
+            rel = rels.get(rid)
+            return rel[1] if rel is not None and rel[2] else None
+
+        def image_part(rid):
+            rel = rels.get(rid)
+            if rel is None or rel[2] or "image" not in rel[0]:
+                return None
+            name = rel[1]
+            return "/" + name, content_type(name), lambda: zf.read(name)
+
+        with open(md_path, "w", encoding="utf-8") as fh, zf.open(doc_name) as xml:
+            sink = _MarkdownSink(fh, md_path, image_dir, image_store)
+            t_idx = 0
+            depth = 0
+            for event, el in etree.iterparse(xml, events=("start", "end")):
+                if event == "start":
+                    depth += 1
+                    continue
+                depth -= 1
+                # w:document (depth 0) > w:body (1) > block-level children (2)
+                if depth != 2:
+                    continue
+                if el.tag == W_P:
+                    _render_paragraph(el, sink, style_names, hyperlink_target, image_part)
+                elif el.tag == W_TBL:
+                    # 테이블 처리
+                    t_idx += 1
+                    _render_table(el, sink, t_idx)
+                # drop the rendered element and any already-processed siblings
+                el.clear()
+                parent = el.getparent()
+                while el.getprevious() is not None:
+                    del parent[0]
+
+            # images related to the document but never referenced from the body
+            for reltype, target, is_external in rels.values():
+                try:
+                    if "image" in reltype and not is_external and "/" + target not in sink.written_images:
+                        sink.image("/" + target, content_type(target), lambda: zf.read(target))
+                except Exception:
+                    continue
+    return sink.image_paths
+
+
+def docx_to_markdown_full(docx_path, md_path, image_dir="images", engine="auto", image_store=None):
     """Convert a single .docx file to Markdown.
 
     - docx_path: path to source .docx
     - md_path: path to write resulting markdown (.md)
     - image_dir: path to store any images (will be created)
+    - engine: "docx" (python-docx), "stream" (lxml iterparse, bounded memory)
+      or "auto" (stream for files of STREAM_ENGINE_THRESHOLD bytes or more)
+    - image_store: optional directory of a content-addressed image store shared
+      across documents; when given, image_dir is not used
+
+    Returns the paths of the image files the Markdown links to.
+
+    The w:body children are walked once in document order, so paragraphs,
+    tables and inline images appear where they are in the document, and
+    Markdown is written to md_path as it is produced.
     """
-    doc = Document(docx_path)
-    md_lines = []
+    if engine == "auto":
+        engine = "stream" if os.path.getsize(docx_path) >= STREAM_ENGINE_THRESHOLD else "docx"
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine: {engine!r} (expected one of {', '.join(ENGINES)} or 'auto')")
 
     # 이미지 저장 폴더 생성
-    os.makedirs(image_dir, exist_ok=True)
-    image_count = 1
+    os.makedirs(image_store or image_dir, exist_ok=True)
+
+    if engine == "stream":
+        return _docx_to_markdown_stream(docx_path, md_path, image_dir, image_store)
+    return _docx_to_markdown_python_docx(docx_path, md_path, image_dir, image_store)
+
 
-    # 문단 처리 (제목 포함)
-    for para in doc.paragraphs:
-        text = para.text.strip()
-        if not text:
+def _iter_docx_jobs(input_path, pattern, out_p, image_subdir_name, image_store=None):
+    """Lazily yield (src, md_path, image_dir) for every .docx matched by pattern.
+
+    The glob is consumed as it is walked so large trees start converting
+    immediately instead of being collected up front. With a shared
+    image_store, image_dir is the store itself.
+    """
+    for f in input_path.glob(pattern):
+        if not f.is_file():
             continue
 
-        # Heading → Markdown 제목 변환
-        try:
-            style_name = para.style.name
-        except Exception:
-            style_name = ""
+        # construct output names
+        stem = f.stem
+        md_name = stem + ".md"
+        md_path = out_p.joinpath(md_name)
 
-        if style_name.startswith("Heading"):
-            try:
-                level = int(style_name.replace("Heading ", ""))
-            except ValueError:
-                level = 1
-            md_lines.append("#" * level + " " + text)
+        # image dir: per-file subdir under output_dir
+        if image_store:
+            image_dir = pathlib.Path(image_store)
         else:
-            md_lines.append(text)
+            image_dir = out_p.joinpath(f"{stem}_{image_subdir_name}")
+        yield f, md_path, image_dir
 
-        # 하이퍼링크 처리 (간단히 처리)
-        for run in para.runs:
-            if hasattr(run, "hyperlink") and run.hyperlink:
-                try:
-                    url = run.hyperlink.target
-                    link_text = run.text.strip() or url
-                    md_lines.append(f"[{link_text}]({url})")
-                except Exception:
-                    # best-effort — ignore malformed hyperlink
-                    pass
-
-    # 테이블 처리
-    for t_idx, table in enumerate(doc.tables, start=1):
-        md_lines.append(f"\n### Table {t_idx}\n")
-        for row in table.rows:
-            cells = [cell.text.strip() for cell in row.cells]
-            md_lines.append("| " + " | ".join(cells) + " |")
-        md_lines.append("\n")
-
-    # 이미지 추출 (use relationship blobs) — detect extensions and avoid overwrites
-    def _unique_filename(dirpath, base, ext):
-        # ensure directory exists
-        os.makedirs(dirpath, exist_ok=True)
-        candidate = f"{base}{ext}"
-        i = 1
-        while os.path.exists(os.path.join(dirpath, candidate)):
-            candidate = f"{base}_{i}{ext}"
-            i += 1
-        return candidate
-
-    for rel in getattr(doc.part, "rels", {}).values():
+
+def _convert_serial(jobs, engine="auto", image_store=None):
+    """Convert jobs one after another, yielding (job, images, error) in input order."""
+    for job in jobs:
+        f, md_path, image_dir = job
         try:
-            if "image" in rel.reltype:
-                image_data = rel.target_part.blob
+            images = docx_to_markdown_full(str(f), str(md_path), str(image_dir), engine=engine, image_store=image_store)
+        except Exception as e:
+            yield job, None, e
+        else:
+            yield job, images, None
 
-                # try to get extension from partname (eg: /word/media/image1.png)
-                ext = None
-                try:
-                    partname = getattr(rel.target_part, 'partname', None)
-                    if partname:
-                        ext = pathlib.Path(partname).suffix
-                except Exception:
-                    ext = None
-
-                # fallback to content_type if no ext
-                if not ext:
-                    try:
-                        ctype = getattr(rel.target_part, 'content_type', '')
-                        if '/' in ctype:
-                            subtype = ctype.split('/')[1]
-                            # handle image/svg+xml
-                            subtype = subtype.split('+')[0]
-                            ext = '.' + ( 'jpg' if subtype == 'jpeg' else subtype )
-                    except Exception:
-                        ext = '.bin'
-
-                if not ext:
-                    ext = '.bin'
-
-                # pick a base name that is more descriptive than just image_ number
-                base = f"image_{image_count}"
-                fname = _unique_filename(image_dir, base, ext)
-                image_filename = os.path.join(image_dir, fname)
-                with open(image_filename, "wb") as f:
-                    f.write(image_data)
-                # add relative path to markdown (make path relative to md file)
-                relpath = os.path.relpath(image_filename, os.path.dirname(md_path))
-                md_lines.append(f"![{base}]({relpath})")
-                image_count += 1
-        except Exception:
-            # ignore image extraction errors for robustness
+
+def _future_outcome(fut):
+    err = fut.exception()
+    return (None, err) if err is not None else (fut.result(), None)
+
+
+def _convert_parallel(jobs, workers, engine="auto", image_store=None):
+    """Convert jobs on a process pool, yielding (job, images, error) in input order.
+
+    At most ``workers * 2`` conversions are in flight so the job iterator is
+    streamed into the pool rather than materialised. A failure in one worker
+    is returned as that job's error and does not affect the others.
+    """
+    pending = collections.deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for job in jobs:
+            f, md_path, image_dir = job
+            pending.append((job, pool.submit(docx_to_markdown_full, str(f), str(md_path), str(image_dir), engine=engine, image_store=image_store)))
+            if len(pending) >= workers * 2:
+                done_job, fut = pending.popleft()
+                yield (done_job, *_future_outcome(fut))
+        while pending:
+            done_job, fut = pending.popleft()
+            yield (done_job, *_future_outcome(fut))
+
+
+def _file_sha256(path, bufsize=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(bufsize), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _load_manifest(out_p):
+    """Read output_dir/.docs_manifest.json, returning an empty manifest if absent or unreadable."""
+    path = out_p.joinpath(MANIFEST_NAME)
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            data = json.load(fh)
+        if data.get("version") == MANIFEST_VERSION and isinstance(data.get("files"), dict):
+            return data
+    except (OSError, ValueError):
+        pass
+    return {"version": MANIFEST_VERSION, "files": {}}
+
+
+def _save_manifest(out_p, manifest):
+    # write to a temp file first so an interrupted run never leaves a truncated manifest
+    path = out_p.joinpath(MANIFEST_NAME)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _remove_outputs(out_p, entry, keep=()):
+    """Delete the .md file and image folder recorded in a manifest entry.
+
+    Paths listed in keep are still owned by another source and are left alone.
+    """
+    for key in ("md", "image_dir"):
+        # image_dir is None for documents whose images live in a shared store
+        rel = entry.get(key)
+        if not rel or rel in keep:
             continue
+        target = out_p.joinpath(rel)
+        if target.is_dir():
+            shutil.rmtree(target, ignore_errors=True)
+        elif target.exists():
+            target.unlink()
 
-    # Markdown 저장
-    with open(md_path, "w", encoding="utf-8") as f:
-        f.write("\n\n".join(md_lines))
 
+def _filter_changed(jobs, input_path, out_p, manifest, pending, stats, logger=None):
+    """Drop jobs whose source matches its manifest entry.
 
-def process_directory(input_dir, output_dir, image_subdir_name="images", recursive=False, logger=None):
+    A source is unchanged when size and mtime match; if only the mtime moved the
+    content hash decides. For changed sources the new stat/hash is stashed in
+    pending and stale outputs are removed so images are not renamed on re-runs.
+    """
+    files = manifest["files"]
+    for job in jobs:
+        f = job[0]
+        key = f.relative_to(input_path).as_posix()
+        stats["seen"].add(key)
+        st = f.stat()
+        entry = files.get(key)
+        if entry and entry["size"] == st.st_size and entry["mtime"] == st.st_mtime_ns:
+            stats["skipped"] += 1
+            continue
+        digest = _file_sha256(f)
+        if entry and entry["size"] == st.st_size and entry["sha256"] == digest:
+            entry["mtime"] = st.st_mtime_ns
+            stats["skipped"] += 1
+            continue
+        if entry:
+            _remove_outputs(out_p, entry)
+            if logger:
+                logger.info("Modified, re-converting: %s", f)
+        pending[key] = {"size": st.st_size, "mtime": st.st_mtime_ns, "sha256": digest}
+        yield job
+
+
+def process_directory(input_dir, output_dir, image_subdir_name="images", recursive=False, logger=None, workers=1, incremental=False, engine="auto", image_store=None):
     """Process all .docx files in input_dir and write .md files into output_dir.
 
     For each file Lorem.docx, this will create output_dir/Lorem.md and images at
     output_dir/Lorem_images/ (or the provided image_subdir_name).
+
+    With workers > 1 files are converted on a process pool of that size
+    (workers=0 uses every CPU). Results are returned in the same order as the
+    serial mode regardless of which worker finishes first.
+
+    With incremental=True a manifest (output_dir/.docs_manifest.json) records
+    each source's size, mtime and sha256 together with its outputs. Unchanged
+    sources are skipped, modified ones are re-converted and the outputs of
+    sources that disappeared are removed. Only converted files are returned.
+
+    engine is passed to docx_to_markdown_full for every file. With image_store
+    every document links its images into that shared content-addressed
+    directory (identical images are stored once) instead of a per-file
+    folder. Incremental runs never delete files from the shared store.
     """
     p = pathlib.Path(input_dir)
     if not p.exists():
@@ -140,34 +698,64 @@ def process_directory(input_dir, output_dir, image_subdir_name="images", recursi
         raise OSError(f"Failed to create output directory {output_dir}: {e}")
 
     pattern = "**/*.docx" if recursive else "*.docx"
-    files = list(p.glob(pattern))
-    processed = []
+    jobs = _iter_docx_jobs(p, pattern, out_p, image_subdir_name, image_store)
+    manifest = None
+    pending = {}
+    stats = {"seen": set(), "skipped": 0}
+    if incremental:
+        manifest = _load_manifest(out_p)
+        jobs = _filter_changed(jobs, p, out_p, manifest, pending, stats, logger=logger)
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    if workers > 1:
+        results = _convert_parallel(jobs, workers, engine=engine, image_store=image_store)
+    else:
+        results = _convert_serial(jobs, engine=engine, image_store=image_store)
 
-    for f in files:
-        if not f.is_file():
-            continue
-
-        # construct output names
-        stem = f.stem
-        md_name = stem + ".md"
-        md_path = out_p.joinpath(md_name)
-
-        # image dir: per-file subdir under output_dir
-        image_dir = out_p.joinpath(f"{stem}_{image_subdir_name}")
-        try:
-            docx_to_markdown_full(str(f), str(md_path), str(image_dir))
-            processed.append((str(f), str(md_path), str(image_dir)))
-            if logger:
-                logger.info("Converted: %s -> %s (images: %s)", f, md_path, image_dir)
-            else:
-                print(f"Converted: {f} -> {md_path} (images: {image_dir})")
-        except Exception as e:
-            if logger:
-                logger.exception("Failed to convert %s", f)
+    processed = []
+    try:
+        for (f, md_path, image_dir), images, err in results:
+            if err is None:
+                processed.append((str(f), str(md_path), str(image_dir)))
+                if manifest is not None:
+                    key = f.relative_to(p).as_posix()
+                    manifest["files"][key] = {
+                        **pending.pop(key),
+                        "md": md_path.relative_to(out_p).as_posix(),
+                        "image_dir": None if image_store else image_dir.relative_to(out_p).as_posix(),
+                        "images": [pathlib.Path(os.path.relpath(i, out_p)).as_posix() for i in images],
+                    }
+                if logger:
+                    logger.info("Converted: %s -> %s (images: %s)", f, md_path, image_dir)
+                else:
+                    print(f"Converted: {f} -> {md_path} (images: {image_dir})")
             else:
-                print(f"Failed to convert {f}: {e}", file=sys.stderr)
-
-    if not processed and logger:
+                if manifest is not None:
+                    # forget the entry so the file is retried on the next run
+                    key = f.relative_to(p).as_posix()
+                    manifest["files"].pop(key, None)
+                    pending.pop(key, None)
+                if logger:
+                    logger.error("Failed to convert %s", f, exc_info=err)
+                else:
+                    print(f"Failed to convert {f}: {err}", file=sys.stderr)
+
+        if manifest is not None:
+            files = manifest["files"]
+            # a non-recursive run only sees top-level files, so only those can be judged deleted
+            gone = [k for k in files if k not in stats["seen"] and (recursive or "/" not in k)]
+            live = {files[k][name] for k in files if k not in gone for name in ("md", "image_dir")}
+            for key in gone:
+                _remove_outputs(out_p, files.pop(key), keep=live)
+                if logger:
+                    logger.info("Source removed, deleted outputs: %s", key)
+            if logger and stats["skipped"]:
+                logger.info("Skipped %d unchanged files.", stats["skipped"])
+    finally:
+        if manifest is not None:
+            _save_manifest(out_p, manifest)
+
+    if not processed and not stats["skipped"] and logger:
         logger.warning("No .docx files were found in %s (pattern=%s)", input_dir, pattern)
 
     return processed
@@ -183,6 +771,10 @@ if __name__ == "__main__":
     ap.add_argument("--output-dir", default=None, help="Directory to write .md files and images (for --file, defaults to parent folder)" )
     ap.add_argument("--images-subdir", default="images", help="Name for per-file images subdirectory suffix (default 'images')")
     ap.add_argument("--recursive", action="store_true", help="Recurse into subdirectories to find .docx files")
+    ap.add_argument("--workers", type=int, default=1, help="Number of parallel conversion processes in directory mode (0 = all CPUs, default 1)")
+    ap.add_argument("--engine", choices=("auto",) + ENGINES, default="auto", help="Conversion engine: python-docx, lxml streaming, or auto (stream files >= %d MB)" % (STREAM_ENGINE_THRESHOLD // (1024 * 1024)))
+    ap.add_argument("--image-store", default=None, help="Shared content-addressed image directory; identical images across documents are stored once")
+    ap.add_argument("--incremental", action="store_true", help=f"Skip unchanged files using {MANIFEST_NAME} in the output directory")
     ap.add_argument("--quiet", action="store_true", help="Minimal output")
     ap.add_argument("--verbose", action="store_true", help="Show detailed processing info (INFO level)")
     args = ap.parse_args()
@@ -210,9 +802,9 @@ if __name__ == "__main__":
 
             stem = fpath.stem
             md_path = pathlib.Path(out_dir).joinpath(stem + ".md")
-            image_dir = pathlib.Path(out_dir).joinpath(f"{stem}_{args.images_subdir}")
+            image_dir = pathlib.Path(args.image_store or pathlib.Path(out_dir).joinpath(f"{stem}_{args.images_subdir}"))
             try:
-                docx_to_markdown_full(str(fpath), str(md_path), str(image_dir))
+                docx_to_markdown_full(str(fpath), str(md_path), str(image_dir), engine=args.engine, image_store=args.image_store)
                 logger.info("Converted file: %s -> %s (images: %s)", fpath, md_path, image_dir)
             except Exception:
                 logger.exception("Failed to convert %s", fpath)
@@ -222,7 +814,7 @@ if __name__ == "__main__":
             if not args.input_dir:
                 logger.error("--input-dir must be provided in directory mode.")
                 sys.exit(2)
-            results = process_directory(args.input_dir, args.output_dir or '.', image_subdir_name=args.images_subdir, recursive=args.recursive, logger=logger)
+            results = process_directory(args.input_dir, args.output_dir or '.', image_subdir_name=args.images_subdir, recursive=args.recursive, logger=logger, workers=args.workers, incremental=args.incremental, engine=args.engine, image_store=args.image_store)
             if not args.quiet:
                 logger.info("Processed %d files.", len(results))
     except FileNotFoundError as e:
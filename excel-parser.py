@@ -1,53 +1,756 @@
 import argparse
+import codecs
+import collections
+import csv
+import datetime
+import hashlib
+import io
+import json
 import logging
 import os
 import pathlib
 import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from xml.etree import ElementTree
 
-import pandas as pd
+import openpyxl
 from pytablewriter import MarkdownTableWriter
 
-def excel_sheet_to_markdown(excel_path, sheet_name, md_path):
-    """Convert a single Excel sheet to a Markdown file."""
-    df = pd.read_excel(excel_path, sheet_name=sheet_name, engine="openpyxl")
-    writer = MarkdownTableWriter(dataframe=df, table_name=sheet_name)
+log = logging.getLogger("excel-parser")
+
+# CSV files at least this large are always written in stream mode, since the
+# padded MarkdownTableWriter table needs every row in memory
+CSV_STREAM_MIN_BYTES = 64 * 1024 * 1024
+
+def _open_workbook(excel_path):
+    """Open a workbook once in read-only mode.
+
+    Rows are streamed from the zip on demand instead of each sheet being
+    re-parsed by a separate pd.read_excel call. data_only returns cached
+    formula results, as pandas does.
+    """
+    return openpyxl.load_workbook(excel_path, read_only=True, data_only=True)
+
+def _iter_numbered_rows(ws):
+    """Yield (excel_row_number, values) for the non-blank rows of a worksheet."""
+    # values_only iteration starts at row 1 and fills gaps, so enumerate gives the sheet row
+    for row_no, row in enumerate(ws.iter_rows(values_only=True), start=1):
+        if any(v is not None for v in row):
+            yield row_no, row
+
+def _file_sha256(path, bufsize=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(bufsize), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _same_values(a, b):
+    # 1 == 1.0 == True in Python, so compare types as well
+    return len(a) == len(b) and all(type(x) is type(y) and x == y for x, y in zip(a, b))
+
+# Mixed-type cache columns store each cell as "<type tag><text>" so the exact
+# Python value (and thus MarkdownTableWriter's type inference) comes back on read.
+_CELL_TAGS = {
+    str: ("s", str, str),
+    bool: ("b", lambda v: "1" if v else "0", lambda t: t == "1"),
+    int: ("i", str, int),
+    float: ("f", repr, float),
+    datetime.datetime: ("d", datetime.datetime.isoformat, datetime.datetime.fromisoformat),
+    datetime.date: ("D", datetime.date.isoformat, datetime.date.fromisoformat),
+    datetime.time: ("t", datetime.time.isoformat, datetime.time.fromisoformat),
+    datetime.timedelta: (
+        "T",
+        lambda v: f"{v.days},{v.seconds},{v.microseconds}",
+        lambda t: datetime.timedelta(*map(int, t.split(","))),
+    ),
+}
+_CELL_DECODERS = {tag: decode for tag, _, decode in _CELL_TAGS.values()}
+
+def _encode_cell(v):
+    if v is None:
+        return None
+    try:
+        tag, encode, _ = _CELL_TAGS[type(v)]
+    except KeyError:
+        raise TypeError(f"cannot cache cell of type {type(v).__name__}") from None
+    return tag + encode(v)
+
+def _decode_cell(text):
+    return None if text is None else _CELL_DECODERS[text[0]](text[1:])
+
+class SheetCache:
+    """Arrow IPC cache of parsed sheets keyed by workbook content hash and sheet name.
+
+    Each sheet is stored as one Arrow file (a "__row__" column with the Excel
+    row numbers plus one column per header cell; the header row itself lives
+    in the schema metadata) and read back through a memory map, so repeat
+    conversions skip openpyxl entirely. A column whose values do not survive
+    an Arrow round trip with their Python types (mixed types, or empty in the
+    first batch) is stored as type-tagged strings that decode back to the
+    original values, so cached and uncached output are identical. If a later
+    batch no longer fits a typed column the sheet is simply not cached.
+    Files are evicted least-recently-used first once the directory exceeds
+    max_bytes.
+    """
+
+    BATCH_ROWS = 10000
+
+    def __init__(self, cache_dir, max_bytes=1 << 30):
+        self.cache_dir = str(cache_dir)
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, digest, sheet_name):
+        sheet_key = hashlib.sha1(sheet_name.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{digest}_{sheet_key}.arrow")
+
+    def _touch(self, path):
+        # mtime doubles as the LRU timestamp
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+    def sheet_names(self, digest):
+        path = os.path.join(self.cache_dir, f"{digest}.sheets.json")
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                names = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        self._touch(path)
+        return names
+
+    def put_sheet_names(self, digest, names):
+        path = os.path.join(self.cache_dir, f"{digest}.sheets.json")
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(names, fh, ensure_ascii=False)
+
+    def has(self, digest, sheet_name):
+        return os.path.exists(self._path(digest, sheet_name))
+
+    def read(self, digest, sheet_name):
+        """Return an iterator of (row_no, values), header row first, or None on a miss."""
+        path = self._path(digest, sheet_name)
+        if not os.path.exists(path):
+            return None
+        self._touch(path)
+        return self._iter_cached(path)
+
+    def _iter_cached(self, path):
+        import pyarrow as pa
+
+        with pa.memory_map(path) as source:
+            reader = pa.ipc.open_file(source)
+            meta = reader.schema.metadata or {}
+            header = json.loads(meta.get(b"header", b"null"))
+            if header is None:
+                return
+            yield int(meta[b"header_row"]), header
+            tagged = [_is_tagged(f) for f in reader.schema]
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                cols = [
+                    [_decode_cell(v) for v in c.to_pylist()] if t else c.to_pylist()
+                    for c, t in zip(batch.columns, tagged)
+                ]
+                for k, row_no in enumerate(cols[0]):
+                    yield row_no, [c[k] for c in cols[1:]]
+
+    def writer(self, digest, sheet_name, header_row_no, header):
+        return _SheetCacheWriter(self, self._path(digest, sheet_name), header_row_no, header)
+
+    def evict(self):
+        """Delete least-recently-used files until the cache fits in max_bytes.
+
+        In-progress *.tmp files belong to writers in other workers and are left alone.
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".tmp"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+_TAGGED = {b"cells": b"tagged"}
+
+def _is_tagged(field):
+    return (field.metadata or {}).get(b"cells") == b"tagged"
+
+class _SheetCacheWriter:
+    """Collect rows in batches and write them to a temporary Arrow file.
+
+    commit() renames it into place; abort() discards it.
+    """
+
+    def __init__(self, cache, path, header_row_no, header):
+        self.cache = cache
+        self.path = path
+        self.tmp = f"{path}.{os.getpid()}.tmp"
+        self.width = len(header) if header is not None else 0
+        self.metadata = {
+            "header": json.dumps(None if header is None else list(header), ensure_ascii=False, default=str),
+            "header_row": str(header_row_no),
+        }
+        self.schema = None
+        self._sink = None
+        self._writer = None
+        self._rows = []
+        self.failed = False
+
+    def append(self, row_no, values):
+        if self.failed:
+            return
+        self._rows.append((row_no, values))
+        if len(self._rows) >= SheetCache.BATCH_ROWS:
+            self._flush()
+
+    def _column_array(self, values, field=None):
+        """Return (array, tagged) for one column; field is the schema field after the first batch."""
+        import pyarrow as pa
+
+        if field is None or _is_tagged(field):
+            if field is None:
+                try:
+                    arr = pa.array(values)
+                    # all empty so far, or not a faithful round trip: tagged cells accept anything later
+                    if not pa.types.is_null(arr.type) and _same_values(arr.to_pylist(), values):
+                        return arr, False
+                except (pa.ArrowException, TypeError, ValueError, OverflowError):
+                    pass
+            return pa.array([_encode_cell(v) for v in values], pa.string()), True
+        arr = pa.array(values, type=field.type)
+        if not _same_values(arr.to_pylist(), values):
+            raise TypeError("column no longer matches cached type")
+        return arr, False
+
+    def _flush(self):
+        import pyarrow as pa
+
+        rows, self._rows = self._rows, []
+        if not rows and self.schema is not None:
+            return
+        try:
+            columns = [[r[0] for r in rows]] + [[r[1][i] for r in rows] for i in range(self.width)]
+            if self.schema is None:
+                arrays = [pa.array(columns[0], pa.int64())]
+                fields = [pa.field("__row__", pa.int64())]
+                for i, c in enumerate(columns[1:]):
+                    arr, tagged = self._column_array(c)
+                    arrays.append(arr)
+                    fields.append(pa.field(f"c{i}", arr.type, metadata=_TAGGED if tagged else None))
+                self.schema = pa.schema(fields, metadata=self.metadata)
+                self._sink = pa.OSFile(self.tmp, "wb")
+                self._writer = pa.ipc.new_file(self._sink, self.schema)
+            else:
+                arrays = [pa.array(columns[0], pa.int64())]
+                arrays += [self._column_array(c, f)[0] for c, f in zip(columns[1:], list(self.schema)[1:])]
+            if rows:
+                self._writer.write_batch(pa.record_batch(arrays, schema=self.schema))
+        except (pa.ArrowException, TypeError, ValueError, OverflowError):
+            self.abort()
+
+    def commit(self):
+        if self.failed:
+            return
+        self._flush()
+        if self.failed:
+            return
+        self._writer.close()
+        self._sink.close()
+        try:
+            os.replace(self.tmp, self.path)
+        except FileNotFoundError:
+            # temp file removed underneath us (e.g. cache dir cleared): just a cache miss
+            self.failed = True
+            return
+        self.cache.evict()
+
+    def abort(self):
+        self.failed = True
+        self._rows = []
+        try:
+            if self._writer is not None:
+                self._writer.close()
+            if self._sink is not None:
+                self._sink.close()
+        except Exception:
+            pass
+        try:
+            os.remove(self.tmp)
+        except FileNotFoundError:
+            pass
+
+def _iter_sheet(excel_path, sheet_name, workbook=None, cache=None, digest=None):
+    """Yield (row_no, values) for the non-blank rows of a sheet, header row first.
+
+    Data rows are cut or padded to the header width. With a SheetCache, a
+    cached sheet is read from its Arrow file without opening the workbook;
+    otherwise rows come from openpyxl and are written to the cache as they
+    stream past.
+    """
+    if cache is not None:
+        digest = digest or _file_sha256(excel_path)
+        cached = cache.read(digest, sheet_name)
+        if cached is not None:
+            yield from cached
+            return
+
+    wb = workbook if workbook is not None else _open_workbook(excel_path)
+    writer = None
+    try:
+        rows = _iter_numbered_rows(wb[sheet_name])
+        first = next(rows, None)
+        if cache is not None:
+            writer = cache.writer(digest, sheet_name, *(first if first is not None else (0, None)))
+        if first is None:
+            if writer is not None:
+                writer.commit()
+            return
+        yield first
+        width = len(first[1])
+        for row_no, r in rows:
+            values = list(r[:width]) + [None] * (width - len(r))
+            if writer is not None:
+                writer.append(row_no, values)
+            yield row_no, values
+        if writer is not None:
+            writer.commit()
+            writer = None
+    finally:
+        if writer is not None:
+            writer.abort()
+        if workbook is None:
+            wb.close()
+
+def _sheet_headers(row):
+    # pandas names empty header cells "Unnamed: <col>"
+    return [f"Unnamed: {i}" if v is None else str(v) for i, v in enumerate(row)]
+
+def _md_value(v):
+    """Format a cell value for an unpadded Markdown table row."""
+    if v is None:
+        return ""
+    # same escaping as MarkdownTableWriter: pipes escaped, line breaks flattened
+    return str(v).replace("|", "\\|").replace("\r\n", " ").replace("\n", " ")
+
+def _md_row(values):
+    return "|" + "|".join(_md_value(v) for v in values) + "|\n"
+
+def write_markdown_table(fh, table_name, headers, rows):
+    """Write a Markdown table to fh one row at a time.
+
+    Unlike MarkdownTableWriter, columns are not padded to a common width and
+    the alignment row is plain, so nothing has to be scanned or buffered
+    ahead of writing and memory stays constant regardless of row count.
+    """
+    if not headers:
+        return
+    fh.write(f"# {table_name}\n")
+    fh.write(_md_row(headers))
+    fh.write("|" + "---|" * len(headers) + "\n")
+    for row in rows:
+        fh.write(_md_row(row))
+
+def _rows_to_markdown(sheet, table_name, md_path, stream=False):
+    """Write a (row_no, values) iterator, header row first, as one Markdown table."""
+    try:
+        first = next(sheet, None)
+        headers = _sheet_headers(first[1]) if first is not None else []
+        rows = (values for _, values in sheet)
+        if stream:
+            with open(md_path, "w", encoding="utf-8") as f:
+                write_markdown_table(f, table_name, headers, rows)
+            return
+        matrix = list(rows)
+    finally:
+        sheet.close()
+    writer = MarkdownTableWriter(table_name=table_name, headers=headers, value_matrix=matrix)
     md = writer.dumps()
     with open(md_path, "w", encoding="utf-8") as f:
         f.write(md)
 
-def process_excel_file(excel_path, output_dir, sheet_name=None, logger=None):
-    """Process Excel file: convert all or specified sheets to markdown."""
-    xls = pd.ExcelFile(excel_path)
-    sheets = [sheet_name] if sheet_name else xls.sheet_names
+def _rows_to_chunks(sheet, source, sheet_name, chunk_dir, rows_per_chunk):
+    """Write a (row_no, values) iterator, header row first, as row-window chunks plus index.json."""
+    if rows_per_chunk < 1:
+        raise ValueError("rows_per_chunk must be at least 1")
+    os.makedirs(chunk_dir, exist_ok=True)
+    label = f"{source} / {sheet_name}" if sheet_name else source
+    index = []
+
+    def flush(window):
+        first_row, last_row = window[0][0], window[-1][0]
+        title = f"{label} (rows {first_row}-{last_row})"
+        buf = io.StringIO()
+        write_markdown_table(buf, title, headers, (values for _, values in window))
+        text = buf.getvalue()
+        fname = f"{len(index) + 1:04d}_rows_{first_row}-{last_row}.md"
+        with open(os.path.join(chunk_dir, fname), "w", encoding="utf-8") as fh:
+            fh.write(text)
+        index.append({
+            "file": fname,
+            "source": source,
+            "sheet": sheet_name,
+            "row_start": first_row,
+            "row_end": last_row,
+            "rows": len(window),
+            "chars": len(text),
+        })
+
+    try:
+        first = next(sheet, None)
+        headers = _sheet_headers(first[1]) if first is not None else []
+        window = []
+        for row in sheet:
+            window.append(row)
+            if len(window) == rows_per_chunk:
+                flush(window)
+                window = []
+        if window:
+            flush(window)
+    finally:
+        sheet.close()
+
+    with open(os.path.join(chunk_dir, "index.json"), "w", encoding="utf-8") as fh:
+        json.dump(index, fh, ensure_ascii=False, indent=2)
+    return index
+
+def excel_sheet_to_markdown(excel_path, sheet_name, md_path, workbook=None, stream=False, cache=None, digest=None):
+    """Convert a single Excel sheet to a Markdown file.
+
+    workbook: an already open workbook (see _open_workbook) to read the sheet
+    from; if omitted the file is opened and closed here.
+    stream: write an unpadded table row by row (write_markdown_table) instead
+    of the padded MarkdownTableWriter output, for very large sheets.
+    cache/digest: optional SheetCache and workbook hash (see _iter_sheet).
+    """
+    sheet = _iter_sheet(excel_path, sheet_name, workbook, cache, digest)
+    _rows_to_markdown(sheet, sheet_name, md_path, stream=stream)
+
+def excel_sheet_to_chunks(excel_path, sheet_name, chunk_dir, rows_per_chunk, workbook=None, cache=None, digest=None):
+    """Split a sheet into Markdown chunks of at most rows_per_chunk data rows.
+
+    Every chunk repeats the column header and is titled with the workbook,
+    sheet and Excel row range it covers, so it can be embedded as-is. Chunks
+    are written to chunk_dir as they fill up (only one window is held in
+    memory) together with an index.json describing them, which is returned.
+    """
+    sheet = _iter_sheet(excel_path, sheet_name, workbook, cache, digest)
+    return _rows_to_chunks(sheet, os.path.basename(excel_path), sheet_name, chunk_dir, rows_per_chunk)
+
+def _detect_csv_format(csv_path, sample_size=64 * 1024):
+    """Guess (encoding, delimiter) of a CSV file from its first sample_size bytes."""
+    with open(csv_path, "rb") as fh:
+        sample = fh.read(sample_size)
+
+    encoding = None
+    if sample.startswith(codecs.BOM_UTF8):
+        encoding = "utf-8-sig"
+    else:
+        for candidate in ("utf-8", "cp949"):
+            try:
+                sample.decode(candidate)
+            except UnicodeDecodeError as e:
+                # a multi-byte character cut off by the sample boundary is fine
+                if e.start < len(sample) - 3 or len(sample) < sample_size:
+                    continue
+            encoding = candidate
+            break
+    if encoding is None:
+        try:
+            from charset_normalizer import from_bytes
+
+            best = from_bytes(sample).best()
+            encoding = best.encoding if best else "latin-1"
+        except ImportError:
+            encoding = "latin-1"
+
+    text = sample.decode(encoding, errors="ignore")
+    try:
+        delimiter = csv.Sniffer().sniff(text, delimiters=",;\t|").delimiter
+    except csv.Error:
+        delimiter = ","
+    return encoding, delimiter
+
+def _iter_csv(csv_path, encoding=None, delimiter=None):
+    """Yield (row_no, values) for the non-blank records of a CSV file, header first.
+
+    Records are read one at a time with the csv module, so memory does not
+    depend on file size. Empty fields become None like empty Excel cells, and
+    data rows are cut or padded to the header width; rows that lose non-empty
+    fields that way are counted and reported in a warning.
+    """
+    if encoding is None or delimiter is None:
+        detected = _detect_csv_format(csv_path)
+        encoding = encoding or detected[0]
+        delimiter = delimiter or detected[1]
+    with open(csv_path, "r", encoding=encoding, newline="") as fh:
+        width = None
+        truncated, first_truncated = 0, None
+        for row_no, record in enumerate(csv.reader(fh, delimiter=delimiter), start=1):
+            values = [v if v != "" else None for v in record]
+            if not any(v is not None for v in values):
+                continue
+            if width is None:
+                width = len(values)
+            else:
+                if any(v is not None for v in values[width:]):
+                    truncated += 1
+                    first_truncated = first_truncated or row_no
+                values = values[:width] + [None] * (width - len(values))
+            yield row_no, values
+    if truncated:
+        log.warning(
+            "%s: %d rows have more fields than the %d header columns (first at row %d); extra fields were dropped",
+            csv_path, truncated, width, first_truncated,
+        )
+
+def csv_to_markdown(csv_path, md_path, stream=False):
+    """Convert a CSV file to a Markdown table titled with the file stem (see excel_sheet_to_markdown).
+
+    Files of CSV_STREAM_MIN_BYTES or more are always streamed so they are
+    never loaded into memory as a whole.
+    """
+    if not stream and os.path.getsize(csv_path) >= CSV_STREAM_MIN_BYTES:
+        log.info("%s is larger than %d MB; writing it in stream mode", csv_path, CSV_STREAM_MIN_BYTES >> 20)
+        stream = True
+    _rows_to_markdown(_iter_csv(csv_path), pathlib.Path(csv_path).stem, md_path, stream=stream)
+
+def csv_to_chunks(csv_path, chunk_dir, rows_per_chunk):
+    """Split a CSV file into row-window chunks (see excel_sheet_to_chunks)."""
+    return _rows_to_chunks(_iter_csv(csv_path), os.path.basename(csv_path), None, chunk_dir, rows_per_chunk)
+
+def process_csv_file(csv_path, output_dir, logger=None, stream=False, rows_per_chunk=None, output_stem=None, **_):
+    """Convert a CSV file like a one-sheet workbook: <output_stem>.md or <output_stem>_chunks/.
 
+    Extra keyword arguments accepted by process_excel_file (e.g. the sheet
+    cache) do not apply to CSV and are ignored.
+    """
+    output_stem = output_stem or pathlib.Path(csv_path).stem
     out_p = pathlib.Path(output_dir)
     out_p.mkdir(parents=True, exist_ok=True)
+    md_path = out_p.joinpath(f"{output_stem}_chunks" if rows_per_chunk else f"{output_stem}.md")
+    if rows_per_chunk:
+        csv_to_chunks(csv_path, str(md_path), rows_per_chunk)
+    else:
+        csv_to_markdown(csv_path, str(md_path), stream=stream)
+    if logger:
+        logger.info("Converted: %s -> %s", csv_path, md_path)
+    else:
+        print(f"Converted: {csv_path} -> {md_path}")
+    return [(csv_path, pathlib.Path(csv_path).stem, str(md_path))]
 
+def process_excel_file(excel_path, output_dir, sheet_name=None, logger=None, stream=False, rows_per_chunk=None, output_stem=None, cache_dir=None, cache_max_bytes=1 << 30):
+    """Process Excel file: convert all or specified sheets to markdown.
+
+    Outputs are named <output_stem>_<sheet>.md (output_stem defaults to the
+    workbook's file stem) so sheets of different workbooks sharing an output
+    directory never overwrite each other.
+
+    The workbook is opened once and every sheet is read from that handle.
+    stream is passed to excel_sheet_to_markdown. With rows_per_chunk each
+    sheet is instead written as row-window chunks into
+    <output_stem>_<sheet>_chunks/ (see excel_sheet_to_chunks) and that folder
+    is reported as its output.
+
+    With cache_dir, parsed sheets are kept in a SheetCache (Arrow files keyed
+    by the workbook's sha256) capped at cache_max_bytes; when every requested
+    sheet is cached the workbook is not opened at all.
+    """
+    output_stem = output_stem or pathlib.Path(excel_path).stem
+    cache = SheetCache(cache_dir, cache_max_bytes) if cache_dir else None
+    digest = _file_sha256(excel_path) if cache else None
+    wb = None
+    names = cache.sheet_names(digest) if cache else None
+    wanted = [sheet_name] if sheet_name else names
+    if names is None or not all(cache.has(digest, s) for s in wanted):
+        wb = _open_workbook(excel_path)
+        names = wb.sheetnames
+        if cache:
+            cache.put_sheet_names(digest, names)
+    try:
+        sheets = [sheet_name] if sheet_name else names
+
+        out_p = pathlib.Path(output_dir)
+        out_p.mkdir(parents=True, exist_ok=True)
+
+        processed = []
+        for s in sheets:
+            md_name = f"{output_stem}_{s}_chunks" if rows_per_chunk else f"{output_stem}_{s}.md"
+            md_path = out_p.joinpath(md_name)
+            try:
+                if rows_per_chunk:
+                    excel_sheet_to_chunks(excel_path, s, str(md_path), rows_per_chunk, workbook=wb, cache=cache, digest=digest)
+                else:
+                    excel_sheet_to_markdown(excel_path, s, str(md_path), workbook=wb, stream=stream, cache=cache, digest=digest)
+                processed.append((excel_path, s, str(md_path)))
+                if logger:
+                    logger.info("Converted: %s sheet %s -> %s", excel_path, s, md_path)
+                else:
+                    print(f"Converted: {excel_path} sheet {s} -> {md_path}")
+            except Exception as e:
+                if logger:
+                    logger.exception("Failed to convert sheet %s in %s", s, excel_path)
+                else:
+                    print(f"Failed to convert sheet {s} in {excel_path}: {e}", file=sys.stderr)
+    finally:
+        if wb is not None:
+            wb.close()
+    return processed
+
+def _is_csv(path):
+    return pathlib.Path(path).suffix.lower() == ".csv"
+
+def _task_call(f, output_dir, sheet_name):
+    """Return (function, *args) converting one task: a CSV file or (a sheet of) a workbook."""
+    if _is_csv(f):
+        return process_csv_file, str(f), output_dir
+    return process_excel_file, str(f), output_dir, sheet_name
+
+def _workbook_sheet_names(path):
+    """Sheet names read straight from xl/workbook.xml (no openpyxl load), or None if unreadable."""
+    try:
+        with zipfile.ZipFile(path) as zf:
+            root = ElementTree.fromstring(zf.read("xl/workbook.xml"))
+    except (OSError, KeyError, zipfile.BadZipFile, ElementTree.ParseError):
+        return None
+    return [el.get("name") for el in root.iter() if el.tag.rsplit("}", 1)[-1] == "sheet"]
+
+def _output_stems(files, sheet_name=None, sheet_names=None):
+    """Give each workbook a unique output prefix so no two final output names collide.
+
+    The prefix is the stem, plus the extension when stems clash. The final
+    names (<prefix>_<sheet>, or <prefix> for CSV) are then checked across all
+    files, case-insensitively, and a clashing prefix gets a "-2", "-3", ...
+    suffix; e.g. a.xlsx sheet "b_Sheet1" and a_b.xlsx sheet "Sheet1" would
+    otherwise both write a_b_Sheet1.md. sheet_names maps a workbook to its
+    already-read sheet names (see _workbook_sheet_names).
+    """
+    sheet_names = sheet_names or {}
+    counts = collections.Counter(f.stem for f in files)
+    taken = set()
+    stems = {}
+    for f in files:
+        base = f.stem if counts[f.stem] == 1 else f"{f.stem}_{f.suffix.lstrip('.')}"
+        if _is_csv(f):
+            sheets = [None]
+        else:
+            names = sheet_names[f] if f in sheet_names else _workbook_sheet_names(f)
+            sheets = [sheet_name] if sheet_name else (names or [])
+
+        def names(prefix):
+            return {(prefix if s is None else f"{prefix}_{s}").casefold() for s in sheets}
+
+        stem, n = base, 1
+        while names(stem) & taken:
+            n += 1
+            stem = f"{base}-{n}"
+        taken |= names(stem)
+        stems[f] = stem
+    return stems
+
+def process_excel_files(files, output_dir, sheet_name=None, logger=None, stream=False, rows_per_chunk=None, workers=1, split_sheets=False, cache_dir=None, cache_max_bytes=1 << 30):
+    """Convert several workbooks (and .csv files), optionally on a process pool.
+
+    With workers > 1 (0 = all CPUs) each workbook is converted in its own
+    process; split_sheets additionally makes every sheet a separate task so
+    one very large workbook is spread over the pool too (each task then opens
+    the workbook itself). Progress is logged per task and a summary at the end.
+    Returns the processed (file, sheet, output) tuples in input order.
+    cache_dir/cache_max_bytes are passed to process_excel_file.
+    """
+    files = [pathlib.Path(f) for f in files]
+    # sheet names come straight from xl/workbook.xml; no workbook is loaded in this process
+    sheet_names = {} if sheet_name else {f: _workbook_sheet_names(f) for f in files if not _is_csv(f)}
+    stems = _output_stems(files, sheet_name, sheet_names)
+    if workers == 0:
+        workers = os.cpu_count() or 1
+
+    tasks = []
+    for f in files:
+        if split_sheets and workers > 1 and not sheet_name and sheet_names.get(f):
+            tasks.extend((f, s) for s in sheet_names[f])
+            continue
+        # CSV, a single sheet, or unreadable sheet names: the per-file task reports any error
+        tasks.append((f, sheet_name))
+
+    kwargs = dict(logger=logger, stream=stream, rows_per_chunk=rows_per_chunk, cache_dir=cache_dir, cache_max_bytes=cache_max_bytes)
+    started = time.perf_counter()
     processed = []
-    for s in sheets:
-        md_name = f"{s}.md"
-        md_path = out_p.joinpath(md_name)
-        try:
-            excel_sheet_to_markdown(excel_path, s, str(md_path))
-            processed.append((excel_path, s, str(md_path)))
-            if logger:
-                logger.info("Converted: %s sheet %s -> %s", excel_path, s, md_path)
-            else:
-                print(f"Converted: {excel_path} sheet {s} -> {md_path}")
-        except Exception as e:
+    failed = 0
+
+    def outcomes():
+        if workers > 1:
+            # at most workers * 2 tasks in flight, like docs-parser's _convert_parallel
+            pending = collections.deque()
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for f, s in tasks:
+                    pending.append(((f, s), pool.submit(*_task_call(f, output_dir, s), output_stem=stems[f], **kwargs)))
+                    if len(pending) >= workers * 2:
+                        task, fut = pending.popleft()
+                        err = fut.exception()
+                        yield task, (None if err else fut.result()), err
+                while pending:
+                    task, fut = pending.popleft()
+                    err = fut.exception()
+                    yield task, (None if err else fut.result()), err
+        else:
+            for f, s in tasks:
+                try:
+                    fn, *call_args = _task_call(f, output_dir, s)
+                    yield (f, s), fn(*call_args, output_stem=stems[f], **kwargs), None
+                except Exception as e:
+                    yield (f, s), None, e
+
+    for i, ((f, s), result, err) in enumerate(outcomes(), start=1):
+        label = f if s is None else f"{f} [{s}]"
+        if err is not None:
+            failed += 1
             if logger:
-                logger.exception("Failed to convert sheet %s in %s", s, excel_path)
+                logger.error("[%d/%d] Failed to process %s", i, len(tasks), label, exc_info=err)
             else:
-                print(f"Failed to convert sheet {s} in {excel_path}: {e}", file=sys.stderr)
+                print(f"[{i}/{len(tasks)}] Failed to process {label}: {err}", file=sys.stderr)
+            continue
+        processed.extend(result)
+        if logger:
+            logger.info("[%d/%d] Processed file: %s", i, len(tasks), label)
+
+    if logger:
+        logger.info(
+            "Converted %d sheets from %d files in %.1fs (%d failed)",
+            len(processed), len(files), time.perf_counter() - started, failed,
+        )
     return processed
 
 if __name__ == "__main__":
 
     ap = argparse.ArgumentParser(description="Convert Excel sheets to Markdown files")
     group = ap.add_mutually_exclusive_group(required=True)
-    group.add_argument("--input-dir", help="Directory with Excel files to convert")
+    group.add_argument("--input-dir", help="Directory with Excel (.xls*) and .csv files to convert")
     ap.add_argument("--output-dir", default=None, help="Output directory for markdown files (default: input file's folder or current directory)")
     ap.add_argument("--sheet", default=None, help="Sheet name to convert (default: all sheets)")
+    ap.add_argument("--stream", action="store_true", help="Write unpadded tables row by row (constant memory for huge sheets)")
+    ap.add_argument("--rows-per-chunk", type=int, default=None, help="Write each sheet as chunks of N rows with a repeated header (for RAG ingestion)")
+    ap.add_argument("--cache-dir", default=None, help="Directory for the Arrow sheet cache (skips openpyxl parsing on re-runs)")
+    ap.add_argument("--cache-max-mb", type=int, default=1024, help="Sheet cache size cap in MB, least recently used sheets are evicted (default 1024)")
+    ap.add_argument("--workers", type=int, default=1, help="Number of parallel conversion processes (0 = all CPUs, default 1)")
+    ap.add_argument("--split-sheets", action="store_true", help="With --workers, convert the sheets of each workbook as separate tasks")
     ap.add_argument("--quiet", action="store_true", help="Minimal output")
     ap.add_argument("--verbose", action="store_true", help="Detailed info logging")
 
@@ -70,13 +773,14 @@ if __name__ == "__main__":
         out_dir = args.output_dir or str(pathlib.Path('.').resolve())
         pathlib.Path(out_dir).mkdir(parents=True, exist_ok=True)
 
-        files = list(p.glob("*.xls*"))
+        files = sorted([*p.glob("*.xls*"), *p.glob("*.csv")])
         if not files:
-            logger.warning("No Excel files found in directory: %s", args.input_dir)
-        for file in files:
-            process_excel_file(str(file), out_dir, args.sheet, logger=logger)
-            if not args.quiet:
-                logger.info("Processed file: %s", file)
+            logger.warning("No Excel or CSV files found in directory: %s", args.input_dir)
+        process_excel_files(
+            files, out_dir, args.sheet, logger=logger, stream=args.stream, rows_per_chunk=args.rows_per_chunk,
+            workers=args.workers, split_sheets=args.split_sheets,
+            cache_dir=args.cache_dir, cache_max_bytes=args.cache_max_mb * 1024 * 1024,
+        )
 
     except Exception as e:
         logger.exception("Unexpected error: %s", e)
@@ -0,0 +1,27 @@
+"""Import compatible wrapper so module can be imported as `excel_parser`.
+
+`excel-parser.py` cannot be imported with a normal import statement because
+of the dash in its name, so this loads it by path and re-exports the
+conversion functions used by tests.
+"""
+
+import importlib.util
+import pathlib
+import sys
+
+_spec = importlib.util.spec_from_file_location(
+    "excel_parser_impl", pathlib.Path(__file__).with_name("excel-parser.py")
+)
+_impl = importlib.util.module_from_spec(_spec)
+# registered so functions can be pickled for the process pool
+sys.modules[_spec.name] = _impl
+_spec.loader.exec_module(_impl)
+
+# Export the key functions used by tests
+excel_sheet_to_markdown = _impl.excel_sheet_to_markdown
+process_excel_file = _impl.process_excel_file
+process_excel_files = _impl.process_excel_files
+write_markdown_table = _impl.write_markdown_table
+excel_sheet_to_chunks = _impl.excel_sheet_to_chunks
+SheetCache = _impl.SheetCache
+process_csv_file = _impl.process_csv_file
@@ -13,65 +13,106 @@ This script will write chunk files and a `index.json` describing them.
 """
 
 import argparse
+import collections
+import glob
+import io
 import os
 import re
 import json
-import pathlib
-from typing import List, Tuple
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from token_counter import TokenCounter
 
 HEADING_RE = re.compile(r"^(#{1,6})\s*(.*)$")
 
 
+def _iter_sections(lines: Iterable[str], level: int = 1) -> Iterator[Tuple[int, str, str]]:
+    """iter_sections plus the UTF-8 byte offset at which each section starts."""
+    pattern = re.compile(rf"^({'#' * level})\s*(.*)$")
+    heading = None  # None until the first matching heading
+    bare = False  # waiting for the text of a bare '#' heading
+    body: List[str] = []
+    start = 0  # offset of the current section
+    pos = 0  # offset of the current line
+
+    for line in lines:
+        line_pos = pos
+        pos += len(line.encode("utf-8"))
+        if bare:
+            if not line.strip():
+                continue
+            heading = line.strip()
+            bare = False
+            continue
+        m = pattern.match(line.rstrip("\n"))
+        if not m:
+            body.append(line)
+            continue
+        if heading is None:
+            # content before first heading
+            pre = "".join(body).strip()
+            if pre:
+                yield start, "", pre
+        else:
+            yield start, heading, "".join(body).strip()
+        body = []
+        start = line_pos
+        heading = m.group(2).strip()
+        bare = not heading
+
+    if heading is None:
+        # no matching headings at this level -> return entire document as one chunk
+        yield start, "", "".join(body).strip()
+    else:
+        yield start, heading, "".join(body).strip()
+
+
+def iter_sections(lines: Iterable[str], level: int = 1) -> Iterator[Tuple[str, str]]:
+    """Yield (heading_text, body_text) blocks from an iterable of lines, one section at a time.
+
+    Line-streaming equivalent of split_by_heading: only the current section is
+    held in memory. As with the regex version, a heading line with nothing
+    after the '#'s takes its text from the next non-blank line.
+    """
+    for _, heading, body in _iter_sections(lines, level=level):
+        yield heading, body
+
+
 def split_by_heading(md_text: str, level: int = 1) -> List[Tuple[str, str]]:
     """Split markdown into blocks each starting with a heading of `level`.
 
     Returns list of tuples: (heading_text, body_text) where body_text does NOT include the heading line.
     If there is content before the first matching heading, it will be returned as a chunk with heading '' (empty).
     """
-    pattern = re.compile(rf"^({'#' * level})\s*(.*)$", re.MULTILINE)
-    parts = []
-    last_pos = 0
-    matches = list(pattern.finditer(md_text))
-
-    if not matches:
-        # no matching headings at this level -> return entire document as one chunk
-        return [("", md_text.strip())]
-
-    # if content before first heading
-    first = matches[0]
-    if first.start() > 0:
-        pre = md_text[: first.start()].strip()
-        if pre:
-            parts.append(("", pre))
+    return list(iter_sections(io.StringIO(md_text, newline="\n"), level=level))
 
-    for i, m in enumerate(matches):
-        heading = m.group(2).strip()
-        start = m.end()
-        end = matches[i + 1].start() if i + 1 < len(matches) else len(md_text)
-        body = md_text[start:end].strip()
-        parts.append((heading, body))
 
-    return parts
-
-
-def split_long_chunk(block_text: str, max_chars: int) -> List[str]:
+def split_long_chunk(block_text: str, max_chars: int, counter: Optional[TokenCounter] = None) -> List[str]:
     """Split a long chunk into shorter subchunks by blank-line paragraph boundaries.
 
     If paragraphs are still too long, forcibly chunk by max_chars.
+    With a TokenCounter, max_chars is a token budget and sizes are token counts.
     """
-    if len(block_text) <= max_chars:
+    if counter is not None:
+        if counter.count(block_text) <= max_chars:
+            return [block_text]
+    elif len(block_text) <= max_chars:
         return [block_text]
 
-    paragraphs = re.split(r"\n\s*\n", block_text)
+    paragraphs = [p.strip() for p in re.split(r"\n\s*\n", block_text)]
+    paragraphs = [p for p in paragraphs if p]
+    if counter is not None:
+        # one batched tokenizer call for the whole section; the blank-line separator adds no tokens
+        sizes = counter.count_batch(paragraphs)
+    else:
+        sizes = [len(p) + 2 for p in paragraphs]  # add separation len
     chunks = []
     cur = []
     cur_len = 0
 
-    for p in paragraphs:
-        p = p.strip()
-        if not p:
-            continue
-        pl = len(p) + 2  # add separation len
+    for p, pl in zip(paragraphs, sizes):
         if cur_len + pl <= max_chars:
             cur.append(p)
             cur_len += pl
@@ -80,11 +121,15 @@ def split_long_chunk(block_text: str, max_chars: int) -> List[str]:
                 chunks.append('\n\n'.join(cur))
             # if this single paragraph is larger than max_chars then force-split
             if pl > max_chars:
-                # naive split at max_chars inside paragraph
-                start = 0
-                while start < len(p):
-                    chunks.append(p[start : start + max_chars])
-                    start += max_chars
+                if counter is not None:
+                    # split at token boundaries
+                    chunks.extend(counter.split(p, max_chars))
+                else:
+                    # naive split at max_chars inside paragraph
+                    start = 0
+                    while start < len(p):
+                        chunks.append(p[start : start + max_chars])
+                        start += max_chars
                 cur = []
                 cur_len = 0
             else:
@@ -105,94 +150,561 @@ def sanitize_filename(s: str, max_len: int = 60) -> str:
     return s or "untitled"
 
 
-def chunk_markdown_file(
-    infile: str,
-    out_dir: str,
-    level: int = 1,
-    max_chars: int = 10000,
-    min_chars: int = 200,
-    split_large: bool = True,
-    prefix: str = "chunk",
-):
-    p = pathlib.Path(infile)
-    text = p.read_text(encoding="utf-8")
-
-    pieces = split_by_heading(text, level=level)
-
-    os.makedirs(out_dir, exist_ok=True)
-    index = []
-    file_no = 1
-
-    raw_chunks = []
-
-    for i, (heading, body) in enumerate(pieces, start=1):
+def _iter_raw_chunks(
+    sections: Iterable[Tuple[int, str, str]],
+    max_chars: int,
+    split_large: bool,
+    max_tokens: Optional[int] = None,
+    counter: Optional[TokenCounter] = None,
+) -> Iterator[Dict[str, str]]:
+    if max_tokens:
+        # size limit in tokens instead of characters
+        max_chars, size = max_tokens, counter.count
+    else:
+        counter, size = None, len
+    for offset, heading, body in sections:
         # Body may be empty but we still create a chunk containing the heading
         full = (f"# {heading}\n\n" + body).strip() if heading else body.strip()
 
         # If split_large and chunk too large, attempt to split by paragraphs
         subchunks = [full]
-        if split_large and len(full) > max_chars and body:
+        if split_large and body and size(full) > max_chars:
             # try to split leaving heading at top of each subchunk
-            body_subs = split_long_chunk(body, max_chars)
+            body_subs = split_long_chunk(body, max_chars, counter)
             subchunks = [f"# {heading}\n\n" + s for s in body_subs]
 
         # Possibly merge very small chunks into the next (if below min_chars) by naive approach.
         # For simplicity, we keep them but you can post-process merging if needed.
 
-        # collect subchunks first so we can merge very small ones later
         for sub in subchunks:
-            raw_chunks.append({"heading": heading, "text": sub.strip()})
+            yield {"heading": heading, "text": sub.strip(), "offset": offset}
+
+
+def _merge_small_chunks(raw_chunks: Iterable[Dict[str, str]], min_chars: int) -> Iterator[Dict[str, str]]:
+    """Merge chunks shorter than min_chars into a neighbour, holding at most one chunk back.
 
+    A small chunk is appended to the previous chunk; with no previous chunk it
+    is prepended to the next one, and a lone small chunk is kept as-is.
+    """
+    held = None  # last big-enough chunk; small ones may still be appended to it
+    carried = None  # small leading chunk waiting to be prepended to the next one
+    for ch in raw_chunks:
+        if carried is not None:
+            ch["text"] = carried["text"] + "\n\n" + ch["text"]
+            ch["offset"] = carried["offset"]
+            carried = None
+        txt = ch["text"]
+        if len(txt) >= min_chars:
+            # big enough to stand alone
+            if held is not None:
+                yield held
+            held = ch
+        elif held is not None:
+            # small chunk: prefer merging into previous merged chunk
+            held["text"] += "\n\n" + txt
+        else:
+            # no previous chunk, merge into next if possible
+            carried = ch
+    if held is not None:
+        yield held
+    if carried is not None:
+        # only chunk and small -> keep as-is
+        yield carried
+
+
+def iter_chunks(
+    fp: Iterable[str],
+    level: int = 1,
+    max_chars: int = 10000,
+    min_chars: int = 200,
+    split_large: bool = True,
+    max_tokens: Optional[int] = None,
+    counter: Optional[TokenCounter] = None,
+) -> Iterator[Dict[str, str]]:
+    """Yield final chunks ({"heading", "text", "offset"}) from a text file object or any iterable of lines.
+
+    The input is consumed line by line and chunks are produced as soon as they
+    are final, so memory is bounded by a section rather than by the file.
+    The chunks are the same as chunk_markdown_file writes.
+    If max_tokens is given (together with a TokenCounter), sections are sized in
+    tokens instead of max_chars characters.
+    "offset" is the UTF-8 byte offset of the section the chunk starts in
+    (counted on the decoded text, i.e. after newline translation).
+    """
+    if max_tokens and counter is None:
+        raise ValueError("max_tokens requires a TokenCounter")
+    chunks = _iter_raw_chunks(_iter_sections(fp, level=level), max_chars, split_large, max_tokens, counter)
     # If min_chars is set, merge very small chunks into neighboring chunks
-    if min_chars and min_chars > 0 and raw_chunks:
-        merged = []
-        for idx, ch in enumerate(raw_chunks):
-            txt = ch["text"]
-            if len(txt) >= min_chars:
-                # big enough to stand alone
-                merged.append(ch)
+    if min_chars and min_chars > 0:
+        chunks = _merge_small_chunks(chunks, min_chars)
+    return chunks
+
+
+ATX_HEADING_RE = re.compile(r"^(#{1,6})(?:[ \t]+(.*?))?(?:[ \t]+#+)?[ \t]*$")
+FENCE_RE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+
+
+class Section:
+    """One node of a SectionTree: a heading and everything up to the next heading of the same or higher level.
+
+    start/body_start/end are byte offsets into the source: start is the heading
+    line, body_start the line after it, end the start of the next sibling (or EOF).
+    The root has level 0, no title and spans the whole document.
+    """
+
+    __slots__ = ("level", "title", "start", "body_start", "end", "parent", "children")
+
+    def __init__(self, level: int, title: str, start: int, body_start: int, parent: Optional["Section"] = None):
+        self.level = level
+        self.title = title
+        self.start = start
+        self.body_start = body_start
+        self.end = body_start
+        self.parent = parent
+        self.children: List["Section"] = []
+
+    @property
+    def own_end(self) -> int:
+        """End of this section's own text, before its first subsection."""
+        return self.children[0].start if self.children else self.end
+
+    @property
+    def titles(self) -> List[str]:
+        node, titles = self, []
+        while node is not None and node.level > 0:
+            titles.append(node.title)
+            node = node.parent
+        return titles[::-1]
+
+    @property
+    def path(self) -> str:
+        return " > ".join(self.titles)
+
+    def __repr__(self):
+        return f"Section(level={self.level}, title={self.title!r}, start={self.start}, end={self.end})"
+
+
+class SectionTree:
+    """H1..H6 section tree built in one pass over the source; chunks are cut from byte ranges.
+
+    The tree only stores offsets. Text is read back from the file (or the
+    in-memory source) when chunks are produced, so the same tree can be
+    chunked at different levels or size budgets without re-parsing.
+    Headings inside fenced code blocks are ignored.
+    """
+
+    # a section with subsections longer than budget * this many bytes is assumed not to fit a
+    # token budget and is split without being read; tokens this long only come from odd input
+    # like huge unknown words, and splitting such a section is still a valid chunking
+    MAX_BYTES_PER_TOKEN = 64
+
+    def __init__(self, root: Section, path: Optional[str] = None, data: Optional[bytes] = None):
+        self.root = root
+        self.path = path
+        self.data = data
+
+    @classmethod
+    def from_file(cls, path: str) -> "SectionTree":
+        with open(path, "rb") as fh:
+            return cls(cls._build(fh), path=path)
+
+    @classmethod
+    def from_text(cls, md_text: str) -> "SectionTree":
+        data = md_text.encode("utf-8")
+        return cls(cls._build(io.BytesIO(data)), data=data)
+
+    @staticmethod
+    def _build(lines: Iterable[bytes]) -> Section:
+        root = Section(0, "", 0, 0)
+        stack = [root]
+        fence = None  # opening fence marker while inside a fenced code block
+        pos = 0
+        for raw in lines:
+            line = raw.decode("utf-8").rstrip("\r\n")
+            fm = FENCE_RE.match(line)
+            if fence is not None:
+                if fm and fm.group(1)[0] == fence[0] and len(fm.group(1)) >= len(fence):
+                    fence = None
+            elif fm:
+                fence = fm.group(1)
             else:
-                # small chunk: prefer merging into previous merged chunk
-                if merged:
-                    merged[-1]["text"] += "\n\n" + txt
-                else:
-                    # no previous chunk, merge into next if possible
-                    if idx + 1 < len(raw_chunks):
-                        raw_chunks[idx + 1]["text"] = txt + "\n\n" + raw_chunks[idx + 1]["text"]
-                    else:
-                        # only chunk and small -> keep as-is
-                        merged.append(ch)
-        raw_chunks = merged
-
-    # write final chunks to disk
-    for chunk in raw_chunks:
-        heading = chunk.get("heading", "")
-        sub = chunk.get("text", "")
-        nice = sanitize_filename(heading or f"part_{file_no}")
-        fname = f"{file_no:03d}_{prefix}_{nice}.md"
-        out_path = os.path.join(out_dir, fname)
-        with open(out_path, "w", encoding="utf-8") as fh:
-            fh.write(sub.strip() + "\n")
-        index.append({"file": fname, "heading": heading, "chars": len(sub)})
-        file_no += 1
-
-    # save index
-    with open(os.path.join(out_dir, "index.json"), "w", encoding="utf-8") as fh:
-        json.dump(index, fh, ensure_ascii=False, indent=2)
+                m = ATX_HEADING_RE.match(line)
+                if m:
+                    level = len(m.group(1))
+                    while stack[-1].level >= level:
+                        stack.pop().end = pos
+                    node = Section(level, (m.group(2) or "").strip(), pos, pos + len(raw), parent=stack[-1])
+                    stack[-1].children.append(node)
+                    stack.append(node)
+            pos += len(raw)
+        for node in stack:
+            node.end = pos
+        return root
+
+    def iter_sections(self) -> Iterator[Section]:
+        """All sections in document order (pre-order), excluding the root."""
+        todo = list(reversed(self.root.children))
+        while todo:
+            node = todo.pop()
+            yield node
+            todo.extend(reversed(node.children))
+
+    def _reader(self, fh):
+        def read(start: int, end: int) -> str:
+            if fh is None:
+                raw = self.data[start:end]
+            else:
+                fh.seek(start)
+                raw = fh.read(end - start)
+            return raw.decode("utf-8").replace("\r\n", "\n")
+
+        return read
+
+    def text(self, start: int, end: int) -> str:
+        if self.data is not None:
+            return self._reader(None)(start, end)
+        with open(self.path, "rb") as fh:
+            return self._reader(fh)(start, end)
+
+    def chunks(
+        self,
+        level: Optional[int] = None,
+        max_chars: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+        counter: Optional[TokenCounter] = None,
+    ) -> Iterator[Dict]:
+        """Yield chunks ({"heading", "path", "level", "text", "offset"}) in document order.
+
+        level: every section at this heading level becomes one chunk including its
+            subsections; shallower sections contribute only their own text.
+        max_chars / max_tokens: a section larger than the budget is broken up into
+            its own text plus its subsections, recursively; a section with no
+            subsections is split by paragraphs (split_long_chunk).
+        With neither, the whole document is a single chunk.
+        """
+        if max_tokens:
+            if counter is None:
+                raise ValueError("max_tokens requires a TokenCounter")
+            budget, size = max_tokens, counter.count
+            max_bytes = budget * self.MAX_BYTES_PER_TOKEN
+        else:
+            budget, size, counter = max_chars, len, None
+            max_bytes = budget * 4 if budget is not None else None  # a UTF-8 char is at most 4 bytes
+
+        fh = open(self.path, "rb") if self.data is None else None
+        try:
+            read = self._reader(fh)
+            yield from self._chunks(self.root, read, level, budget, size, counter, max_bytes)
+        finally:
+            if fh is not None:
+                fh.close()
+
+    def _chunks(self, node: Section, read, level, budget, size, counter, max_bytes) -> Iterator[Dict]:
+        deep_enough = level is None or node.level >= level
+        if deep_enough or not node.children:
+            # a section with subsections is only read whole if its byte length could still fit
+            # the budget, so an oversized section (e.g. the whole document) is never loaded
+            if not node.children or budget is None or node.end - node.start <= max_bytes:
+                whole = read(node.start, node.end).strip()
+                if not node.children or budget is None or size(whole) <= budget:
+                    yield from self._emit(node, whole, node.end, read, budget, size, counter)
+                    return
+        # own text first, then each subsection
+        own = read(node.start, node.own_end).strip()
+        if own:
+            yield from self._emit(node, own, node.own_end, read, budget, size, counter)
+        for child in node.children:
+            yield from self._chunks(child, read, level, budget, size, counter, max_bytes)
+
+    def _emit(self, node: Section, text: str, end: int, read, budget, size, counter) -> Iterator[Dict]:
+        chunk = {"heading": node.title, "path": node.path, "level": node.level, "offset": node.start}
+        if budget is None or size(text) <= budget:
+            yield {**chunk, "text": text}
+            return
+        # too large: split the body by paragraphs, repeating the heading line on each piece
+        heading_line = read(node.start, node.body_start).strip()
+        body = read(node.body_start, end).strip()
+        for sub in split_long_chunk(body, budget, counter):
+            yield {**chunk, "text": (f"{heading_line}\n\n{sub}" if heading_line else sub).strip()}
+
+
+def write_chunks(chunks: Iterable[Dict[str, str]], out_dir: str, prefix: str = "chunk") -> List[Dict]:
+    """Write each chunk to its own .md file as it arrives and stream index.json alongside.
+
+    index.json is written entry by entry (same layout as json.dump(index, indent=2))
+    so an interrupted run still leaves every finished chunk listed up to that point.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    index = []
+    file_no = 1
+
+    with open(os.path.join(out_dir, "index.json"), "w", encoding="utf-8") as idx_fh:
+        idx_fh.write("[")
+        # write final chunks to disk
+        for chunk in chunks:
+            heading = chunk.get("heading", "")
+            sub = chunk.get("text", "")
+            nice = sanitize_filename(heading or f"part_{file_no}")
+            fname = f"{file_no:03d}_{prefix}_{nice}.md"
+            out_path = os.path.join(out_dir, fname)
+            with open(out_path, "w", encoding="utf-8") as fh:
+                fh.write(sub.strip() + "\n")
+            entry = {"file": fname, "heading": heading, "chars": len(sub)}
+            if "path" in chunk:
+                # heading path from the section tree, e.g. "Chapter > Section"
+                entry = {"file": fname, "heading": heading, "path": chunk["path"], "chars": len(sub)}
+            index.append(entry)
+            entry_json = json.dumps(entry, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+            idx_fh.write(("," if file_no > 1 else "") + "\n  " + entry_json)
+            idx_fh.flush()
+            file_no += 1
+        idx_fh.write("\n]" if index else "]")
 
     return index
 
 
+def chunk_markdown_file(
+    infile: str,
+    out_dir: str,
+    level: int = 1,
+    max_chars: int = 10000,
+    min_chars: int = 200,
+    split_large: bool = True,
+    prefix: str = "chunk",
+    max_tokens: Optional[int] = None,
+    counter: Optional[TokenCounter] = None,
+    tree: Optional[SectionTree] = None,
+):
+    """Chunk infile and write chunk files plus index.json to out_dir.
+
+    If `tree` is given (SectionTree.from_file(infile)), chunks are cut from the
+    section tree instead: every section at `level` (H1..H6, subsections included)
+    becomes a chunk, oversized ones are broken down along the hierarchy, and each
+    index entry gets the full heading "path". The same tree can be passed again
+    with a different level or budget without re-reading the headings.
+    """
+    if tree is not None:
+        chunks = tree.chunks(
+            level=level,
+            max_chars=max_chars if split_large else None,
+            max_tokens=max_tokens if split_large else None,
+            counter=counter,
+        )
+        if min_chars and min_chars > 0:
+            chunks = _merge_small_chunks(chunks, min_chars)
+        return write_chunks(chunks, out_dir, prefix=prefix)
+
+    with open(infile, "r", encoding="utf-8") as fp:
+        chunks = iter_chunks(
+            fp,
+            level=level,
+            max_chars=max_chars,
+            min_chars=min_chars,
+            split_large=split_large,
+            max_tokens=max_tokens,
+            counter=counter,
+        )
+        return write_chunks(chunks, out_dir, prefix=prefix)
+
+
+# per-process TokenCounter cache for chunk_directory workers, keyed by tokenizer path
+_worker_counters: Dict[str, TokenCounter] = {}
+
+
+def _chunk_records(
+    path: str,
+    doc: str,
+    level: int,
+    max_chars: int,
+    min_chars: int,
+    max_tokens: Optional[int],
+    tokenizer_path: Optional[str],
+    tree: bool = False,
+) -> List[Dict]:
+    """Chunk one Markdown file into JSONL records (runs in chunk_directory workers)."""
+    counter = None
+    if max_tokens:
+        counter = _worker_counters.get(tokenizer_path)
+        if counter is None:
+            counter = _worker_counters[tokenizer_path] = TokenCounter.from_file(tokenizer_path)
+    if tree:
+        chunks = SectionTree.from_file(path).chunks(level=level, max_chars=max_chars, max_tokens=max_tokens, counter=counter)
+        if min_chars and min_chars > 0:
+            chunks = _merge_small_chunks(chunks, min_chars)
+        return [
+            {"doc": doc, "heading": c["heading"], "path": c["path"], "text": c["text"], "chars": len(c["text"]), "offset": c["offset"]}
+            for c in chunks
+        ]
+    with open(path, "r", encoding="utf-8") as fp:
+        chunks = iter_chunks(fp, level=level, max_chars=max_chars, min_chars=min_chars, max_tokens=max_tokens, counter=counter)
+        return [
+            {"doc": doc, "heading": c["heading"], "text": c["text"], "chars": len(c["text"]), "offset": c["offset"]}
+            for c in chunks
+        ]
+
+
+class _JsonlSink:
+    """Append records to one JSONL file, or to numbered shards of shard_size records each.
+
+    Output left by an earlier run (the unsharded file and any numbered shards)
+    is removed on open, so a directory read shard by shard never mixes runs.
+    """
+
+    def __init__(self, out_path: str, shard_size: Optional[int] = None):
+        self.out_path = out_path
+        self.shard_size = shard_size
+        self.paths: List[str] = []
+        self._fh = None
+        self._count = 0
+        parent = os.path.dirname(out_path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self._remove_previous()
+
+    def _remove_previous(self):
+        stem, ext = os.path.splitext(self.out_path)
+        shard = re.compile(re.escape(os.path.basename(stem)) + r"-\d{5}" + re.escape(ext or ".jsonl") + "$")
+        stale = glob.glob(f"{glob.escape(stem)}-*{ext or '.jsonl'}")
+        for path in [self.out_path] + [p for p in stale if shard.match(os.path.basename(p))]:
+            if os.path.isfile(path):
+                os.remove(path)
+
+    def _open_next(self):
+        if self._fh is not None:
+            self._fh.close()
+        if self.shard_size:
+            stem, ext = os.path.splitext(self.out_path)
+            path = f"{stem}-{len(self.paths):05d}{ext or '.jsonl'}"
+        else:
+            path = self.out_path
+        self._fh = open(path, "w", encoding="utf-8")
+        self.paths.append(path)
+
+    def write(self, record: Dict):
+        if self._fh is None or (self.shard_size and self._count % self.shard_size == 0):
+            self._open_next()
+        self._fh.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._count += 1
+
+    def close(self):
+        if self._fh is None:
+            # no records: still leave an (empty) output file
+            self._open_next()
+        self._fh.close()
+
+
+def _future_records(doc: str, fut):
+    try:
+        return doc, fut.result(), None
+    except Exception as e:
+        return doc, None, e
+
+
+def _iter_chunk_results(jobs: List[Tuple[str, str]], workers: int, opts: Tuple) -> Iterator[Tuple[str, Optional[List[Dict]], Optional[Exception]]]:
+    """Yield (doc, records, error) per job in input order, serially or on a process pool."""
+    if workers <= 1:
+        for path, doc in jobs:
+            try:
+                yield doc, _chunk_records(path, doc, *opts), None
+            except Exception as e:
+                yield doc, None, e
+        return
+    # at most workers * 2 files in flight so results are written as they complete
+    pending = collections.deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for path, doc in jobs:
+            pending.append((doc, pool.submit(_chunk_records, path, doc, *opts)))
+            if len(pending) >= workers * 2:
+                yield _future_records(*pending.popleft())
+        while pending:
+            yield _future_records(*pending.popleft())
+
+
+def chunk_directory(
+    input_dir: str,
+    out_path: str,
+    workers: int = 1,
+    shard_size: Optional[int] = None,
+    level: int = 1,
+    max_chars: int = 10000,
+    min_chars: int = 200,
+    max_tokens: Optional[int] = None,
+    tokenizer_path: Optional[str] = None,
+    tree: bool = False,
+) -> Dict:
+    """Chunk every *.md file under input_dir (recursively) into a single JSONL stream.
+
+    Each line is {"doc", "heading", "text", "chars", "offset"} where doc is the
+    path relative to input_dir. Records are written in sorted file order, so the
+    output does not depend on `workers`. With shard_size, out_path "chunks.jsonl"
+    becomes chunks-00000.jsonl, chunks-00001.jsonl, ... of at most shard_size lines.
+    A file that fails to chunk is reported and skipped. With tree=True files are
+    chunked through SectionTree and records also carry the heading "path".
+
+    Returns {"docs": n, "chunks": n, "failed": [...], "files": [written paths]}.
+    """
+    if max_tokens and not tokenizer_path:
+        raise ValueError("max_tokens requires tokenizer_path")
+    files = sorted(glob.glob(os.path.join(input_dir, "**", "*.md"), recursive=True))
+    jobs = [(f, os.path.relpath(f, input_dir).replace(os.sep, "/")) for f in files]
+    opts = (level, max_chars, min_chars, max_tokens, tokenizer_path, tree)
+
+    sink = _JsonlSink(out_path, shard_size)
+    summary = {"docs": 0, "chunks": 0, "failed": []}
+    try:
+        for doc, records, err in _iter_chunk_results(jobs, workers, opts):
+            if err is not None:
+                print(f"Failed to chunk {doc}: {err}", file=sys.stderr)
+                summary["failed"].append(doc)
+                continue
+            for rec in records:
+                sink.write(rec)
+            summary["docs"] += 1
+            summary["chunks"] += len(records)
+    finally:
+        sink.close()
+    summary["files"] = sink.paths
+    return summary
+
+
 if __name__ == "__main__":
     ap = argparse.ArgumentParser(description="Chunk a markdown file by headings (and optionally by size)")
-    ap.add_argument("infile")
+    ap.add_argument("infile", help="Markdown file, or a directory of .md files (writes a JSONL chunk stream)")
     ap.add_argument("--out-dir", default="./md_chunks")
     ap.add_argument("--level", type=int, default=1, help="Heading level used for chunk boundaries (1 => '#')")
     ap.add_argument("--max-chars", type=int, default=10000, help="Maximum chars per chunk (will try paragraph-splitting)")
     ap.add_argument("--min-chars", type=int, default=200, help="Minimum chars to consider if merging later (not auto-merged by default)")
     ap.add_argument("--prefix", default="page", help="Filename prefix")
+    ap.add_argument("--max-tokens", type=int, default=None, help="Maximum tokens per chunk (overrides --max-chars; needs --tokenizer)")
+    ap.add_argument("--tokenizer", default=None, help="Local tokenizer.json or WordPiece vocab.txt used with --max-tokens")
+    ap.add_argument("--jsonl", default=None, help="Directory mode: output JSONL path (default: <out-dir>/chunks.jsonl)")
+    ap.add_argument("--shard-size", type=int, default=None, help="Directory mode: max records per JSONL shard")
+    ap.add_argument("--workers", type=int, default=1, help="Directory mode: number of worker processes")
+    ap.add_argument("--tree", action="store_true", help="Chunk along the H1..H6 section tree (sections at --level with subsections, heading path in index)")
     args = ap.parse_args()
 
+    if args.max_tokens and not args.tokenizer:
+        ap.error("--max-tokens requires --tokenizer")
+
+    if os.path.isdir(args.infile):
+        out_path = args.jsonl or os.path.join(args.out_dir, "chunks.jsonl")
+        summary = chunk_directory(
+            args.infile,
+            out_path,
+            workers=args.workers,
+            shard_size=args.shard_size,
+            level=args.level,
+            max_chars=args.max_chars,
+            min_chars=args.min_chars,
+            max_tokens=args.max_tokens,
+            tokenizer_path=args.tokenizer,
+            tree=args.tree,
+        )
+        print(f"Wrote {summary['chunks']} chunks from {summary['docs']} files to {', '.join(summary['files'])}")
+        raise SystemExit(1 if summary["failed"] else 0)
+
+    counter = TokenCounter.from_file(args.tokenizer) if args.max_tokens else None
+
     idx = chunk_markdown_file(
         args.infile,
         args.out_dir,
@@ -201,6 +713,9 @@ if __name__ == "__main__":
         min_chars=args.min_chars,
         split_large=True,
         prefix=args.prefix,
+        max_tokens=args.max_tokens,
+        counter=counter,
+        tree=SectionTree.from_file(args.infile) if args.tree else None,
     )
 
     print(f"Wrote {len(idx)} chunk files to {args.out_dir}")
@@ -1,10 +1,21 @@
 import os
+import array
+import asyncio
+import hashlib
+import sqlite3
+import threading
 import chromadb
-from openai import OpenAI
+import httpx
+from openai import AsyncOpenAI, OpenAI
 import glob
+import itertools
+import json
+import time
 from dotenv import load_dotenv
 from typing import List, Dict
 
+from token_counter import TokenCounter
+
 # 환경 변수 로드
 load_dotenv()
 
@@ -12,7 +23,8 @@ load_dotenv()
 client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
 
 # ChromaDB 클라이언트 초기화 (로컬 저장)
-chroma_client = chromadb.PersistentClient(path="./chroma_db")
+CHROMA_DB_PATH = os.environ.get("CHROMA_DB_PATH", "./chroma_db")
+chroma_client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
 
 # 컬렉션 생성 또는 가져오기
 collection = chroma_client.get_or_create_collection(
@@ -20,16 +32,63 @@ collection = chroma_client.get_or_create_collection(
     metadata={"description": "MD 파일 임베딩 컬렉션"}
 )
 
-def get_openai_embedding(text):
-    """OpenAI API를 사용하여 텍스트 임베딩 생성"""
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "text-embedding-3-small")  # 또는 "text-embedding-3-large"
+
+# 임베딩 배치 요청 설정: 요청당 최대 입력 수 / 최대 토큰 수, 실패한 배치 재시도 횟수
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", "256"))
+EMBED_BATCH_TOKENS = int(os.environ.get("EMBED_BATCH_TOKENS", "250000"))
+EMBED_MAX_RETRIES = int(os.environ.get("EMBED_MAX_RETRIES", "5"))
+EMBED_RETRY_BACKOFF = float(os.environ.get("EMBED_RETRY_BACKOFF", "1.0"))
+
+def get_openai_embeddings(texts):
+    """OpenAI API 한 번의 요청으로 여러 텍스트의 임베딩 생성 (입력 순서대로 반환)"""
     response = client.embeddings.create(
-        model="text-embedding-3-small",  # 또는 "text-embedding-3-large"
-        input=text
+        model=EMBEDDING_MODEL,
+        input=list(texts)
     )
-    return response.data[0].embedding
+    # 응답 순서가 아니라 index 기준으로 입력 순서에 맞춤
+    data = sorted(response.data, key=lambda d: d.index)
+    if len(data) != len(texts):
+        raise ValueError(f"임베딩 개수 불일치: 요청 {len(texts)}개, 응답 {len(data)}개")
+    return [d.embedding for d in data]
+
+def get_openai_embedding(text):
+    """OpenAI API를 사용하여 텍스트 임베딩 생성"""
+    return get_openai_embeddings([text])[0]
+
+def embed_with_retry(texts, max_retries=None, backoff=None):
+    """배치 하나를 임베딩하고, 실패하면 그 배치만 지수 백오프로 재시도"""
+    max_retries = EMBED_MAX_RETRIES if max_retries is None else max_retries
+    backoff = EMBED_RETRY_BACKOFF if backoff is None else backoff
+    for attempt in range(max_retries + 1):
+        try:
+            return get_openai_embeddings(texts)
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            delay = backoff * (2 ** attempt)
+            print(f"  ⏳ 임베딩 요청 실패 ({e}), {delay:.1f}초 후 재시도 ({attempt + 1}/{max_retries})")
+            time.sleep(delay)
+
+# 토큰 기준 청크 분할 (TOKENIZER_PATH를 지정하면 문자 수 대신 토큰 수로 분할)
+TOKENIZER_PATH = os.environ.get("TOKENIZER_PATH")
+MAX_TOKENS = int(os.environ.get("EMBED_MAX_TOKENS", "512"))
+OVERLAP_TOKENS = int(os.environ.get("EMBED_OVERLAP_TOKENS", "64"))
+
+def load_token_counter(path=None):
+    """로컬 토크나이저 파일(tokenizer.json 또는 vocab.txt)로 TokenCounter 생성 (없으면 None)"""
+    path = path or TOKENIZER_PATH
+    return TokenCounter.from_file(path) if path else None
+
+def split_into_chunks(text, chunk_size=1000, overlap=200, counter=None):
+    """텍스트를 chunk로 분할
+
+    counter(TokenCounter)를 넘기면 chunk_size/overlap은 토큰 수로 해석되고,
+    경계는 토큰 경계에 맞춰집니다.
+    """
+    if counter is not None:
+        return [c for c in counter.split(text, chunk_size, overlap) if c.strip()]
 
-def split_into_chunks(text, chunk_size=1000, overlap=200):
-    """텍스트를 chunk로 분할"""
     chunks = []
     start = 0
     
@@ -45,8 +104,534 @@ def split_into_chunks(text, chunk_size=1000, overlap=200):
     
     return chunks
 
-def process_md_files(directory_path):
-    """MD 파일들을 읽어서 임베딩 생성 및 ChromaDB에 저장"""
+# 임베딩 캐시 (빈 값이면 사용 안 함): (모델, 청크 텍스트 해시) → 임베딩
+EMBED_CACHE_PATH = os.environ.get("EMBED_CACHE_PATH", "./embedding_cache.sqlite")
+EMBED_CACHE_MAX_BYTES = int(os.environ.get("EMBED_CACHE_MAX_MB", "1024")) * 1024 * 1024
+
+class EmbeddingCache:
+    """(모델, 텍스트 SHA-256) 키로 임베딩을 저장하는 SQLite 캐시
+
+    - 벡터는 float32 바이트로 저장합니다 (API가 돌려주는 정밀도와 같음).
+    - 저장된 벡터 크기 합이 max_bytes를 넘으면 가장 오래 사용하지 않은 항목부터 삭제합니다.
+    - hits / misses로 적중률을 집계합니다. 여러 스레드에서 함께 사용할 수 있습니다.
+    """
+
+    def __init__(self, path, max_bytes=None):
+        self.path = path
+        self.max_bytes = max_bytes or EMBED_CACHE_MAX_BYTES
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, hash BLOB NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL,"
+            " PRIMARY KEY (model, hash))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def _hash(text):
+        return hashlib.sha256(text.encode("utf-8")).digest()
+
+    def get_many(self, model, texts):
+        """텍스트 순서대로 캐시된 임베딩(없으면 None) 목록 반환"""
+        hashes = [self._hash(t) for t in texts]
+        found = {}
+        with self._lock:
+            # SQLite 변수 개수 제한을 넘지 않도록 나눠서 조회
+            for i in range(0, len(hashes), 500):
+                part = hashes[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({','.join('?' * len(part))})",
+                    [model, *part],
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND hash = ?",
+                    [(now, model, h) for h in found],
+                )
+                self._conn.commit()
+            hit = sum(h in found for h in hashes)
+            self.hits += hit
+            self.misses += len(hashes) - hit
+        result = []
+        for h in hashes:
+            blob = found.get(h)
+            result.append(array.array("f", blob).tolist() if blob is not None else None)
+        return result
+
+    def put_many(self, model, texts, vectors):
+        now = time.time()
+        rows = [(model, self._hash(t), array.array("f", v).tobytes(), now) for t, v in zip(texts, vectors)]
+        with self._lock:
+            for _, h, blob, _ in rows:
+                old = self._conn.execute(
+                    "SELECT LENGTH(vector) FROM embeddings WHERE model = ? AND hash = ?", (model, h)
+                ).fetchone()
+                self._size += len(blob) - (old[0] if old else 0)
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            if self._size > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        # 용량의 90%까지 오래된 순서로 삭제
+        target = int(self.max_bytes * 0.9)
+        cursor = self._conn.execute("SELECT rowid, LENGTH(vector) FROM embeddings ORDER BY last_used")
+        doomed = []
+        for rowid, size in cursor:
+            if self._size <= target:
+                break
+            doomed.append((rowid,))
+            self._size -= size
+        self._conn.executemany("DELETE FROM embeddings WHERE rowid = ?", doomed)
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @property
+    def hit_rate(self):
+        with self._lock:
+            hits, total = self.hits, self.hits + self.misses
+        return hits / total if total else 0.0
+
+    def report(self):
+        with self._lock:
+            hits, total, size = self.hits, self.hits + self.misses, self._size
+        rate = hits / total if total else 0.0
+        return f"임베딩 캐시: 적중 {hits}/{total} ({rate:.1%}), 저장 {size / 1024 / 1024:.1f}MB"
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+# 기본 캐시는 처음 사용할 때 만듦 (모듈을 import만 해도 SQLite 파일이 생기지 않도록)
+embedding_cache = None
+_embedding_cache_lock = threading.Lock()
+
+def get_embedding_cache():
+    """기본 임베딩 캐시 (EMBED_CACHE_PATH가 비어 있으면 None)"""
+    global embedding_cache
+    with _embedding_cache_lock:
+        if embedding_cache is None and EMBED_CACHE_PATH:
+            embedding_cache = EmbeddingCache(EMBED_CACHE_PATH)
+    return embedding_cache
+
+def _cached_embeddings(cache, texts):
+    """캐시 조회 결과(없으면 None 목록)"""
+    if cache is None:
+        return [None] * len(texts)
+    return cache.get_many(EMBEDDING_MODEL, texts)
+
+def _merge_embeddings(texts, cached, fresh, cache):
+    """캐시 결과의 빈 자리를 새로 받은 임베딩으로 채우고, 새 임베딩은 캐시에 저장"""
+    missing = [i for i, v in enumerate(cached) if v is None]
+    if cache is not None and missing:
+        cache.put_many(EMBEDDING_MODEL, [texts[i] for i in missing], fresh)
+    merged = list(cached)
+    for i, v in zip(missing, fresh):
+        merged[i] = v
+    return merged
+
+def chunk_records(chunks, doc_metadata, id_prefix, chunk_metadatas=None, ids=None):
+    """한 문서의 청크들을 저장용 레코드로 변환 (id: ids가 없으면 {id_prefix}_{chunk_index})"""
+    for chunk_idx, chunk in enumerate(chunks):
+        yield {
+            "id": ids[chunk_idx] if ids else f"{id_prefix}_{chunk_idx}",
+            "document": chunk,
+            "metadata": {
+                **doc_metadata,
+                **(chunk_metadatas[chunk_idx] if chunk_metadatas else {}),
+                "chunk_index": chunk_idx,
+                "total_chunks": len(chunks)
+            }
+        }
+
+def estimate_tokens(text, counter=None):
+    """배치 크기 계산용 토큰 수 (토크나이저가 없으면 UTF-8 바이트 수 = BPE 토큰 수의 상한)"""
+    return counter.count(text) if counter is not None else len(text.encode("utf-8"))
+
+def rate_limit_tokens(text, counter=None):
+    """속도 제한(TPM)용 토큰 수 추정
+
+    토크나이저가 있으면 실제 토큰 수, 없으면 max(UTF-8 바이트 수 / 4, 비ASCII 문자 수)를 사용합니다.
+    영어는 약 4바이트당 1토큰이고 한글은 음절당 1토큰 이상이므로 과소 추정(429 재시도)을 피하면서,
+    바이트 수 상한(estimate_tokens)처럼 3~4배 과대 추정하지도 않습니다.
+    """
+    if counter is not None:
+        return counter.count(text)
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return max(-(-len(text.encode("utf-8")) // 4), non_ascii)
+
+def iter_embedding_batches(records, max_items=None, max_tokens=None, counter=None):
+    """레코드를 파일 경계와 상관없이 입력 수 / 토큰 수 제한에 맞춰 배치로 묶기"""
+    max_items = max_items or EMBED_BATCH_SIZE
+    max_tokens = max_tokens or EMBED_BATCH_TOKENS
+    batch, batch_tokens = [], 0
+    for record in records:
+        n = estimate_tokens(record["document"], counter)
+        if batch and (len(batch) >= max_items or batch_tokens + n > max_tokens):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(record)
+        batch_tokens += n
+    if batch:
+        yield batch
+
+# ChromaDB 쓰기 버퍼: upsert 한 번에 보낼 레코드 수 / 버퍼 메모리 상한
+CHROMA_WRITE_BATCH = int(os.environ.get("CHROMA_WRITE_BATCH", "2000"))
+CHROMA_WRITE_MAX_BYTES = int(os.environ.get("CHROMA_WRITE_MAX_MB", "64")) * 1024 * 1024
+
+def _chroma_max_batch_size():
+    """ChromaDB가 upsert 한 번에 받을 수 있는 최대 레코드 수 (알 수 없으면 None)"""
+    try:
+        return chroma_client.get_max_batch_size()
+    except Exception:
+        return None
+
+class ChromaWriter:
+    """레코드를 모았다가 큰 collection.upsert 단위로 저장하는 버퍼
+
+    - 버퍼가 batch_size에 도달하면 다음 파일 경계(source_path가 바뀔 때)에서 flush
+      → 파일 하나의 청크는 가능한 한 같은 flush에 함께 들어갑니다.
+    - 버퍼 크기 추정치가 max_bytes를 넘으면 파일 경계와 상관없이 즉시 flush
+    - upsert 한 번은 min(batch_size, ChromaDB 최대 배치 크기)개를 넘지 않도록 나눠 보냅니다.
+    - add 대신 upsert를 사용하므로 같은 id로 다시 실행해도 실패하지 않습니다.
+    """
+
+    def __init__(self, target=None, batch_size=None, max_bytes=None):
+        self.target = target
+        self.batch_size = batch_size or CHROMA_WRITE_BATCH
+        self.max_bytes = max_bytes or CHROMA_WRITE_MAX_BYTES
+        max_batch = _chroma_max_batch_size()
+        self.max_rows = min(self.batch_size, max_batch) if max_batch else self.batch_size
+        self._buffer = []
+        self._bytes = 0
+        self._source = None
+        self.written = 0
+        self.flushes = 0
+
+    @staticmethod
+    def _record_bytes(record, embedding):
+        # 대략적인 메모리 추정: 문서 UTF-8 바이트 + float 임베딩 + 메타데이터
+        return len(record["document"].encode("utf-8")) + 8 * len(embedding) + len(repr(record["metadata"]))
+
+    def write(self, record, embedding):
+        source = record["metadata"].get("source_path")
+        if source != self._source:
+            if len(self._buffer) >= self.batch_size:
+                self.flush()
+            self._source = source
+        self._buffer.append((record, embedding))
+        self._bytes += self._record_bytes(record, embedding)
+        if self._bytes >= self.max_bytes:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        # upsert가 실패해도 같은 버퍼를 다시 보내지 않도록 먼저 비움
+        buffer, self._buffer, self._bytes = self._buffer, [], 0
+        target = self.target if self.target is not None else collection
+        for i in range(0, len(buffer), self.max_rows):
+            part = buffer[i:i + self.max_rows]
+            target.upsert(
+                embeddings=[e for _, e in part],
+                documents=[r["document"] for r, _ in part],
+                metadatas=[r["metadata"] for r, _ in part],
+                ids=[r["id"] for r, _ in part]
+            )
+            self.written += len(part)
+            self.flushes += 1
+            print(f"  💾 {len(part)}개 청크 저장 (누적 {self.written}개)")
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # 예외가 나도 이미 임베딩한 레코드는 저장 (저장 오류가 원래 예외를 가리지 않게 함)
+        if exc_type is None:
+            self.close()
+            return
+        try:
+            self.close()
+        except Exception as e:
+            print(f"  ❌ 남은 청크 저장 실패: {e}")
+
+def embed_and_store(records, max_items=None, max_tokens=None, counter=None, writer=None, cache=None,
+                    failed_sources=None):
+    """레코드를 배치로 임베딩하여 ChromaDB에 저장, (저장 수, 실패 수) 반환
+
+    재시도 후에도 실패한 배치는 건너뛰고 나머지 배치는 계속 처리합니다.
+    저장은 ChromaWriter 버퍼를 거쳐 큰 upsert 단위로 이루어집니다.
+    API 호출 전에 임베딩 캐시(cache, 기본 get_embedding_cache())를 먼저 확인하고 없는 청크만 요청합니다.
+    failed_sources(set)를 넘기면 실패한 배치에 포함된 source_path를 모읍니다.
+    """
+    cache = get_embedding_cache() if cache is None else (cache or None)  # cache=False: 캐시 사용 안 함
+    failed = 0
+    with (writer or ChromaWriter()) as out:
+        for batch in iter_embedding_batches(records, max_items, max_tokens, counter):
+            texts = [r["document"] for r in batch]
+            try:
+                cached = _cached_embeddings(cache, texts)
+                missing = [t for t, v in zip(texts, cached) if v is None]
+                fresh = embed_with_retry(missing) if missing else []
+                embeddings = _merge_embeddings(texts, cached, fresh, cache)
+            except Exception as e:
+                docs = sorted({r["metadata"]["source_path"] for r in batch})
+                print(f"  ❌ 배치 임베딩 실패 ({len(batch)}개 청크, {', '.join(docs)}): {str(e)}")
+                failed += len(batch)
+                if failed_sources is not None:
+                    failed_sources.update(docs)
+                continue
+            
+            for record, embedding in zip(batch, embeddings):
+                out.write(record, embedding)
+    if cache is not None:
+        print(f"  🗄️ {cache.report()}")
+    return out.written, failed
+
+# 동시 임베딩 파이프라인 설정 (EMBED_CONCURRENCY > 1 이면 사용)
+EMBED_CONCURRENCY = int(os.environ.get("EMBED_CONCURRENCY", "1"))
+EMBED_RPM = int(os.environ.get("EMBED_RPM", "3000"))  # 분당 요청 수 제한 (0 = 제한 없음)
+EMBED_TPM = int(os.environ.get("EMBED_TPM", "1000000"))  # 분당 토큰 수 제한 (0 = 제한 없음)
+PIPELINE_QUEUE_SIZE = int(os.environ.get("PIPELINE_QUEUE_SIZE", "8"))  # 단계 사이 큐에 대기할 최대 배치 수
+
+class TokenBucket:
+    """분당 한도(per_minute)를 갖는 토큰 버킷 (asyncio용)
+
+    가득 찬 상태에서 시작하며 초당 per_minute / 60 만큼 채워집니다.
+    per_minute가 0이면 제한하지 않습니다.
+    """
+
+    def __init__(self, per_minute, clock=time.monotonic):
+        self.capacity = per_minute
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.clock = clock
+        self.updated = clock()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount=1):
+        if not self.capacity:
+            return
+        # 한도보다 큰 요청은 버킷을 가득 채운 뒤 통과 (영원히 대기하지 않도록)
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+def make_async_client(concurrency=None):
+    """연결 풀을 공유하는 AsyncOpenAI 클라이언트 (OPENAI_BASE_URL로 엔드포인트 변경 가능)"""
+    concurrency = concurrency or EMBED_CONCURRENCY
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        timeout=httpx.Timeout(60.0, connect=10.0),
+    )
+    return AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"), http_client=http_client)
+
+async def aembed_with_retry(aclient, texts, max_retries=None, backoff=None):
+    """embed_with_retry의 비동기 버전"""
+    max_retries = EMBED_MAX_RETRIES if max_retries is None else max_retries
+    backoff = EMBED_RETRY_BACKOFF if backoff is None else backoff
+    for attempt in range(max_retries + 1):
+        try:
+            response = await aclient.embeddings.create(model=EMBEDDING_MODEL, input=list(texts))
+            data = sorted(response.data, key=lambda d: d.index)
+            if len(data) != len(texts):
+                raise ValueError(f"임베딩 개수 불일치: 요청 {len(texts)}개, 응답 {len(data)}개")
+            return [d.embedding for d in data]
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            delay = backoff * (2 ** attempt)
+            print(f"  ⏳ 임베딩 요청 실패 ({e}), {delay:.1f}초 후 재시도 ({attempt + 1}/{max_retries})")
+            await asyncio.sleep(delay)
+
+async def run_embedding_pipeline(records, aclient=None, concurrency=None, rpm=None, tpm=None,
+                                 max_items=None, max_tokens=None, counter=None, writer=None,
+                                 queue_size=None, cache=None, failed_sources=None):
+    """읽기/청크 → 임베딩 → 저장을 동시에 실행하는 파이프라인
+
+    - 읽기/청크 분할과 배치 구성은 별도 스레드에서 실행되어 크기가 제한된 큐에 배치를 넣습니다.
+    - concurrency개의 작업자가 동시에 임베딩을 요청하며, 요청 수/토큰 수는 TokenBucket으로 제한합니다.
+    - 저장 작업자 하나가 결과를 ChromaWriter에 씁니다 (쓰기는 스레드에서 실행).
+    - 배치를 만들 때 임베딩 캐시를 조회하여, 캐시에 없는 청크만 요청하고 속도 제한에 반영합니다.
+    반환: {"stored", "failed", "requests", "cache_hits", "seconds", "chunks_per_sec"}
+    """
+    cache = get_embedding_cache() if cache is None else (cache or None)  # cache=False: 캐시 사용 안 함
+    concurrency = concurrency or EMBED_CONCURRENCY
+    queue_size = queue_size or PIPELINE_QUEUE_SIZE
+    rpm_bucket = TokenBucket(EMBED_RPM if rpm is None else rpm)
+    tpm_bucket = TokenBucket(EMBED_TPM if tpm is None else tpm)
+    own_client = aclient is None
+    aclient = aclient or make_async_client(concurrency)
+    out = writer or ChromaWriter()
+    loop = asyncio.get_running_loop()
+    batch_q = asyncio.Queue(maxsize=queue_size)
+    result_q = asyncio.Queue(maxsize=queue_size)
+    stats = {"stored": 0, "failed": 0, "requests": 0, "cache_hits": 0}
+    started = time.perf_counter()
+
+    stop = threading.Event()
+    producer_errors = []
+
+    def produce():
+        # 큐가 가득 차면 put이 끝날 때까지 이 스레드가 대기 → 읽기 속도가 임베딩 속도에 맞춰짐
+        try:
+            for batch in iter_embedding_batches(records, max_items, max_tokens, counter):
+                if stop.is_set():
+                    return
+                texts = [r["document"] for r in batch]
+                cached = _cached_embeddings(cache, texts)
+                tokens = sum(rate_limit_tokens(t, counter) for t, v in zip(texts, cached) if v is None)
+                asyncio.run_coroutine_threadsafe(batch_q.put((batch, cached, tokens)), loop).result()
+        except Exception as e:
+            producer_errors.append(e)
+        finally:
+            if not stop.is_set():
+                for _ in range(concurrency):
+                    asyncio.run_coroutine_threadsafe(batch_q.put(None), loop).result()
+
+    async def embed_worker():
+        while True:
+            item = await batch_q.get()
+            if item is None:
+                return
+            batch, cached, tokens = item
+            texts = [r["document"] for r in batch]
+            missing = [t for t, v in zip(texts, cached) if v is None]
+            stats["cache_hits"] += len(texts) - len(missing)
+            try:
+                fresh = []
+                if missing:
+                    await rpm_bucket.acquire(1)
+                    await tpm_bucket.acquire(tokens)
+                    stats["requests"] += 1
+                    fresh = await aembed_with_retry(aclient, missing)
+                embeddings = await asyncio.to_thread(_merge_embeddings, texts, cached, fresh, cache)
+            except Exception as e:
+                docs = sorted({r["metadata"]["source_path"] for r in batch})
+                print(f"  ❌ 배치 임베딩 실패 ({len(batch)}개 청크, {', '.join(docs)}): {str(e)}")
+                stats["failed"] += len(batch)
+                if failed_sources is not None:
+                    failed_sources.update(docs)
+                continue
+            await result_q.put((batch, embeddings))
+
+    def write_batch(batch, embeddings):
+        for record, embedding in zip(batch, embeddings):
+            out.write(record, embedding)
+
+    async def store_worker():
+        while True:
+            item = await result_q.get()
+            if item is None:
+                return
+            await asyncio.to_thread(write_batch, *item)
+
+    async def embed_stage():
+        await asyncio.gather(*(embed_worker() for _ in range(concurrency)))
+        await result_q.put(None)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    tasks = [asyncio.create_task(embed_stage()), asyncio.create_task(store_worker())]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        # 오류로 중단된 경우: 작업자를 취소하고, 대기 중인 생산자 스레드가 끝나도록 큐를 비움
+        stop.set()
+        for task in tasks:
+            task.cancel()
+        while producer.is_alive():
+            while not batch_q.empty():
+                batch_q.get_nowait()
+            await asyncio.sleep(0.01)
+        await asyncio.to_thread(out.close)
+        if own_client:
+            await aclient.close()
+    if producer_errors:
+        raise producer_errors[0]
+
+    stats["stored"] = out.written
+    stats["seconds"] = time.perf_counter() - started
+    stats["chunks_per_sec"] = stats["stored"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
+
+def store_records(records, counter=None, concurrency=None, failed_sources=None):
+    """레코드를 임베딩/저장: concurrency > 1이면 동시 파이프라인, 아니면 순차 배치 처리 → (저장 수, 실패 수)"""
+    concurrency = concurrency or EMBED_CONCURRENCY
+    if concurrency > 1:
+        stats = asyncio.run(run_embedding_pipeline(records, concurrency=concurrency, counter=counter,
+                                                   failed_sources=failed_sources))
+        print(f"  ⚡ {stats['requests']}개 요청, {stats['seconds']:.1f}초, 초당 {stats['chunks_per_sec']:.1f}개 청크")
+        if embedding_cache is not None:
+            print(f"  🗄️ {embedding_cache.report()}")
+        return stats["stored"], stats["failed"]
+    return embed_and_store(records, counter=counter, failed_sources=failed_sources)
+
+def iter_jsonl_chunks(path):
+    """md_chunker 디렉토리 모드가 만든 JSONL 청크 스트림 읽기
+
+    path는 JSONL 파일 하나 또는 샤드(*.jsonl)가 들어있는 디렉토리입니다.
+    각 레코드: {"doc", "heading", "text", "chars", "offset"}
+    """
+    paths = sorted(glob.glob(os.path.join(path, "*.jsonl"))) if os.path.isdir(path) else [path]
+    for p in paths:
+        with open(p, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+def _jsonl_records(path):
+    # 같은 문서의 레코드는 연속으로 기록되어 있으므로 문서 단위로 묶어서 처리
+    for doc, records in itertools.groupby(iter_jsonl_chunks(path), key=lambda r: r["doc"]):
+        records = [r for r in records if r["text"].strip()]
+        if not records:
+            continue
+        print(f"\n처리 중: {doc} ({len(records)}개 청크)")
+        doc_metadata = {
+            "source_file": os.path.basename(doc),
+            "source_path": doc
+        }
+        yield from chunk_records(
+            [r["text"] for r in records],
+            doc_metadata,
+            doc,
+            chunk_metadatas=[
+                {"heading": r["heading"], "offset": r["offset"], **({"path": r["path"]} if "path" in r else {})}
+                for r in records
+            ],
+        )
+
+def process_jsonl_chunks(path, counter=None, concurrency=None):
+    """JSONL 청크 스트림을 다시 나누지 않고 그대로 임베딩하여 ChromaDB에 저장"""
+    stored, failed = store_records(_jsonl_records(path), counter=counter, concurrency=concurrency)
+    if failed:
+        print(f"⚠️ {failed}개 청크는 임베딩에 실패했습니다.")
+    return stored
+
+def process_md_files(directory_path, counter=None, max_tokens=MAX_TOKENS, overlap_tokens=OVERLAP_TOKENS, concurrency=None):
+    """MD 파일들을 읽어서 임베딩 생성 및 ChromaDB에 저장
+
+    counter가 주어지면 max_tokens/overlap_tokens 기준으로 청크를 나눕니다.
+    """
     
     md_files = glob.glob(f"{directory_path}/**/*.md", recursive=True)
     
@@ -56,8 +641,37 @@ def process_md_files(directory_path):
     
     print(f"총 {len(md_files)}개의 MD 파일을 찾았습니다.")
     
-    total_chunks = 0
+    root_key = os.path.abspath(directory_path)
+    planned = {}
+    
+    def chunk_ids(file_path, chunks):
+        rel = os.path.relpath(file_path, directory_path).replace(os.sep, "/")
+        planned[file_path] = content_chunk_ids(rel, chunks, root=root_key)
+        return planned[file_path]
+    
+    # 파일별로 청크를 만들고, 임베딩은 파일 경계를 넘어 배치로 요청
+    failed_sources = set()
+    records = _md_file_records(md_files, counter, max_tokens, overlap_tokens, chunk_ids=chunk_ids)
+    total_chunks, failed = store_records(records, counter=counter, concurrency=concurrency,
+                                         failed_sources=failed_sources)
+    if failed:
+        print(f"⚠️ {failed}개 청크는 임베딩에 실패했습니다.")
     
+    # 새 벡터가 모두 저장된 파일만 이전 벡터(이전 내용/이전 방식 id)를 삭제
+    # → 임베딩에 실패한 파일은 이전 벡터가 그대로 남음
+    stale = []
+    for file_path, ids in planned.items():
+        if file_path not in failed_sources:
+            stale.extend(_stale_source_ids(file_path, ids))
+    _delete_ids(stale)
+    
+    return total_chunks
+
+def _md_file_records(md_files, counter, max_tokens, overlap_tokens, chunk_ids=None):
+    """파일별로 청크를 만들어 레코드로 내보냄
+
+    chunk_ids(file_path, chunks)가 주어지면 그 반환값을 청크 id로 사용합니다 (빈 파일도 호출).
+    """
     for idx, file_path in enumerate(md_files):
         print(f"\n처리 중: {file_path} ({idx+1}/{len(md_files)})")
         
@@ -66,43 +680,153 @@ def process_md_files(directory_path):
                 content = f.read()
             
             # 텍스트를 청크로 분할
-            chunks = split_into_chunks(content)
-            
-            if not chunks:
-                print(f"  ⚠️ 파일이 비어있거나 처리할 수 없습니다.")
-                continue
-            
-            # 메타데이터 생성
-            doc_metadata = {
-                "source_file": os.path.basename(file_path),
-                "source_path": file_path
-            }
-            
-            for chunk_idx, chunk in enumerate(chunks):
-                # 임베딩 생성
-                embedding = get_openai_embedding(chunk)
-                
-                # ChromaDB에 저장
-                doc_id = f"{os.path.basename(file_path)}_{chunk_idx}"
-                
-                collection.add(
-                    embeddings=[embedding],
-                    documents=[chunk],
-                    metadatas=[{
-                        **doc_metadata,
-                        "chunk_index": chunk_idx,
-                        "total_chunks": len(chunks)
-                    }],
-                    ids=[doc_id]
-                )
-            
-            total_chunks += len(chunks)
-            print(f"  ✅ {len(chunks)}개 청크 처리 완료")
-            
+            if counter is not None:
+                chunks = split_into_chunks(content, max_tokens, overlap_tokens, counter=counter)
+            else:
+                chunks = split_into_chunks(content)
         except Exception as e:
             print(f"  ❌ 오류 발생: {str(e)}")
+            continue
+        
+        ids = chunk_ids(file_path, chunks) if chunk_ids else None
+        if not chunks:
+            print(f"  ⚠️ 파일이 비어있거나 처리할 수 없습니다.")
+            continue
+        
+        # 메타데이터 생성
+        doc_metadata = {
+            "source_file": os.path.basename(file_path),
+            "source_path": file_path
+        }
+        
+        print(f"  ✅ {len(chunks)}개 청크 준비 완료")
+        yield from chunk_records(chunks, doc_metadata, os.path.basename(file_path), ids=ids)
+
+# 증분 색인 매니페스트: 색인한 디렉토리별로 파일 해시와 청크 id 목록을 기록
+INDEX_MANIFEST_PATH = os.environ.get("INDEX_MANIFEST_PATH", os.path.join(CHROMA_DB_PATH, "index_manifest.json"))
+INDEX_MANIFEST_VERSION = 1
+
+def _file_sha256(path, bufsize=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(bufsize), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _load_index_manifest(path=None):
+    """매니페스트 읽기 (없거나 읽을 수 없으면 빈 매니페스트)"""
+    path = path or INDEX_MANIFEST_PATH
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") == INDEX_MANIFEST_VERSION and isinstance(data.get("roots"), dict):
+            return data
+    except (OSError, ValueError):
+        pass
+    return {"version": INDEX_MANIFEST_VERSION, "roots": {}}
+
+def _save_index_manifest(manifest, path=None):
+    path = path or INDEX_MANIFEST_PATH
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+def content_chunk_ids(rel_path, chunks, root=None):
+    """경로 + 청크 내용 해시로 만든 id ({rel_path}#{sha256 앞 16자리}, 같은 파일 안 중복 내용은 ~n)
+
+    내용이 같은 청크는 앞뒤 청크가 바뀌어도 같은 id를 유지합니다.
+    root(색인 디렉토리)가 주어지면 id 앞에 root 경로 해시를 붙여 ({root 해시}:{rel_path}#...)
+    다른 디렉토리의 같은 상대 경로와 겹치지 않게 합니다.
+    """
+    if root is not None:
+        root_tag = hashlib.sha256(os.path.abspath(root).encode("utf-8")).hexdigest()[:8]
+        rel_path = f"{root_tag}:{rel_path}"
+    seen = {}
+    ids = []
+    for chunk in chunks:
+        h = hashlib.sha256(chunk.encode("utf-8")).hexdigest()[:16]
+        n = seen.get(h, 0)
+        seen[h] = n + 1
+        ids.append(f"{rel_path}#{h}" + (f"~{n}" if n else ""))
+    return ids
+
+def _stale_source_ids(file_path, keep_ids):
+    """source_path가 file_path인 벡터 중 keep_ids에 없는 id (이전 내용/이전 방식 id 정리용)"""
+    ids = collection.get(where={"source_path": file_path}, include=[])["ids"]
+    keep = set(keep_ids)
+    return [i for i in ids if i not in keep]
+
+def _delete_ids(ids, batch_size=1000):
+    ids = list(ids)
+    for i in range(0, len(ids), batch_size):
+        collection.delete(ids=ids[i:i + batch_size])
+
+def index_md_files(directory_path, counter=None, max_tokens=MAX_TOKENS, overlap_tokens=OVERLAP_TOKENS,
+                   concurrency=None, manifest_path=None):
+    """증분 색인: 바뀐 파일만 다시 임베딩하고, 사라진 청크/파일의 벡터는 삭제
+
+    - 파일 내용 해시가 매니페스트와 같으면 건너뜀
+    - 바뀐 파일은 경로 + 내용 기반 id로 다시 저장하고, 이전 id 중 없어진 것은 삭제
+    - 디렉토리에서 사라진 파일의 벡터는 모두 삭제
+    - 임베딩에 실패한 파일은 매니페스트를 갱신하지 않아 다음 실행에서 다시 시도
+    반환: {"changed", "unchanged", "removed", "stored", "deleted", "failed"}
+    """
+    manifest = _load_index_manifest(manifest_path)
+    root_key = os.path.abspath(directory_path)
+    known = manifest["roots"].setdefault(root_key, {})
     
-    return total_chunks
+    md_files = sorted(glob.glob(f"{directory_path}/**/*.md", recursive=True))
+    rel_of = {f: os.path.relpath(f, directory_path).replace(os.sep, "/") for f in md_files}
+    
+    changed, hashes = [], {}
+    for f in md_files:
+        rel = rel_of[f]
+        hashes[rel] = _file_sha256(f)
+        if known.get(rel, {}).get("hash") != hashes[rel]:
+            changed.append(f)
+    removed = sorted(set(known) - set(rel_of.values()))
+    print(f"총 {len(md_files)}개 파일: 변경/추가 {len(changed)}개, 변경 없음 {len(md_files) - len(changed)}개, 삭제 {len(removed)}개")
+    
+    planned = {}
+    
+    def chunk_ids(file_path, chunks):
+        rel = rel_of[file_path]
+        planned[rel] = content_chunk_ids(rel, chunks, root=root_key)
+        return planned[rel]
+    
+    failed_sources = set()
+    records = _md_file_records(changed, counter, max_tokens, overlap_tokens, chunk_ids=chunk_ids)
+    stored, failed = store_records(records, counter=counter, concurrency=concurrency, failed_sources=failed_sources)
+    
+    stale = []
+    for f in changed:
+        rel = rel_of[f]
+        if rel not in planned:
+            # 읽기 실패: 이전 벡터를 유지하고 다음 실행에서 재시도
+            continue
+        old_ids = known.get(rel, {}).get("ids", [])
+        if f in failed_sources:
+            # 임베딩 실패: 이전 벡터를 유지하고, 일부 저장된 새 id도 기록해 두어 다음 실행에서 정리
+            known[rel] = {"hash": None, "ids": sorted(set(old_ids) | set(planned[rel]))}
+            continue
+        stale.extend(set(old_ids) - set(planned[rel]))
+        if rel not in known:
+            # 매니페스트에 없던 파일: process_md_files 등으로 저장된 기존 벡터를 지워 중복 방지
+            stale.extend(_stale_source_ids(f, planned[rel]))
+        known[rel] = {"hash": hashes[rel], "ids": planned[rel]}
+    for rel in removed:
+        stale.extend(known.pop(rel).get("ids", []))
+    _delete_ids(stale)
+    _save_index_manifest(manifest, manifest_path)
+    
+    summary = {
+        "changed": len(changed), "unchanged": len(md_files) - len(changed), "removed": len(removed),
+        "stored": stored, "deleted": len(stale), "failed": failed,
+    }
+    print(f"  🔄 저장 {stored}개, 삭제 {len(stale)}개, 실패 {failed}개")
+    return summary
 
 def query_test(query_text, n_results=3):
     """RAG 검색 테스트"""
@@ -121,6 +845,8 @@ def reset_database():
     """데이터베이스 초기화 (모든 데이터 삭제)"""
     try:
         chroma_client.delete_collection(name="md_documents")
+        if os.path.exists(INDEX_MANIFEST_PATH):
+            os.remove(INDEX_MANIFEST_PATH)
         print("✅ 데이터베이스가 초기화되었습니다.")
     except:
         print("ℹ️ 초기화할 데이터가 없습니다.")
@@ -141,12 +867,24 @@ if __name__ == "__main__":
     choice = input("\n선택 (1-4): ").strip()
     
     if choice == "1":
-        directory = input("MD 파일 디렉토리 경로 (기본값: ./md_files): ").strip()
+        directory = input("MD 파일 디렉토리 또는 청크 JSONL 경로 (기본값: ./md_files): ").strip()
         if not directory:
             directory = "./md_files"
         
-        print(f"\n📁 디렉토리: {directory}")
-        total = process_md_files(directory)
+        if directory.endswith(".jsonl") or glob.glob(os.path.join(directory, "*.jsonl")):
+            # md_chunker.py 디렉토리 모드 출력은 이미 청크 단위이므로 그대로 사용
+            print(f"\n📄 청크 스트림: {directory}")
+            total = process_jsonl_chunks(directory, counter=load_token_counter())
+        else:
+            print(f"\n📁 디렉토리: {directory}")
+            counter = load_token_counter()
+            if counter is not None:
+                print(f"🔢 토큰 기준 분할: 최대 {MAX_TOKENS} 토큰, 겹침 {OVERLAP_TOKENS} 토큰")
+            incremental = input("변경된 파일만 다시 색인할까요? (y/N): ").strip().lower() == "y"
+            if incremental:
+                index_md_files(directory, counter=counter)
+            else:
+                total = process_md_files(directory, counter=counter)
         
         print("\n" + "="*60)
         print(f"✅ 저장 완료!")
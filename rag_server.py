@@ -1,20 +1,49 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+import array
+import asyncio
 import chromadb
-from openai import OpenAI
+import hashlib
+import httpx
+import itertools
+import json
+import numpy as np
+from openai import AsyncOpenAI
 import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
 from typing import List, Optional
 from dotenv import load_dotenv
 
 # 환경 변수 로드
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app):
+    # 시작할 때마다 새로 만들어 app.state에 보관 (같은 프로세스에서 다시 시작해도 닫힌 객체를 쓰지 않도록)
+    app.state.http_client = make_http_client()
+    app.state.openai_client = AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"), http_client=app.state.http_client)
+    app.state.chroma_executor = ThreadPoolExecutor(max_workers=CHROMA_MAX_WORKERS, thread_name_prefix="chroma")
+    try:
+        yield
+    finally:
+        # 종료 시 공유 연결 풀과 Chroma 스레드 풀 정리
+        await app.state.http_client.aclose()
+        app.state.chroma_executor.shutdown(wait=False)
+
 # FastAPI 앱 초기화
 app = FastAPI(
     title="RAG API Server",
     description="ChromaDB와 OpenAI를 사용한 RAG 시스템",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS 설정
@@ -26,13 +55,30 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# OpenAI 클라이언트 초기화
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+# OpenAI 비동기 클라이언트: 모든 요청이 하나의 httpx 연결 풀을 공유 (lifespan에서 생성)
+OPENAI_MAX_CONNECTIONS = int(os.environ.get("OPENAI_MAX_CONNECTIONS", "100"))
+
+def make_http_client():
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=OPENAI_MAX_CONNECTIONS, max_keepalive_connections=OPENAI_MAX_CONNECTIONS),
+        timeout=httpx.Timeout(60.0, connect=10.0),
+    )
+
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "text-embedding-3-small")
 
 # ChromaDB 클라이언트 초기화
-chroma_client = chromadb.PersistentClient(path="./chroma_db")
+CHROMA_DB_PATH = os.environ.get("CHROMA_DB_PATH", "./chroma_db")
+chroma_client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
 collection = chroma_client.get_or_create_collection(name="md_documents")
 
+# Chroma 호출은 동기 API이므로 크기가 제한된 스레드 풀에서 실행 (이벤트 루프를 막지 않도록, lifespan에서 생성)
+CHROMA_MAX_WORKERS = int(os.environ.get("CHROMA_MAX_WORKERS", "8"))
+
+async def run_chroma(func, *args, **kwargs):
+    """Chroma 호출을 스레드 풀에서 실행"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(app.state.chroma_executor, partial(func, *args, **kwargs))
+
 # 요청/응답 모델
 class QueryRequest(BaseModel):
     question: str
@@ -49,32 +95,220 @@ class QueryResponse(BaseModel):
     answer: str
     sources: List[SearchResult]
     model_used: str
+    cached: bool = False  # 의미 기반 답변 캐시에서 제공된 답변인지 여부
 
 class HealthResponse(BaseModel):
     status: str
     documents_count: int
 
-def get_openai_embedding(text: str):
+class TTLCache:
+    """크기(LRU)와 유효 시간(TTL)이 제한된 메모리 캐시, 적중/실패 횟수 집계"""
+
+    def __init__(self, maxsize: int, ttl: float, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        item = self._data.get(key)
+        if item is not None:
+            value, expires = item
+            if expires > self.clock():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._data[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self._data[key] = (value, self.clock() + self.ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+# 질문 임베딩 캐시: (정규화한 질문, 임베딩 모델) → 임베딩
+QUERY_CACHE_SIZE = int(os.environ.get("QUERY_CACHE_SIZE", "2048"))
+QUERY_CACHE_TTL = float(os.environ.get("QUERY_CACHE_TTL", "3600"))
+# 검색 결과 캐시: (임베딩, n_results) → Chroma 결과, 컬렉션이 바뀌면 비움
+SEARCH_CACHE_SIZE = int(os.environ.get("SEARCH_CACHE_SIZE", "2048"))
+SEARCH_CACHE_TTL = float(os.environ.get("SEARCH_CACHE_TTL", "600"))
+# 컬렉션 변경 여부를 확인하는 최소 간격(초)
+COLLECTION_CHECK_INTERVAL = float(os.environ.get("COLLECTION_CHECK_INTERVAL", "5"))
+
+class AnswerCache:
+    """의미 기반 답변 캐시: 비슷한 질문(코사인 유사도 ≥ threshold)이면 이전 답변 재사용
+
+    같은 모델이고 검색된 출처 청크 id 목록이 같을 때만 재사용합니다.
+    항목은 (모델, 출처 id) 그룹으로 묶어 그룹 안에서만 벡터 비교를 하며,
+    maxsize를 넘으면 가장 오래 사용하지 않은 항목부터, ttl이 지나면 조회 시 삭제합니다.
+    """
+
+    def __init__(self, maxsize: int, threshold: float, ttl: float, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()  # entry_id → (group, 단위 벡터, 답변, 만료 시각)
+        self._groups = {}  # (model, source_ids) → {entry_id}
+        self._ids = itertools.count()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _unit(embedding):
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def _remove(self, entry_id):
+        group = self._entries.pop(entry_id)[0]
+        members = self._groups[group]
+        members.discard(entry_id)
+        if not members:
+            del self._groups[group]
+
+    def get(self, embedding, source_ids, model):
+        group = (model, tuple(source_ids))
+        now = self.clock()
+        for entry_id in [e for e in self._groups.get(group, ()) if self._entries[e][3] <= now]:
+            self._remove(entry_id)
+        members = list(self._groups.get(group, ()))
+        if members:
+            sims = np.stack([self._entries[e][1] for e in members]) @ self._unit(embedding)
+            best = int(np.argmax(sims))
+            if sims[best] >= self.threshold:
+                self._entries.move_to_end(members[best])
+                self.hits += 1
+                return self._entries[members[best]][2]
+        self.misses += 1
+        return None
+
+    def put(self, embedding, source_ids, model, answer):
+        group = (model, tuple(source_ids))
+        entry_id = next(self._ids)
+        self._entries[entry_id] = (group, self._unit(embedding), answer, self.clock() + self.ttl)
+        self._groups.setdefault(group, set()).add(entry_id)
+        while len(self._entries) > self.maxsize:
+            self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        self._entries.clear()
+        self._groups.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+# 의미 기반 답변 캐시 설정 (ANSWER_CACHE_SIZE=0 이면 사용 안 함)
+ANSWER_CACHE_SIZE = int(os.environ.get("ANSWER_CACHE_SIZE", "1000"))
+ANSWER_CACHE_THRESHOLD = float(os.environ.get("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL = float(os.environ.get("ANSWER_CACHE_TTL", "3600"))
+
+query_embedding_cache = TTLCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+answer_cache = AnswerCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_TTL)
+search_result_cache = TTLCache(SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL)
+_collection_state = {"version": None, "checked": 0.0, "invalidations": 0}
+
+def normalize_question(text: str) -> str:
+    """캐시 키용 질문 정규화 (유니코드 NFKC, 대소문자, 공백)"""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip().casefold()
+
+def _embedding_key(embedding) -> bytes:
+    return hashlib.blake2b(array.array("d", embedding).tobytes(), digest_size=16).digest()
+
+def _collection_version():
+    """컬렉션 변경 감지용 값: 문서 수 + DB 파일 수정 시각"""
+    mtimes = []
+    for name in ("chroma.sqlite3", "chroma.sqlite3-wal"):
+        try:
+            mtimes.append(os.stat(os.path.join(CHROMA_DB_PATH, name)).st_mtime_ns)
+        except OSError:
+            mtimes.append(None)
+    return (collection.count(), *mtimes)
+
+async def _check_collection_changed():
+    """COLLECTION_CHECK_INTERVAL마다 컬렉션 변경 여부를 확인하고, 바뀌었으면 검색 결과/답변 캐시를 비움"""
+    now = time.monotonic()
+    if _collection_state["version"] is not None and now - _collection_state["checked"] < COLLECTION_CHECK_INTERVAL:
+        return
+    version = await run_chroma(_collection_version)
+    _collection_state["checked"] = now
+    if version != _collection_state["version"]:
+        if _collection_state["version"] is not None:
+            search_result_cache.clear()
+            answer_cache.clear()
+            _collection_state["invalidations"] += 1
+        _collection_state["version"] = version
+
+def cache_metrics():
+    return {
+        "query_embedding_cache": query_embedding_cache.stats(),
+        "search_result_cache": {**search_result_cache.stats(), "invalidations": _collection_state["invalidations"]},
+        "answer_cache": answer_cache.stats()
+    }
+
+async def get_openai_embedding(text: str):
     """OpenAI 임베딩 생성"""
-    response = client.embeddings.create(
-        model="text-embedding-3-small",
+    response = await app.state.openai_client.embeddings.create(
+        model=EMBEDDING_MODEL,
         input=text
     )
     return response.data[0].embedding
 
-def search_similar_documents(query: str, n_results: int = 3):
-    """유사 문서 검색"""
-    query_embedding = get_openai_embedding(query)
+async def get_query_embedding(query: str):
+    """질문 임베딩 (캐시 우선)"""
+    key = (normalize_question(query), EMBEDDING_MODEL)
+    embedding = query_embedding_cache.get(key)
+    if embedding is None:
+        embedding = await get_openai_embedding(query)
+        query_embedding_cache.put(key, embedding)
+    return embedding
+
+async def search_similar_documents(query: str, n_results: int = 3, query_embedding: Optional[list] = None):
+    """유사 문서 검색 (이미 계산한 질문 임베딩이 있으면 재사용)"""
+    if query_embedding is None:
+        query_embedding = await get_query_embedding(query)
     
-    results = collection.query(
-        query_embeddings=[query_embedding],
-        n_results=n_results
-    )
+    await _check_collection_changed()
+    key = (_embedding_key(query_embedding), n_results)
+    results = search_result_cache.get(key)
+    if results is None:
+        results = await run_chroma(
+            collection.query,
+            query_embeddings=[query_embedding],
+            n_results=n_results
+        )
+        search_result_cache.put(key, results)
     
     return results
 
-def generate_answer(question: str, context_docs: list, model: str = "gpt-4o-mini"):
-    """LLM을 사용하여 답변 생성"""
+def build_answer_messages(question: str, context_docs: list):
+    """답변 생성용 채팅 메시지 구성"""
     
     # 컨텍스트 구성
     context = "\n\n".join([
@@ -94,19 +328,74 @@ def generate_answer(question: str, context_docs: list, model: str = "gpt-4o-mini
 
 답변:"""
     
-    # OpenAI API 호출
-    response = client.chat.completions.create(
+    return [
+        {"role": "system", "content": "당신은 문서 기반 질의응답을 수행하는 도움이 되는 AI 어시스턴트입니다."},
+        {"role": "user", "content": prompt}
+    ]
+
+async def generate_answer(question: str, context_docs: list, model: str = "gpt-4o-mini"):
+    """LLM을 사용하여 답변 생성"""
+    response = await app.state.openai_client.chat.completions.create(
         model=model,
-        messages=[
-            {"role": "system", "content": "당신은 문서 기반 질의응답을 수행하는 도움이 되는 AI 어시스턴트입니다."},
-            {"role": "user", "content": prompt}
-        ],
+        messages=build_answer_messages(question, context_docs),
         temperature=0.3,
         max_tokens=1000
     )
     
     return response.choices[0].message.content
 
+async def stream_answer(question: str, context_docs: list, model: str = "gpt-4o-mini"):
+    """LLM 답변을 토큰 단위로 스트리밍 (생성되는 대로 텍스트 조각을 yield)"""
+    stream = await app.state.openai_client.chat.completions.create(
+        model=model,
+        messages=build_answer_messages(question, context_docs),
+        temperature=0.3,
+        max_tokens=1000,
+        stream=True
+    )
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+async def retrieve_documents(request: QueryRequest):
+    """질의응답용 검색: (질문 임베딩, 검색 결과) 반환, 문서가 없으면 404
+
+    질문 임베딩은 한 번만 계산해 검색과 답변 캐시 조회에 함께 사용합니다.
+    """
+    question_embedding = await get_query_embedding(request.question)
+    search_results = await search_similar_documents(
+        request.question,
+        request.n_results,
+        question_embedding
+    )
+    
+    if not search_results['documents'][0]:
+        raise HTTPException(
+            status_code=404, 
+            detail="관련 문서를 찾을 수 없습니다"
+        )
+    
+    return question_embedding, search_results
+
+def build_sources(search_results):
+    """검색 결과를 응답용 출처 목록으로 변환"""
+    return [
+        SearchResult(
+            content=doc[:200] + "..." if len(doc) > 200 else doc,
+            source=meta.get('source', 'unknown'),
+            filename=meta.get('filename', 'unknown'),
+            chunk_index=meta.get('chunk_index', 0)
+        )
+        for doc, meta in zip(
+            search_results['documents'][0],
+            search_results['metadatas'][0]
+        )
+    ]
+
+def sse_event(event: str, data) -> str:
+    """Server-Sent Events 형식의 이벤트 한 개"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
 @app.get("/", response_model=dict)
 async def root():
     """API 루트 엔드포인트"""
@@ -116,7 +405,9 @@ async def root():
         "endpoints": {
             "health": "GET /health - 서버 상태 확인",
             "query": "POST /query - RAG 질의응답",
+            "query_stream": "POST /query/stream - RAG 질의응답 (SSE 스트리밍)",
             "search": "POST /search - 문서 검색만",
+            "metrics": "GET /metrics - 캐시 적중/실패 통계",
             "docs": "GET /docs - API 문서 (Swagger UI)"
         }
     }
@@ -125,7 +416,7 @@ async def root():
 async def health_check():
     """서버 상태 확인"""
     try:
-        doc_count = collection.count()
+        doc_count = await run_chroma(collection.count)
         return HealthResponse(
             status="healthy",
             documents_count=doc_count
@@ -133,47 +424,40 @@ async def health_check():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"서버 오류: {str(e)}")
 
+@app.get("/metrics")
+async def metrics():
+    """캐시 적중/실패 통계"""
+    return cache_metrics()
+
 @app.post("/query", response_model=QueryResponse)
 async def query_rag(request: QueryRequest):
     """RAG 질의응답"""
     try:
         # 1. 유사 문서 검색
-        search_results = search_similar_documents(
-            request.question, 
-            request.n_results
-        )
-        
-        if not search_results['documents'][0]:
-            raise HTTPException(
-                status_code=404, 
-                detail="관련 문서를 찾을 수 없습니다"
-            )
+        question_embedding, search_results = await retrieve_documents(request)
         
-        # 2. LLM으로 답변 생성
-        answer = generate_answer(
-            request.question,
-            search_results['documents'][0],
-            request.model
-        )
+        # 2. 비슷한 질문의 답변이 캐시에 있으면 재사용 (같은 모델 + 같은 출처 청크일 때만)
+        source_ids = search_results['ids'][0]
+        use_cache = answer_cache.maxsize > 0
+        answer = answer_cache.get(question_embedding, source_ids, request.model) if use_cache else None
+        cached = answer is not None
         
-        # 3. 응답 구성
-        sources = [
-            SearchResult(
-                content=doc[:200] + "..." if len(doc) > 200 else doc,
-                source=meta.get('source', 'unknown'),
-                filename=meta.get('filename', 'unknown'),
-                chunk_index=meta.get('chunk_index', 0)
-            )
-            for doc, meta in zip(
+        # 3. 없으면 LLM으로 답변 생성
+        if not cached:
+            answer = await generate_answer(
+                request.question,
                 search_results['documents'][0],
-                search_results['metadatas'][0]
+                request.model
             )
-        ]
+            if use_cache:
+                answer_cache.put(question_embedding, source_ids, request.model, answer)
         
+        # 4. 응답 구성
         return QueryResponse(
             answer=answer,
-            sources=sources,
-            model_used=request.model
+            sources=build_sources(search_results),
+            model_used=request.model,
+            cached=cached
         )
         
     except HTTPException:
@@ -181,11 +465,60 @@ async def query_rag(request: QueryRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"처리 중 오류: {str(e)}")
 
+@app.post("/query/stream")
+async def query_rag_stream(request: QueryRequest):
+    """RAG 질의응답 (SSE 스트리밍)
+
+    검색이 끝나면 바로 `sources` 이벤트를 보내고, 이어서 LLM 토큰을 `token`
+    이벤트로 생성되는 대로 보냅니다. 마지막에 `done` 이벤트(오류 시 `error`)로 끝납니다.
+    """
+    try:
+        # 1. 유사 문서 검색 (스트리밍 시작 전에 끝내야 404/500을 상태 코드로 돌려줄 수 있음)
+        question_embedding, search_results = await retrieve_documents(request)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"처리 중 오류: {str(e)}")
+    
+    source_ids = search_results['ids'][0]
+    use_cache = answer_cache.maxsize > 0
+    
+    async def events():
+        # 2. 출처 먼저 전송
+        sources = [s.model_dump() for s in build_sources(search_results)]
+        yield sse_event("sources", {"sources": sources})
+        
+        # 3. 캐시된 답변이 있으면 한 번에, 없으면 LLM 토큰을 생성되는 대로 전송
+        answer = answer_cache.get(question_embedding, source_ids, request.model) if use_cache else None
+        cached = answer is not None
+        try:
+            if cached:
+                yield sse_event("token", {"text": answer})
+            else:
+                parts = []
+                async for text in stream_answer(request.question, search_results['documents'][0], request.model):
+                    parts.append(text)
+                    yield sse_event("token", {"text": text})
+                answer = "".join(parts)
+                if use_cache:
+                    answer_cache.put(question_embedding, source_ids, request.model, answer)
+        except Exception as e:
+            yield sse_event("error", {"detail": f"처리 중 오류: {str(e)}"})
+            return
+        
+        yield sse_event("done", {"model_used": request.model, "cached": cached})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/search")
 async def search_documents(request: QueryRequest):
     """문서 검색만 수행 (LLM 답변 없이)"""
     try:
-        search_results = search_similar_documents(
+        search_results = await search_similar_documents(
             request.question,
             request.n_results
         )
@@ -1,3 +1,3 @@
 #!/bin/bash
 #
-python ./docs-parser.py --input-dir ./sample --output-dir ./output_folder --recursive --verbose
+python ./docs-parser.py --input-dir ./sample --output-dir ./output_folder --recursive --incremental --verbose
@@ -0,0 +1,83 @@
+import os
+import tempfile
+
+# rag_embedding / rag_server create an OpenAI client and a persistent Chroma DB at import.
+# Point them at a dummy key and a throwaway DB so tests never touch ./chroma_db or the network.
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("CHROMA_DB_PATH", tempfile.mkdtemp(prefix="chroma_test_"))
+# the default embedding cache is off; cache tests build their own EmbeddingCache
+os.environ.setdefault("EMBED_CACHE_PATH", "")
+
+
+def make_openai_stub(latency=0.0, dim=8, answer="stub answer"):
+    """In-process stand-in for the OpenAI embeddings/chat endpoints (ASGI app).
+
+    Every call sleeps `latency` seconds; stub.state.in_flight / max_in_flight
+    record how many requests overlapped and stub.state.calls counts them per path.
+    """
+    import array
+    import base64
+    import json
+
+    from fastapi import FastAPI, Request, Response
+
+    stub = FastAPI()
+    stub.state.in_flight = 0
+    stub.state.max_in_flight = 0
+    stub.state.calls = {}
+
+    async def track(path):
+        import asyncio
+
+        stub.state.calls[path] = stub.state.calls.get(path, 0) + 1
+        stub.state.in_flight += 1
+        stub.state.max_in_flight = max(stub.state.max_in_flight, stub.state.in_flight)
+        try:
+            await asyncio.sleep(latency)
+        finally:
+            stub.state.in_flight -= 1
+
+    @stub.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        await track("embeddings")
+        data = []
+        for i, text in enumerate(inputs):
+            # deterministic vector per text
+            vec = [float((hash(text) >> (4 * k)) % 7) for k in range(dim)]
+            if body.get("encoding_format") == "base64":
+                vec = base64.b64encode(array.array("f", vec).tobytes()).decode()
+            data.append({"object": "embedding", "index": i, "embedding": vec})
+        return {"object": "list", "model": body["model"], "data": data, "usage": {"prompt_tokens": 0, "total_tokens": 0}}
+
+    @stub.post("/v1/chat/completions")
+    async def chat(request: Request):
+        body = await request.json()
+        await track("chat")
+        if body.get("stream"):
+            def sse():
+                for i, piece in enumerate(answer.split(" ")):
+                    token = piece if i == 0 else " " + piece
+                    chunk = {"id": "c", "object": "chat.completion.chunk", "created": 0, "model": body["model"],
+                             "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return Response("".join(sse()), media_type="text/event-stream")
+        return {
+            "id": "c", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    return stub
+
+
+def stub_openai_client(stub):
+    """AsyncOpenAI client whose pooled httpx transport talks to the stub app in-process."""
+    import httpx
+    from openai import AsyncOpenAI
+
+    http = httpx.AsyncClient(transport=httpx.ASGITransport(app=stub), base_url="http://stub/v1")
+    return AsyncOpenAI(api_key="test-key", base_url="http://stub/v1", http_client=http)
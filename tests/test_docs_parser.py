@@ -47,3 +47,220 @@ def test_docx_to_markdown_creates_md_and_images():
         assert len(files) >= 1
         # ensure the file has an expected image extension
         assert any(p.suffix.lower() in {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.svg', '.bin'} for p in files)
+
+
+def test_process_directory_parallel_matches_serial_and_isolates_failures():
+    from docs_parser import process_directory
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmpdir = pathlib.Path(tmp)
+        in_dir = tmpdir / "in"
+        in_dir.mkdir()
+        img_path = tmpdir / "img.png"
+        create_sample_image(str(img_path))
+        for name in ("a", "b", "c"):
+            create_sample_docx_with_image(str(in_dir / f"{name}.docx"), str(img_path))
+        # not a real docx: must fail on its own without stopping the batch
+        (in_dir / "broken.docx").write_bytes(b"not a zip")
+
+        serial = process_directory(str(in_dir), str(tmpdir / "serial"))
+        parallel = process_directory(str(in_dir), str(tmpdir / "parallel"), workers=2)
+
+        def names(results):
+            return [pathlib.Path(src).name for src, _, _ in results]
+
+        assert names(parallel) == names(serial)
+        assert sorted(names(parallel)) == ["a.docx", "b.docx", "c.docx"]
+        for _, md_path, _ in parallel:
+            assert pathlib.Path(md_path).exists()
+
+
+def test_process_directory_incremental_manifest():
+    from docs_parser import process_directory
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmpdir = pathlib.Path(tmp)
+        in_dir = tmpdir / "in"
+        out_dir = tmpdir / "out"
+        in_dir.mkdir()
+        img_path = tmpdir / "img.png"
+        create_sample_image(str(img_path))
+        for name in ("a", "b"):
+            create_sample_docx_with_image(str(in_dir / f"{name}.docx"), str(img_path))
+
+        first = process_directory(str(in_dir), str(out_dir), incremental=True)
+        assert len(first) == 2
+        assert (out_dir / ".docs_manifest.json").exists()
+
+        # nothing changed -> nothing converted
+        assert process_directory(str(in_dir), str(out_dir), incremental=True) == []
+
+        # modified source is re-converted without leaving renamed duplicate images behind
+        doc_a = in_dir / "a.docx"
+        from docx import Document
+        doc = Document(str(doc_a))
+        doc.add_paragraph("edited")
+        doc.save(str(doc_a))
+        again = process_directory(str(in_dir), str(out_dir), incremental=True)
+        assert [pathlib.Path(src).name for src, _, _ in again] == ["a.docx"]
+        assert "edited" in (out_dir / "a.md").read_text(encoding="utf-8")
+        assert len(list((out_dir / "a_images").glob("*"))) == 1
+
+        # deleted source -> outputs removed
+        (in_dir / "b.docx").unlink()
+        assert process_directory(str(in_dir), str(out_dir), incremental=True) == []
+        assert not (out_dir / "b.md").exists()
+        assert not (out_dir / "b_images").exists()
+        assert (out_dir / "a.md").exists()
+
+
+def test_docx_to_markdown_keeps_document_order():
+    from docx import Document
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmpdir = pathlib.Path(tmp)
+        img_path = tmpdir / "img.png"
+        create_sample_image(str(img_path))
+
+        doc = Document()
+        doc.add_heading("Chapter", 1)
+        doc.add_paragraph("before table")
+        table = doc.add_table(rows=1, cols=2)
+        table.cell(0, 0).text = "A"
+        table.cell(0, 1).text = "B"
+        doc.add_picture(str(img_path))
+        doc.add_paragraph("after image")
+        docx_path = tmpdir / "ordered.docx"
+        doc.save(str(docx_path))
+
+        out_md = tmpdir / "ordered.md"
+        docx_to_markdown_full(str(docx_path), str(out_md), str(tmpdir / "ordered_images"))
+        text = out_md.read_text(encoding="utf-8")
+
+        positions = [text.index(s) for s in ("# Chapter", "before table", "| A | B |", "![image_1]", "after image")]
+        assert positions == sorted(positions)
+
+
+@pytest.mark.parametrize("engine", ["docx", "stream"])
+def test_stream_engine_matches_python_docx_engine(engine):
+    from docx import Document
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmpdir = pathlib.Path(tmp)
+        img_path = tmpdir / "img.png"
+        create_sample_image(str(img_path))
+
+        doc = Document()
+        doc.add_heading("Manual", 1)
+        doc.add_paragraph("line one\ttabbed")
+        table = doc.add_table(rows=2, cols=3)
+        for r, row in enumerate(table.rows):
+            for c, cell in enumerate(row.cells):
+                cell.text = f"{r}-{c}"
+        table.cell(0, 0).merge(table.cell(0, 1))
+        doc.add_picture(str(img_path))
+        doc.add_heading("Appendix", 2)
+        docx_path = tmpdir / "manual.docx"
+        doc.save(str(docx_path))
+
+        ref_md = tmpdir / "ref" / "manual.md"
+        out_md = tmpdir / engine / "manual.md"
+        ref_md.parent.mkdir()
+        out_md.parent.mkdir()
+        docx_to_markdown_full(str(docx_path), str(ref_md), str(ref_md.parent / "images"), engine="docx")
+        docx_to_markdown_full(str(docx_path), str(out_md), str(out_md.parent / "images"), engine=engine)
+
+        assert out_md.read_text(encoding="utf-8") == ref_md.read_text(encoding="utf-8")
+        assert [p.name for p in (out_md.parent / "images").iterdir()] == ["image_1.png"]
+
+
+def test_table_markdown_header_spans_and_pipes():
+    from docx import Document
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmpdir = pathlib.Path(tmp)
+        doc = Document()
+        table = doc.add_table(rows=3, cols=3)
+        for r, row in enumerate(table.rows):
+            for c, cell in enumerate(row.cells):
+                cell.text = f"{r}{c}"
+        table.cell(0, 0).merge(table.cell(0, 1)).text = "wide"
+        table.cell(1, 2).merge(table.cell(2, 2)).text = "a|b"
+        docx_path = tmpdir / "t.docx"
+        doc.save(str(docx_path))
+
+        out_md = tmpdir / "t.md"
+        docx_to_markdown_full(str(docx_path), str(out_md), str(tmpdir / "t_images"))
+        lines = out_md.read_text(encoding="utf-8").splitlines()
+
+        start = lines.index("### Table 1") + 2
+        assert lines[start:start + 4] == [
+            "| wide | wide | 02 |",
+            "| --- | --- | --- |",
+            "| 10 | 11 | a\\|b |",
+            "| 20 | 21 | a\\|b |",
+        ]
+
+
+def test_table_rows_wider_than_header_are_padded_and_bad_grid_before_ignored():
+    import copy
+
+    from docx import Document
+    from docx.oxml.ns import qn
+    from docx.oxml import OxmlElement
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmpdir = pathlib.Path(tmp)
+        doc = Document()
+        table = doc.add_table(rows=2, cols=2)
+        for r, row in enumerate(table.rows):
+            for c, cell in enumerate(row.cells):
+                cell.text = f"{r}{c}"
+        header, body = table.rows
+        tr_pr = header._tr.get_or_add_trPr()
+        before = OxmlElement("w:gridBefore")
+        before.set(qn("w:val"), "n/a")
+        tr_pr.append(before)
+        extra = copy.deepcopy(body._tr.findall(qn("w:tc"))[-1])
+        body._tr.append(extra)  # a third cell beyond the two-column grid
+        docx_path = tmpdir / "wide.docx"
+        doc.save(str(docx_path))
+
+        for engine in ("docx", "stream"):
+            out_md = tmpdir / engine / "wide.md"
+            out_md.parent.mkdir()
+            docx_to_markdown_full(str(docx_path), str(out_md), str(out_md.parent / "images"), engine=engine)
+            lines = out_md.read_text(encoding="utf-8").splitlines()
+            start = lines.index("### Table 1") + 2
+            assert lines[start:start + 3] == [
+                "| 00 | 01 |  |",
+                "| --- | --- | --- |",
+                "| 10 | 11 | 11 |",
+            ]
+
+
+def test_shared_image_store_deduplicates_across_documents():
+    from docs_parser import process_directory
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmpdir = pathlib.Path(tmp)
+        in_dir = tmpdir / "in"
+        out_dir = tmpdir / "out"
+        store = out_dir / "image_store"
+        in_dir.mkdir()
+        img_path = tmpdir / "logo.png"
+        create_sample_image(str(img_path))
+        for name in ("a", "b", "c"):
+            create_sample_docx_with_image(str(in_dir / f"{name}.docx"), str(img_path))
+
+        results = process_directory(str(in_dir), str(out_dir), image_store=str(store))
+        assert len(results) == 3
+
+        stored = [p for p in store.rglob("*") if p.is_file()]
+        assert len(stored) == 1
+        assert not list(out_dir.glob("*_images"))
+
+        for _, md_path, _ in results:
+            text = pathlib.Path(md_path).read_text(encoding="utf-8")
+            link = text[text.index("](") + 2 : text.rindex(")")]
+            assert (pathlib.Path(md_path).parent / link).resolve() == stored[0].resolve()
@@ -0,0 +1,281 @@
+import pathlib
+import tempfile
+
+import excel_parser
+from excel_parser import process_excel_file
+
+
+def create_sample_workbook(xlsx_path, sheets):
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    wb.remove(wb.active)
+    for name, rows in sheets.items():
+        ws = wb.create_sheet(name)
+        for row in rows:
+            ws.append(row)
+    wb.save(xlsx_path)
+
+
+def test_process_excel_file_opens_workbook_once(monkeypatch):
+    opened = []
+    real_open = excel_parser._impl._open_workbook
+
+    def counting_open(path):
+        opened.append(path)
+        return real_open(path)
+
+    monkeypatch.setattr(excel_parser._impl, "_open_workbook", counting_open)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmpdir = pathlib.Path(tmp)
+        xlsx = tmpdir / "book.xlsx"
+        create_sample_workbook(str(xlsx), {
+            "First": [["name", "score"], ["kim", 90], ["lee", 85]],
+            "Second": [["city"], ["Seoul"]],
+        })
+
+        results = process_excel_file(str(xlsx), str(tmpdir / "out"))
+
+        assert [sheet for _, sheet, _ in results] == ["First", "Second"]
+        assert len(opened) == 1
+        first = (tmpdir / "out" / "book_First.md").read_text(encoding="utf-8")
+        assert "name" in first and "kim" in first and "85" in first
+
+
+def test_stream_mode_writes_unpadded_escaped_rows():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmpdir = pathlib.Path(tmp)
+        xlsx = tmpdir / "big.xlsx"
+        create_sample_workbook(str(xlsx), {
+            "Data": [["id", "note", None], [1, "a|b", "x"], [2, "line1\nline2", None]],
+        })
+
+        process_excel_file(str(xlsx), str(tmpdir), stream=True)
+
+        assert (tmpdir / "big_Data.md").read_text(encoding="utf-8").splitlines() == [
+            "# Data",
+            "|id|note|Unnamed: 2|",
+            "|---|---|---|",
+            "|1|a\\|b|x|",
+            "|2|line1 line2||",
+        ]
+
+
+def test_rows_per_chunk_repeats_header_and_records_row_ranges():
+    import json
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmpdir = pathlib.Path(tmp)
+        xlsx = tmpdir / "report.xlsx"
+        rows = [["id", "value"]] + [[i, i * 10] for i in range(1, 6)]
+        create_sample_workbook(str(xlsx), {"Data": rows})
+
+        results = process_excel_file(str(xlsx), str(tmpdir / "out"), rows_per_chunk=2)
+        chunk_dir = pathlib.Path(results[0][2])
+
+        index = json.loads((chunk_dir / "index.json").read_text(encoding="utf-8"))
+        assert [(c["row_start"], c["row_end"]) for c in index] == [(2, 3), (4, 5), (6, 6)]
+        assert all(c["sheet"] == "Data" and c["source"] == "report.xlsx" for c in index)
+
+        for entry in index:
+            lines = (chunk_dir / entry["file"]).read_text(encoding="utf-8").splitlines()
+            assert lines[0] == f"# report.xlsx / Data (rows {entry['row_start']}-{entry['row_end']})"
+            assert lines[1:3] == ["|id|value|", "|---|---|"]
+            assert len(lines) == 3 + entry["rows"]
+
+
+def test_process_excel_files_parallel_names_do_not_collide(monkeypatch):
+    from excel_parser import process_excel_files
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmpdir = pathlib.Path(tmp)
+        books = []
+        for name in ("north", "south"):
+            xlsx = tmpdir / f"{name}.xlsx"
+            create_sample_workbook(str(xlsx), {"Sheet1": [["region"], [name]], "Sheet2": [["n"], [1]]})
+            books.append(xlsx)
+        out_dir = tmpdir / "out"
+
+        import os
+
+        real_open = excel_parser._impl._open_workbook
+        opened_in = []  # only calls made in this (parent) process are visible here
+
+        def recording_open(path):
+            opened_in.append(os.getpid())
+            return real_open(path)
+
+        monkeypatch.setattr(excel_parser._impl, "_open_workbook", recording_open)
+        results = process_excel_files(books, str(out_dir), workers=2, split_sheets=True)
+        assert opened_in == []  # sheet names are listed without loading workbooks in the parent
+
+        assert [(pathlib.Path(f).name, s) for f, s, _ in results] == [
+            ("north.xlsx", "Sheet1"), ("north.xlsx", "Sheet2"),
+            ("south.xlsx", "Sheet1"), ("south.xlsx", "Sheet2"),
+        ]
+        assert "north" in (out_dir / "north_Sheet1.md").read_text(encoding="utf-8")
+        assert "south" in (out_dir / "south_Sheet1.md").read_text(encoding="utf-8")
+
+
+def test_output_names_do_not_collide_across_stem_and_sheet():
+    from excel_parser import process_excel_files
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmpdir = pathlib.Path(tmp)
+        create_sample_workbook(str(tmpdir / "a.xlsx"), {"b_Sheet1": [["src"], ["a.xlsx"]]})
+        create_sample_workbook(str(tmpdir / "a_b.xlsx"), {"Sheet1": [["src"], ["a_b.xlsx"]]})
+        out_dir = tmpdir / "out"
+
+        results = process_excel_files([tmpdir / "a.xlsx", tmpdir / "a_b.xlsx"], str(out_dir), workers=2)
+
+        outputs = [pathlib.Path(p).name for _, _, p in results]
+        assert outputs == ["a_b_Sheet1.md", "a_b-2_Sheet1.md"]
+        assert "a_b.xlsx" in (out_dir / "a_b-2_Sheet1.md").read_text(encoding="utf-8")
+
+
+def test_sheet_cache_skips_openpyxl_on_rerun(monkeypatch):
+    import datetime
+
+    # several record batches per sheet
+    monkeypatch.setattr(excel_parser.SheetCache, "BATCH_ROWS", 2)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmpdir = pathlib.Path(tmp)
+        xlsx = tmpdir / "book.xlsx"
+        create_sample_workbook(str(xlsx), {
+            "Mixed": [
+                ["when", "n", "note"],
+                [datetime.datetime(2024, 1, 2), 1, "a"],
+                [datetime.datetime(2024, 1, 3), 2.5, 7],
+                [None, None, None],
+                [datetime.datetime(2024, 1, 4), 3, None],
+            ],
+        })
+        cache_dir = tmpdir / "cache"
+
+        process_excel_file(str(xlsx), str(tmpdir / "first"), cache_dir=str(cache_dir), rows_per_chunk=2)
+        assert list(cache_dir.glob("*.arrow"))
+
+        def no_open(path):
+            raise AssertionError("workbook should not be opened on a cache hit")
+
+        monkeypatch.setattr(excel_parser._impl, "_open_workbook", no_open)
+        process_excel_file(str(xlsx), str(tmpdir / "second"), cache_dir=str(cache_dir), rows_per_chunk=2)
+
+        first = sorted(p.name for p in (tmpdir / "first" / "book_Mixed_chunks").iterdir())
+        assert first == sorted(p.name for p in (tmpdir / "second" / "book_Mixed_chunks").iterdir())
+        for name in first:
+            assert (tmpdir / "first" / "book_Mixed_chunks" / name).read_text(encoding="utf-8") == (
+                tmpdir / "second" / "book_Mixed_chunks" / name
+            ).read_text(encoding="utf-8")
+
+
+def test_sheet_cache_padded_output_matches_uncached_for_mixed_types(monkeypatch):
+    import datetime
+
+    monkeypatch.setattr(excel_parser.SheetCache, "BATCH_ROWS", 2)
+    with tempfile.TemporaryDirectory() as tmp:
+        tmpdir = pathlib.Path(tmp)
+        xlsx = tmpdir / "book.xlsx"
+        create_sample_workbook(str(xlsx), {
+            "Mixed": [
+                ["when", "x", "note", "flag", "late"],
+                [datetime.datetime(2024, 1, 2), 1.0, "a", True, None],
+                [datetime.datetime(2024, 1, 3), 2.5, 7, 1, None],
+                [datetime.datetime(2024, 1, 4), 3, "b|c", False, 42],
+            ],
+        })
+        cache_dir = str(tmpdir / "cache")
+
+        process_excel_file(str(xlsx), str(tmpdir / "plain"))
+        process_excel_file(str(xlsx), str(tmpdir / "first"), cache_dir=cache_dir)
+        monkeypatch.setattr(excel_parser._impl, "_open_workbook", None)  # second run must be a cache hit
+        process_excel_file(str(xlsx), str(tmpdir / "second"), cache_dir=cache_dir)
+
+        expected = (tmpdir / "plain" / "book_Mixed.md").read_text(encoding="utf-8")
+        assert "2024-01-02T00:00:00" in expected
+        assert (tmpdir / "first" / "book_Mixed.md").read_text(encoding="utf-8") == expected
+        assert (tmpdir / "second" / "book_Mixed.md").read_text(encoding="utf-8") == expected
+
+
+def test_sheet_cache_evicts_least_recently_used(tmp_path):
+    import os
+
+    cache = excel_parser.SheetCache(tmp_path, max_bytes=250)
+    for i, name in enumerate(("old", "mid", "new")):
+        path = tmp_path / f"{name}.arrow"
+        path.write_bytes(b"x" * 100)
+        os.utime(path, (1000 + i, 1000 + i))
+
+    cache.evict()
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["mid.arrow", "new.arrow"]
+
+
+def test_sheet_cache_eviction_keeps_other_workers_temp_files(tmp_path):
+    import os
+
+    cache = excel_parser.SheetCache(tmp_path, max_bytes=5000)
+    writer = cache.writer("digest", "Sheet1", 1, ["a", "b"])
+    writer.append(2, [1, 2])
+    writer._flush()
+    other = tmp_path / "old.arrow"
+    other.write_bytes(b"x" * 10000)
+    os.utime(other, (1000, 1000))
+
+    cache.evict()  # another worker evicting while this writer is still open
+    assert os.path.exists(writer.tmp) and not other.exists()
+
+    writer.commit()
+    assert not writer.failed and cache.has("digest", "Sheet1")
+
+    lost = cache.writer("digest", "Sheet2", 1, ["a"])
+    lost.append(2, [1])
+    lost._flush()
+    os.remove(lost.tmp)
+    lost.commit()  # missing temp file is a cache miss, not an error
+    assert lost.failed and not cache.has("digest", "Sheet2")
+
+
+def test_csv_detects_encoding_and_delimiter_and_matches_excel_output():
+    from excel_parser import process_excel_files
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmpdir = pathlib.Path(tmp)
+        rows = [["이름", "점수"], ["김철수", "90"], ["이영희", "85"], ["박민수", "77"]]
+        (tmpdir / "scores.csv").write_bytes(
+            "\r\n".join(";".join(r) for r in rows).encode("cp949")
+        )
+        create_sample_workbook(str(tmpdir / "scores.xlsx"), {"scores": rows})
+        out_dir = tmpdir / "out"
+
+        process_excel_files([tmpdir / "scores.csv", tmpdir / "scores.xlsx"], str(out_dir), stream=True)
+
+        csv_md = (out_dir / "scores_csv.md").read_text(encoding="utf-8")
+        xlsx_md = (out_dir / "scores_xlsx_scores.md").read_text(encoding="utf-8")
+        assert "|이름|점수|" in csv_md
+        assert csv_md.splitlines()[1:] == xlsx_md.splitlines()[1:]
+
+        results = process_excel_files([tmpdir / "scores.csv"], str(out_dir), rows_per_chunk=2)
+        chunk_dir = pathlib.Path(results[0][2])
+        chunks = sorted(p.name for p in chunk_dir.glob("*.md"))
+        assert chunks == ["0001_rows_2-3.md", "0002_rows_4-4.md"]
+        assert (chunk_dir / chunks[1]).read_text(encoding="utf-8").splitlines()[:2] == [
+            "# scores.csv (rows 4-4)",
+            "|이름|점수|",
+        ]
+
+
+def test_large_csv_streams_and_ragged_rows_are_reported(tmp_path, monkeypatch, caplog):
+    impl = excel_parser._impl
+    monkeypatch.setattr(impl, "CSV_STREAM_MIN_BYTES", 10)
+    monkeypatch.setattr(impl, "MarkdownTableWriter", None)  # buffered path must not be used
+    csv_path = tmp_path / "wide.csv"
+    csv_path.write_text("a,b\n1,2,\n3,4,extra\n5,6,more\n", encoding="utf-8")
+
+    with caplog.at_level("WARNING", logger="excel-parser"):
+        impl.csv_to_markdown(str(csv_path), str(tmp_path / "wide.md"))
+
+    assert (tmp_path / "wide.md").read_text(encoding="utf-8").splitlines()[3:] == ["|1|2|", "|3|4|", "|5|6|"]
+    assert "2 rows have more fields than the 2 header columns (first at row 3)" in caplog.text
@@ -0,0 +1,200 @@
+import io
+import json
+import pathlib
+import tempfile
+
+from md_chunker import chunk_markdown_file, iter_chunks, split_by_heading
+
+SAMPLE = """intro line
+
+# First
+short
+
+# Second
+""" + ("para text " * 30 + "\n\n") * 5 + """
+## Sub
+tiny
+#
+Bare Heading
+body
+"""
+
+
+def test_iter_chunks_streams_lines_lazily():
+    consumed = []
+
+    def lines():
+        for line in io.StringIO(SAMPLE):
+            consumed.append(line)
+            yield line
+
+    chunks = iter_chunks(lines(), level=1, max_chars=10000, min_chars=0)
+    first = next(chunks)
+    assert (first["heading"], first["text"], first["offset"]) == ("", "intro line", 0)
+    assert len(consumed) < len(SAMPLE.splitlines())
+
+
+def test_split_by_heading_matches_regex_semantics():
+    # '#' with nothing after it takes its text from the next non-blank line
+    assert split_by_heading("# A\nx\n#\n\nB\ny", level=1) == [("A", "x"), ("B", "y")]
+    assert split_by_heading("plain", level=2) == [("", "plain")]
+
+
+def test_chunk_markdown_file_writes_index_incrementally_formatted():
+    with tempfile.TemporaryDirectory() as tmp:
+        src = pathlib.Path(tmp) / "doc.md"
+        src.write_text(SAMPLE, encoding="utf-8")
+        out = pathlib.Path(tmp) / "chunks"
+
+        index = chunk_markdown_file(str(src), str(out), level=1, max_chars=120, min_chars=50, prefix="page")
+
+        raw = (out / "index.json").read_text(encoding="utf-8")
+        assert raw == json.dumps(index, ensure_ascii=False, indent=2)
+        assert [e["file"] for e in index] == sorted(p.name for p in out.glob("*.md"))
+        # small leading chunks are merged forward, so nothing but the last is under min_chars
+        assert all(e["chars"] >= 50 for e in index)
+        for entry in index:
+            assert (out / entry["file"]).read_text(encoding="utf-8").strip()
+
+
+def test_empty_input_writes_empty_index():
+    with tempfile.TemporaryDirectory() as tmp:
+        src = pathlib.Path(tmp) / "empty.md"
+        src.write_text("", encoding="utf-8")
+        out = pathlib.Path(tmp) / "chunks"
+        index = chunk_markdown_file(str(src), str(out), min_chars=0)
+        assert (out / "index.json").read_text(encoding="utf-8") == json.dumps(index, indent=2)
+
+
+def test_chunk_directory_jsonl_parallel_matches_serial_and_shards():
+    from md_chunker import chunk_directory
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = pathlib.Path(tmp) / "docs"
+        (src / "sub").mkdir(parents=True)
+        for i in range(5):
+            target = src / ("sub" if i % 2 else "") / f"doc{i}.md"
+            target.write_text(f"# 제목 {i}\n\n" + SAMPLE, encoding="utf-8")
+
+        serial = chunk_directory(str(src), str(pathlib.Path(tmp) / "serial.jsonl"), min_chars=0)
+        parallel = chunk_directory(str(src), str(pathlib.Path(tmp) / "par.jsonl"), workers=2, min_chars=0)
+        assert serial["docs"] == 5 and not serial["failed"]
+        assert pathlib.Path(serial["files"][0]).read_bytes() == pathlib.Path(parallel["files"][0]).read_bytes()
+
+        records = [json.loads(l) for l in pathlib.Path(serial["files"][0]).read_text(encoding="utf-8").splitlines()]
+        assert len(records) == serial["chunks"]
+        assert set(records[0]) == {"doc", "heading", "text", "chars", "offset"}
+        assert records[0]["doc"] == "doc0.md" and any(r["doc"] == "sub/doc1.md" for r in records)
+        # offsets point at the section's heading line in the source file
+        raw = (src / "doc0.md").read_bytes()
+        second = [r for r in records if r["doc"] == "doc0.md"][1]
+        assert raw[second["offset"]:].startswith(b"# First")
+
+        sharded = chunk_directory(str(src), str(pathlib.Path(tmp) / "out" / "chunks.jsonl"), shard_size=4, min_chars=0)
+        names = [pathlib.Path(p).name for p in sharded["files"]]
+        assert names[0] == "chunks-00000.jsonl" and len(names) == -(-serial["chunks"] // 4)
+        lines = [l for p in sharded["files"] for l in pathlib.Path(p).read_text(encoding="utf-8").splitlines()]
+        assert [json.loads(l) for l in lines] == records
+
+        # a smaller rerun replaces earlier shards and the unsharded file instead of leaving them behind
+        out = pathlib.Path(tmp) / "out"
+        (out / "chunks.jsonl").write_text("{}\n", encoding="utf-8")
+        (out / "chunks-keep.jsonl").write_text("{}\n", encoding="utf-8")
+        rerun = chunk_directory(str(src), str(out / "chunks.jsonl"), shard_size=10**6, min_chars=0)
+        assert sorted(p.name for p in out.iterdir()) == ["chunks-00000.jsonl", "chunks-keep.jsonl"]
+        assert rerun["files"] == [str(out / "chunks-00000.jsonl")]
+
+
+TREE_SAMPLE = """intro text
+
+# Chapter 1
+c1 body
+
+## Section A
+a body
+
+```
+# not a heading
+```
+
+### Sub x
+x body
+
+## Section B
+b body
+
+# Chapter 2 ##
+c2
+"""
+
+
+def test_section_tree_offsets_paths_and_levels():
+    from md_chunker import SectionTree
+
+    tree = SectionTree.from_text(TREE_SAMPLE)
+    sections = list(tree.iter_sections())
+    assert [s.path for s in sections] == [
+        "Chapter 1",
+        "Chapter 1 > Section A",
+        "Chapter 1 > Section A > Sub x",
+        "Chapter 1 > Section B",
+        "Chapter 2",
+    ]
+    raw = TREE_SAMPLE.encode("utf-8")
+    assert all(raw[s.start:].startswith(b"#") for s in sections)
+    assert raw[sections[1].start:sections[1].end].decode().rstrip().endswith("x body")
+
+    # the same tree answers any level without re-parsing
+    assert [c["path"] for c in tree.chunks(level=1)] == ["", "Chapter 1", "Chapter 2"]
+    level2 = list(tree.chunks(level=2))
+    assert [c["path"] for c in level2] == ["", "Chapter 1", "Chapter 1 > Section A", "Chapter 1 > Section B", "Chapter 2"]
+    assert "### Sub x" in level2[2]["text"]
+    assert "".join(c["text"] for c in tree.chunks(level=3)).count("x body") == 1
+
+
+def test_section_tree_size_budget_descends_hierarchy():
+    from md_chunker import SectionTree
+
+    tree = SectionTree.from_text(TREE_SAMPLE)
+    whole = list(tree.chunks(level=1, max_chars=1000))
+    assert [c["path"] for c in whole] == ["", "Chapter 1", "Chapter 2"]
+    small = list(tree.chunks(level=1, max_chars=30))
+    assert "Chapter 1 > Section A > Sub x" in [c["path"] for c in small]
+    assert all(len(c["text"]) <= 30 + len("## Section A\n\n") for c in small)
+
+
+def test_section_tree_does_not_read_oversized_sections_whole():
+    from md_chunker import SectionTree
+
+    text = "".join(f"# Chapter {i}\n\n" + ("본문 " * 100 + "\n\n") * 3 for i in range(20))
+    tree = SectionTree.from_text(text)
+    spans = []
+    real_reader = tree._reader
+
+    def recording_reader(fh):
+        read = real_reader(fh)
+
+        def record(start, end):
+            spans.append(end - start)
+            return read(start, end)
+
+        return record
+
+    tree._reader = recording_reader
+    chunks = list(tree.chunks(max_chars=2000))
+    assert [c["heading"] for c in chunks] == [f"Chapter {i}" for i in range(20)]
+    # only one chapter at a time is read, never the whole document
+    assert max(spans) < len(text.encode("utf-8")) / 10
+
+
+def test_chunk_markdown_file_with_tree_writes_paths():
+    from md_chunker import SectionTree
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = pathlib.Path(tmp) / "doc.md"
+        src.write_text(TREE_SAMPLE, encoding="utf-8")
+        tree = SectionTree.from_file(str(src))
+        index = chunk_markdown_file(str(src), str(pathlib.Path(tmp) / "l2"), level=2, min_chars=0, tree=tree)
+        assert [e["path"] for e in index][2] == "Chapter 1 > Section A"
+        again = chunk_markdown_file(str(src), str(pathlib.Path(tmp) / "l1"), level=1, min_chars=0, tree=tree)
+        assert [e["heading"] for e in again] == ["", "Chapter 1", "Chapter 2"]
@@ -0,0 +1,461 @@
+import json
+import os
+import pathlib
+import random
+import tempfile
+from types import SimpleNamespace
+
+import pytest
+
+import rag_embedding
+
+
+class FakeEmbeddings:
+    """Stand-in for client.embeddings: embedding = [len(text)], data returned shuffled."""
+
+    def __init__(self, fail_on=()):
+        self.calls = []
+        self.fail_on = set(fail_on)  # call numbers (1-based) that raise
+
+    def create(self, model, input):
+        self.calls.append(list(input))
+        if len(self.calls) in self.fail_on:
+            raise RuntimeError("rate limited")
+        data = [SimpleNamespace(index=i, embedding=[float(len(t))]) for i, t in enumerate(input)]
+        random.Random(len(self.calls)).shuffle(data)
+        return SimpleNamespace(data=data)
+
+
+@pytest.fixture
+def fake_api(monkeypatch):
+    def install(fail_on=()):
+        embeddings = FakeEmbeddings(fail_on)
+        monkeypatch.setattr(rag_embedding, "client", SimpleNamespace(embeddings=embeddings))
+        monkeypatch.setattr(rag_embedding.time, "sleep", lambda s: None)
+        coll = FakeCollection()
+        monkeypatch.setattr(rag_embedding, "collection", coll)
+        return embeddings, coll
+
+    return install
+
+
+class FakeCollection:
+    def __init__(self):
+        self.rows = {}
+        self.upserts = []
+
+    def upsert(self, embeddings, documents, metadatas, ids):
+        self.upserts.append(list(ids))
+        for emb, doc, meta, id_ in zip(embeddings, documents, metadatas, ids):
+            self.rows[id_] = (emb, doc, meta)
+
+    def get(self, where, include=None):
+        return {"ids": [i for i, (_, _, meta) in self.rows.items() if all(meta.get(k) == v for k, v in where.items())]}
+
+    def delete(self, ids=None, where=None):
+        if where is not None:
+            ids = [i for i, (_, _, meta) in self.rows.items() if all(meta.get(k) == v for k, v in where.items())]
+        for id_ in ids:
+            self.rows.pop(id_, None)
+
+
+def test_process_jsonl_chunks_reads_chunk_stream(fake_api):
+    _, coll = fake_api()
+
+    records = [
+        {"doc": "a.md", "heading": "A", "text": "alpha", "chars": 5, "offset": 0},
+        {"doc": "a.md", "heading": "B", "text": "beta!", "chars": 5, "offset": 10},
+        {"doc": "sub/b.md", "heading": "", "text": "gamma", "chars": 5, "offset": 0},
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        shards = pathlib.Path(tmp)
+        for i, chunk in enumerate([records[:2], records[2:]]):
+            (shards / f"chunks-{i:05d}.jsonl").write_text(
+                "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in chunk), encoding="utf-8"
+            )
+        total = rag_embedding.process_jsonl_chunks(str(shards))
+
+    assert total == 3
+    assert sorted(coll.rows) == ["a.md_0", "a.md_1", "sub/b.md_0"]
+    _, doc, meta = coll.rows["a.md_1"]
+    assert doc == "beta!"
+    assert meta["heading"] == "B" and meta["offset"] == 10
+    assert meta["chunk_index"] == 1 and meta["total_chunks"] == 2 and meta["source_path"] == "a.md"
+
+
+def write_md_tree(root, docs):
+    for rel, text in docs.items():
+        path = pathlib.Path(root) / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding="utf-8")
+
+
+def test_process_md_files_batches_across_files_in_order(fake_api, monkeypatch):
+    embeddings, coll = fake_api()
+    monkeypatch.setattr(rag_embedding, "EMBED_BATCH_SIZE", 4)
+    with tempfile.TemporaryDirectory() as tmp:
+        write_md_tree(tmp, {f"d{i}.md": "가" * (100 + i) for i in range(7)})
+        total = rag_embedding.process_md_files(tmp)
+
+    assert total == 7
+    # 7 single-chunk files -> 2 requests instead of 7
+    assert [len(c) for c in embeddings.calls] == [4, 3]
+    for emb, doc, _ in coll.rows.values():
+        assert emb == [float(len(doc))]
+
+
+def test_batches_respect_token_limit():
+    records = [{"document": "x" * n} for n in (40, 40, 40, 90, 10)]
+    batches = list(rag_embedding.iter_embedding_batches(records, max_items=10, max_tokens=100))
+    assert [[len(r["document"]) for r in b] for b in batches] == [[40, 40], [40], [90, 10]]
+
+
+def test_only_failed_batch_is_retried_or_dropped(fake_api, monkeypatch):
+    # call 2 fails once and is retried; with max_retries=0 a failing batch is dropped alone
+    embeddings, coll = fake_api(fail_on={2})
+    records = [{"id": str(i), "document": "t" * (i + 1), "metadata": {"source_path": "a.md"}} for i in range(6)]
+    stored, failed = rag_embedding.embed_and_store(iter(records), max_items=2)
+    assert (stored, failed) == (6, 0)
+    assert embeddings.calls[1] == embeddings.calls[2] and len(embeddings.calls) == 4
+
+    embeddings, coll = fake_api(fail_on={2})
+    monkeypatch.setattr(rag_embedding, "EMBED_MAX_RETRIES", 0)
+    stored, failed = rag_embedding.embed_and_store(iter(records), max_items=2)
+    assert (stored, failed) == (4, 2)
+    assert sorted(coll.rows) == ["0", "1", "4", "5"]
+
+
+def test_chroma_writer_flushes_on_file_boundary_and_memory_limit():
+    coll = FakeCollection()
+    records = [
+        {"id": f"{src}_{i}", "document": "x" * 10, "metadata": {"source_path": src}}
+        for src, n in (("a.md", 3), ("b.md", 2), ("c.md", 1))
+        for i in range(n)
+    ]
+    with rag_embedding.ChromaWriter(coll, batch_size=2) as writer:
+        for r in records:
+            writer.write(r, [0.0])
+    # batch size reached inside a.md -> flushed only when b.md starts, in upserts of at most batch_size rows
+    assert coll.upserts == [["a.md_0", "a.md_1"], ["a.md_2"], ["b.md_0", "b.md_1"], ["c.md_0"]]
+
+    coll = FakeCollection()
+    writer = rag_embedding.ChromaWriter(coll, batch_size=100, max_bytes=50)
+    for r in records[:3]:
+        writer.write(r, [0.0])
+    writer.close()
+    assert [len(u) for u in coll.upserts] == [2, 1]
+
+
+def test_chroma_writer_caps_upsert_size_and_does_not_mask_errors(monkeypatch):
+    monkeypatch.setattr(rag_embedding, "_chroma_max_batch_size", lambda: 3)
+    coll = FakeCollection()
+    with rag_embedding.ChromaWriter(coll, batch_size=100) as writer:
+        for i in range(7):
+            writer.write({"id": f"big_{i}", "document": "x", "metadata": {"source_path": "big.md"}}, [0.0])
+    assert [len(u) for u in coll.upserts] == [3, 3, 1]
+
+    class Failing(FakeCollection):
+        def upsert(self, **kwargs):
+            raise RuntimeError("batch too large")
+
+    with pytest.raises(RuntimeError, match="batch too large"):
+        with rag_embedding.ChromaWriter(Failing(), batch_size=1) as writer:
+            writer.write({"id": "a_0", "document": "x", "metadata": {"source_path": "a.md"}}, [0.0])
+            writer.write({"id": "b_0", "document": "x", "metadata": {"source_path": "b.md"}}, [0.0])
+    assert writer._buffer == []
+
+
+def test_rerun_upserts_instead_of_failing_on_duplicate_ids(fake_api):
+    _, coll = fake_api()
+    with tempfile.TemporaryDirectory() as tmp:
+        write_md_tree(tmp, {"a.md": "hello", "b.md": "world"})
+        assert rag_embedding.process_md_files(tmp) == 2
+        assert rag_embedding.process_md_files(tmp) == 2
+    assert len(coll.rows) == 2
+    # one upsert per run rather than one write per chunk
+    assert len(coll.upserts) == 2
+
+
+class FakeAsyncEmbeddings:
+    """Async stand-in for AsyncOpenAI.embeddings with fixed latency and in-flight tracking."""
+
+    def __init__(self, latency=0.02):
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = 0
+
+    async def create(self, model, input):
+        import asyncio
+
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+        return SimpleNamespace(data=[SimpleNamespace(index=i, embedding=[float(len(t))]) for i, t in enumerate(input)])
+
+
+def make_records(n_files, per_file):
+    return [
+        {"id": f"f{f}_{i}", "document": f"doc {f} chunk {i}", "metadata": {"source_path": f"f{f}.md"}}
+        for f in range(n_files)
+        for i in range(per_file)
+    ]
+
+
+def test_pipeline_runs_requests_concurrently_with_bounded_in_flight():
+    import asyncio
+
+    embeddings = FakeAsyncEmbeddings()
+    coll = FakeCollection()
+    records = make_records(10, 8)
+    stats = asyncio.run(
+        rag_embedding.run_embedding_pipeline(
+            iter(records),
+            aclient=SimpleNamespace(embeddings=embeddings),
+            concurrency=4,
+            rpm=0,
+            tpm=0,
+            max_items=5,
+            writer=rag_embedding.ChromaWriter(coll, batch_size=20),
+            queue_size=2,
+        )
+    )
+    assert stats["stored"] == 80 and stats["failed"] == 0 and stats["requests"] == 16
+    assert 1 < embeddings.max_in_flight <= 4
+    assert sorted(coll.rows) == sorted(r["id"] for r in records)
+    for emb, doc, _ in coll.rows.values():
+        assert emb == [float(len(doc))]
+
+
+def test_pipeline_propagates_reader_errors():
+    import asyncio
+
+    def broken():
+        yield from make_records(1, 3)
+        raise OSError("disk gone")
+
+    with pytest.raises(OSError):
+        asyncio.run(
+            rag_embedding.run_embedding_pipeline(
+                broken(),
+                aclient=SimpleNamespace(embeddings=FakeAsyncEmbeddings(0)),
+                concurrency=2,
+                writer=rag_embedding.ChromaWriter(FakeCollection()),
+            )
+        )
+
+
+def test_pipeline_charges_tpm_with_realistic_token_estimate(monkeypatch):
+    import asyncio
+
+    charged = []
+
+    class RecordingBucket(rag_embedding.TokenBucket):
+        async def acquire(self, amount=1):
+            charged.append((self.capacity, amount))
+
+    monkeypatch.setattr(rag_embedding, "TokenBucket", RecordingBucket)
+    records = [{"id": "k_0", "document": "가" * 100, "metadata": {"source_path": "k.md"}}]  # 300 UTF-8 bytes
+    asyncio.run(
+        rag_embedding.run_embedding_pipeline(
+            records, aclient=SimpleNamespace(embeddings=FakeAsyncEmbeddings(0)), concurrency=1, rpm=10, tpm=1000,
+            writer=rag_embedding.ChromaWriter(FakeCollection()), cache=False,
+        )
+    )
+    # one token per Hangul syllable, not bytes / 4 (75) which undercharges Korean text
+    assert (1000, 100) in charged
+    assert rag_embedding.rate_limit_tokens("x" * 40) == 10
+
+
+def test_rate_limit_tokens_uses_counter_when_available():
+    counter = SimpleNamespace(count=lambda text: 123)
+    assert rag_embedding.rate_limit_tokens("안녕하세요", counter) == 123
+
+
+def test_token_bucket_waits_for_refill(monkeypatch):
+    import asyncio
+
+    now = [0.0]
+    waits = []
+
+    async def fake_sleep(seconds):
+        waits.append(seconds)
+        now[0] += seconds
+
+    bucket = rag_embedding.TokenBucket(60, clock=lambda: now[0])  # 1 token / second
+    monkeypatch.setattr(rag_embedding.asyncio, "sleep", fake_sleep)
+
+    async def run():
+        await bucket.acquire(60)  # starts full
+        await bucket.acquire(3)
+        await bucket.acquire(500)  # larger than the bucket: waits for a full bucket, not forever
+
+    asyncio.run(run())
+    assert waits == [pytest.approx(3.0), pytest.approx(60.0)]
+
+
+def test_embedding_cache_skips_api_for_unchanged_chunks(fake_api):
+    embeddings, coll = fake_api()
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = rag_embedding.EmbeddingCache(str(pathlib.Path(tmp) / "cache.sqlite"))
+        records = make_records(2, 3)
+        assert rag_embedding.embed_and_store(iter(records), cache=cache) == (6, 0)
+        assert len(embeddings.calls) == 1 and cache.hits == 0
+
+        # one chunk edited: only that text goes to the API
+        records[4] = {**records[4], "document": "edited text"}
+        assert rag_embedding.embed_and_store(iter(records), cache=cache) == (6, 0)
+        assert embeddings.calls[-1] == ["edited text"]
+        assert (cache.hits, cache.misses) == (5, 7)
+        assert coll.rows["f1_1"][0] == [float(len("edited text"))]
+
+        # persisted across instances, keyed by model
+        cache.close()
+        reopened = rag_embedding.EmbeddingCache(str(pathlib.Path(tmp) / "cache.sqlite"))
+        assert reopened.get_many(rag_embedding.EMBEDDING_MODEL, ["edited text"]) == [[float(len("edited text"))]]
+        assert reopened.get_many("other-model", ["edited text"]) == [None]
+        reopened.close()
+
+
+def test_default_embedding_cache_is_created_on_first_use(monkeypatch, tmp_path):
+    path = tmp_path / "cache.sqlite"
+    monkeypatch.setattr(rag_embedding, "EMBED_CACHE_PATH", str(path))
+    monkeypatch.setattr(rag_embedding, "embedding_cache", None)
+    assert not path.exists()
+    cache = rag_embedding.get_embedding_cache()
+    assert path.exists() and rag_embedding.get_embedding_cache() is cache
+    cache.close()
+
+
+def test_embedding_cache_evicts_least_recently_used():
+    with tempfile.TemporaryDirectory() as tmp:
+        # each 4-dim float32 vector is 16 bytes; room for 3
+        cache = rag_embedding.EmbeddingCache(str(pathlib.Path(tmp) / "c.sqlite"), max_bytes=48)
+        for t in ("a", "b", "c"):
+            cache.put_many("m", [t], [[1.0, 2.0, 3.0, 4.0]])
+        cache.get_many("m", ["a"])  # touch "a" so "b" is the oldest
+        cache.put_many("m", ["d"], [[0.5] * 4])
+        assert cache.count() <= 3
+        got = cache.get_many("m", ["a", "b", "d"])
+        assert got[0] == [1.0, 2.0, 3.0, 4.0] and got[1] is None and got[2] == [0.5] * 4
+        cache.close()
+
+
+def test_pipeline_uses_cache_before_requests():
+    import asyncio
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = rag_embedding.EmbeddingCache(str(pathlib.Path(tmp) / "cache.sqlite"))
+        records = make_records(4, 5)
+        runs = []
+        for _ in range(2):
+            embeddings = FakeAsyncEmbeddings(0)
+            stats = asyncio.run(
+                rag_embedding.run_embedding_pipeline(
+                    iter(records),
+                    aclient=SimpleNamespace(embeddings=embeddings),
+                    concurrency=2,
+                    max_items=4,
+                    writer=rag_embedding.ChromaWriter(FakeCollection()),
+                    cache=cache,
+                )
+            )
+            runs.append((stats["stored"], stats["requests"], stats["cache_hits"]))
+        cache.close()
+    assert runs == [(20, 5, 0), (20, 0, 20)]
+
+
+def test_incremental_index_reembeds_only_changes_and_deletes_stale(fake_api):
+    embeddings, coll = fake_api()
+    with tempfile.TemporaryDirectory() as tmp:
+        root = pathlib.Path(tmp) / "docs"
+        manifest = str(pathlib.Path(tmp) / "manifest.json")
+        write_md_tree(root, {"a/readme.md": "A" * 900, "b/readme.md": "B" * 1500, "c.md": "C" * 300})
+
+        first = rag_embedding.index_md_files(str(root), manifest_path=manifest)
+        assert first["changed"] == 3 and first["deleted"] == 0
+        ids = set(coll.rows)
+        # same basename in two folders no longer collides
+        assert {i.split(":", 1)[1].split("#")[0] for i in ids} == {"a/readme.md", "b/readme.md", "c.md"}
+        calls = len(embeddings.calls)
+
+        again = rag_embedding.index_md_files(str(root), manifest_path=manifest)
+        assert (again["changed"], again["unchanged"], again["stored"]) == (0, 3, 0)
+        assert len(embeddings.calls) == calls and set(coll.rows) == ids
+
+        # shorten b (drops a chunk), delete c
+        (root / "b/readme.md").write_text("B" * 700, encoding="utf-8")
+        (root / "c.md").unlink()
+        third = rag_embedding.index_md_files(str(root), manifest_path=manifest)
+        assert (third["changed"], third["removed"]) == (1, 1)
+        assert not any(":c.md#" in i for i in coll.rows)
+        b_ids = sorted(i for i in coll.rows if ":b/readme.md#" in i)
+        assert len(b_ids) == 1
+        assert coll.rows[b_ids[0]][2]["total_chunks"] == 1
+        saved = json.loads(pathlib.Path(manifest).read_text(encoding="utf-8"))
+        assert sorted(saved["roots"][os.path.abspath(root)]) == ["a/readme.md", "b/readme.md"]
+
+
+def test_incremental_index_retries_files_whose_embedding_failed(fake_api, monkeypatch):
+    embeddings, coll = fake_api(fail_on={1})
+    monkeypatch.setattr(rag_embedding, "EMBED_MAX_RETRIES", 0)
+    with tempfile.TemporaryDirectory() as tmp:
+        root = pathlib.Path(tmp) / "docs"
+        manifest = str(pathlib.Path(tmp) / "manifest.json")
+        write_md_tree(root, {"x.md": "hello"})
+        assert rag_embedding.index_md_files(str(root), manifest_path=manifest)["failed"] == 1
+        assert rag_embedding.index_md_files(str(root), manifest_path=manifest)["stored"] == 1
+        assert rag_embedding.index_md_files(str(root), manifest_path=manifest)["changed"] == 0
+
+
+def test_content_chunk_ids_are_stable_and_unique():
+    ids = rag_embedding.content_chunk_ids("d/x.md", ["p", "q", "p"])
+    assert len(set(ids)) == 3 and ids[2] == ids[0] + "~1"
+    assert rag_embedding.content_chunk_ids("d/x.md", ["new", "q"])[1] == ids[1]
+
+
+def test_process_md_files_uses_path_qualified_ids(fake_api):
+    _, coll = fake_api()
+    with tempfile.TemporaryDirectory() as tmp:
+        write_md_tree(tmp, {"a/readme.md": "alpha", "b/readme.md": "beta"})
+        assert rag_embedding.process_md_files(tmp) == 2
+        assert len(coll.rows) == 2
+        # a changed file replaces its vectors instead of keeping the old content
+        write_md_tree(tmp, {"a/readme.md": "alpha v2"})
+        rag_embedding.process_md_files(tmp)
+    assert sorted(doc for _, doc, _ in coll.rows.values()) == ["alpha v2", "beta"]
+
+
+def test_process_md_files_keeps_old_vectors_when_embedding_fails(fake_api, monkeypatch):
+    embeddings, coll = fake_api()
+    monkeypatch.setattr(rag_embedding, "EMBED_MAX_RETRIES", 0)
+    with tempfile.TemporaryDirectory() as tmp:
+        write_md_tree(tmp, {"a.md": "alpha"})
+        rag_embedding.process_md_files(tmp)
+        before = dict(coll.rows)
+        write_md_tree(tmp, {"a.md": "alpha v2"})
+        embeddings.fail_on = {len(embeddings.calls) + 1}
+        rag_embedding.process_md_files(tmp)
+    assert coll.rows == before
+
+
+def test_incremental_index_replaces_vectors_from_full_runs_and_keeps_roots_apart(fake_api):
+    _, coll = fake_api()
+    with tempfile.TemporaryDirectory() as tmp:
+        manifest = str(pathlib.Path(tmp) / "manifest.json")
+        one, two = pathlib.Path(tmp) / "one", pathlib.Path(tmp) / "two"
+        write_md_tree(one, {"readme.md": "first root"})
+        write_md_tree(two, {"readme.md": "second root"})
+
+        coll.rows["readme.md_0"] = ([0.0], "first root", {"source_path": f"{one}/readme.md"})  # legacy id
+        rag_embedding.index_md_files(str(one), manifest_path=manifest)
+        rag_embedding.index_md_files(str(two), manifest_path=manifest)
+        assert sorted(doc for _, doc, _ in coll.rows.values()) == ["first root", "second root"]
+
+        (two / "readme.md").write_text("second root v2", encoding="utf-8")
+        rag_embedding.index_md_files(str(two), manifest_path=manifest)
+    assert sorted(doc for _, doc, _ in coll.rows.values()) == ["first root", "second root v2"]
@@ -0,0 +1,247 @@
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+
+import rag_server
+from conftest import make_openai_stub, stub_openai_client
+
+
+class FakeCollection:
+    """Chroma stand-in whose query blocks its thread, like a real on-disk search."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.queries = 0
+        self.docs = ["문서 A 내용", "문서 B 내용"]
+
+    def query(self, query_embeddings, n_results):
+        self.queries += 1
+        time.sleep(self.delay)
+        docs = self.docs[:n_results]
+        return {
+            "ids": [[f"id{i}" for i in range(len(docs))]],
+            "documents": [docs],
+            "metadatas": [[{"source": "s", "filename": "f.md", "chunk_index": i} for i in range(len(docs))]],
+            "distances": [[0.1] * len(docs)],
+        }
+
+    def count(self):
+        return len(self.docs)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    # ASGITransport does not run the lifespan, so install what it would create
+    executor = ThreadPoolExecutor(max_workers=8)
+
+    def install(latency=0.0, chroma_delay=0.0, **stub_kwargs):
+        stub = make_openai_stub(latency=latency, **stub_kwargs)
+        monkeypatch.setattr(rag_server.app.state, "openai_client", stub_openai_client(stub), raising=False)
+        monkeypatch.setattr(rag_server.app.state, "chroma_executor", executor, raising=False)
+        coll = FakeCollection(chroma_delay)
+        monkeypatch.setattr(rag_server, "collection", coll)
+        # fresh caches per test
+        monkeypatch.setattr(rag_server, "query_embedding_cache", rag_server.TTLCache(100, 60))
+        monkeypatch.setattr(rag_server, "search_result_cache", rag_server.TTLCache(100, 60))
+        # stub vectors are hash-derived; a tight threshold keeps unrelated questions apart
+        monkeypatch.setattr(rag_server, "answer_cache", rag_server.AnswerCache(100, 0.999, 60))
+        monkeypatch.setattr(rag_server, "_collection_state", {"version": None, "checked": 0.0, "invalidations": 0})
+        monkeypatch.setattr(rag_server, "COLLECTION_CHECK_INTERVAL", 0)
+        return stub, coll
+
+    yield install
+    executor.shutdown()
+
+
+async def post_many(path, payloads):
+    transport = httpx.ASGITransport(app=rag_server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        return await asyncio.gather(*(http.post(path, json=p) for p in payloads))
+
+
+async def get(path):
+    transport = httpx.ASGITransport(app=rag_server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        return await http.get(path)
+
+
+def test_query_requests_overlap_instead_of_serialising(server):
+    stub, coll = server(latency=0.2, chroma_delay=0.1)
+    n = 6
+    started = time.perf_counter()
+    responses = asyncio.run(post_many("/query", [{"question": f"질문 {i}"} for i in range(n)]))
+    elapsed = time.perf_counter() - started
+
+    assert [r.status_code for r in responses] == [200] * n
+    assert responses[0].json()["answer"] == "stub answer"
+    # one request costs ~0.5s (embed 0.2 + chroma 0.1 + chat 0.2); serialised would be ~3s
+    assert elapsed < 1.5
+    assert stub.state.max_in_flight > 1
+    assert coll.queries == n
+
+
+def test_search_and_health_use_async_paths(server):
+    server()
+    search, = asyncio.run(post_many("/search", [{"question": "q", "n_results": 1}]))
+    assert search.status_code == 200 and search.json()["total"] == 1
+    assert asyncio.run(get("/health")).json() == {"status": "healthy", "documents_count": 2}
+
+
+def test_repeated_questions_hit_embedding_and_search_caches(server):
+    stub, coll = server()
+    questions = ["환불 정책이 뭔가요?", "  환불   정책이 뭔가요? ", "환불 정책이 뭔가요?"]
+    for q in questions:
+        (r,) = asyncio.run(post_many("/search", [{"question": q}]))
+        assert r.status_code == 200
+    assert stub.state.calls["embeddings"] == 1
+    assert coll.queries == 1
+
+    # a different n_results is a different search, but reuses the embedding
+    asyncio.run(post_many("/search", [{"question": questions[0], "n_results": 1}]))
+    assert stub.state.calls["embeddings"] == 1 and coll.queries == 2
+
+    m = asyncio.run(get("/metrics")).json()
+    assert m["query_embedding_cache"]["hits"] == 3 and m["query_embedding_cache"]["misses"] == 1
+    assert m["search_result_cache"]["hits"] == 2 and m["search_result_cache"]["misses"] == 2
+
+
+def test_search_cache_invalidated_when_collection_changes(server):
+    _, coll = server()
+    asyncio.run(post_many("/search", [{"question": "q"}]))
+    asyncio.run(post_many("/search", [{"question": "q"}]))
+    assert coll.queries == 1
+    coll.docs.append("새 문서")  # count changes
+    asyncio.run(post_many("/search", [{"question": "q"}]))
+    assert coll.queries == 2
+    assert asyncio.run(get("/metrics")).json()["search_result_cache"]["invalidations"] == 1
+
+
+def test_ttl_cache_expires_and_evicts_lru():
+    now = [0.0]
+    cache = rag_server.TTLCache(2, ttl=10, clock=lambda: now[0])
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)  # evicts "b", the least recently used
+    assert cache.get("b") is None and cache.get("c") == 3
+    now[0] = 11
+    assert cache.get("a") is None
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 2
+
+
+def test_similar_question_reuses_cached_answer(server):
+    stub, _ = server()
+    first, = asyncio.run(post_many("/query", [{"question": "환불 정책이 뭔가요?"}]))
+    again, = asyncio.run(post_many("/query", [{"question": "  환불   정책이 뭔가요? "}]))
+    assert first.json()["cached"] is False
+    assert again.json()["cached"] is True and again.json()["answer"] == first.json()["answer"]
+    assert stub.state.calls["chat"] == 1
+
+    # another model must not reuse the answer
+    other, = asyncio.run(post_many("/query", [{"question": "환불 정책이 뭔가요?", "model": "gpt-4o"}]))
+    assert other.json()["cached"] is False
+    assert stub.state.calls["chat"] == 2
+    assert asyncio.run(get("/metrics")).json()["answer_cache"]["hits"] == 1
+
+
+def test_answer_cache_matches_on_similarity_sources_and_model():
+    now = [0.0]
+    cache = rag_server.AnswerCache(2, threshold=0.95, ttl=10, clock=lambda: now[0])
+    cache.put([1.0, 0.0, 0.0], ["id0", "id1"], "m", "답변 1")
+    assert cache.get([0.99, 0.05, 0.0], ["id0", "id1"], "m") == "답변 1"
+    assert cache.get([0.5, 0.5, 0.0], ["id0", "id1"], "m") is None  # not similar enough
+    assert cache.get([1.0, 0.0, 0.0], ["id0", "id2"], "m") is None  # different sources
+    assert cache.get([1.0, 0.0, 0.0], ["id0", "id1"], "m2") is None  # different model
+
+    cache.put([0.0, 1.0, 0.0], ["id0"], "m", "답변 2")
+    cache.get([1.0, 0.0, 0.0], ["id0", "id1"], "m")  # touch 답변 1
+    cache.put([0.0, 0.0, 1.0], ["id0"], "m", "답변 3")  # evicts 답변 2
+    assert cache.get([0.0, 1.0, 0.0], ["id0"], "m") is None
+    now[0] = 11
+    assert cache.get([1.0, 0.0, 0.0], ["id0", "id1"], "m") is None
+    assert cache.stats()["size"] == 1
+
+
+def parse_sse(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_query_stream_sends_sources_then_tokens(server):
+    stub, _ = server(answer="환불은 7일 이내 가능합니다")
+    r, = asyncio.run(post_many("/query/stream", [{"question": "환불 정책?"}]))
+    assert r.status_code == 200 and r.headers["content-type"].startswith("text/event-stream")
+
+    events = parse_sse(r.text)
+    assert events[0][0] == "sources" and len(events[0][1]["sources"]) == 2
+    tokens = [data["text"] for name, data in events if name == "token"]
+    assert len(tokens) == 4 and "".join(tokens) == "환불은 7일 이내 가능합니다"
+    assert events[-1] == ("done", {"model_used": "gpt-4o-mini", "cached": False})
+
+    # the streamed answer feeds the answer cache like /query does
+    again, = asyncio.run(post_many("/query", [{"question": "환불 정책?"}]))
+    assert again.json()["cached"] is True and stub.state.calls["chat"] == 1
+
+
+def test_query_stream_sends_sources_before_llm_finishes(server):
+    server(latency=0.3)
+
+    async def first_event_delay():
+        started = time.perf_counter()
+        response = await rag_server.query_rag_stream(rag_server.QueryRequest(question="q"))
+        body = response.body_iterator
+        first = await body.__anext__()
+        delay = time.perf_counter() - started
+        rest = [chunk async for chunk in body]
+        return first, delay, time.perf_counter() - started, rest
+
+    first, delay, total, rest = asyncio.run(first_event_delay())
+    assert first.startswith("event: sources")
+    # sources only wait for retrieval (embedding, 0.3s); the answer also waits for the LLM
+    assert delay < 0.5 and total >= 0.6
+    assert rest[-1].startswith("event: done")
+
+
+def test_query_stream_returns_404_without_documents(server):
+    _, coll = server()
+    coll.docs = []
+    r, = asyncio.run(post_many("/query/stream", [{"question": "q"}]))
+    assert r.status_code == 404
+
+
+@pytest.mark.parametrize("path", ["/query", "/query/stream"])
+def test_query_embeds_question_once(server, path):
+    stub, _ = server()
+    asyncio.run(post_many(path, [{"question": "새 질문"}]))
+    assert stub.state.calls["embeddings"] == 1
+    m = asyncio.run(get("/metrics")).json()["query_embedding_cache"]
+    assert m["misses"] == 1 and m["hits"] == 0
+
+
+def test_answer_cache_cleared_when_collection_changes(server):
+    stub, coll = server()
+    asyncio.run(post_many("/query", [{"question": "q", "n_results": 2}]))
+    coll.docs[0] = "문서 A 새 내용"
+    coll.docs.append("새 문서")  # re-indexed: top-2 ids unchanged, content and count changed
+    r, = asyncio.run(post_many("/query", [{"question": "q", "n_results": 2}]))
+    assert r.json()["cached"] is False and stub.state.calls["chat"] == 2
+
+
+def test_lifespan_recreates_resources_on_every_startup():
+    async def startup_cycle():
+        async with rag_server.lifespan(rag_server.app):
+            state = rag_server.app.state
+            assert not state.http_client.is_closed
+            assert await rag_server.run_chroma(lambda: 42) == 42
+            return state.http_client
+
+    first = asyncio.run(startup_cycle())
+    second = asyncio.run(startup_cycle())  # e.g. a second TestClient(app) in the same process
+    assert first.is_closed and second.is_closed and first is not second
@@ -0,0 +1,62 @@
+import pathlib
+import tempfile
+
+import pytest
+
+from md_chunker import iter_chunks
+from token_counter import TokenCounter
+
+
+def build_tokenizer_file(path):
+    from tokenizers import Tokenizer, models, pre_tokenizers
+
+    words = ["[UNK]", "가나", "다라", "alpha", "beta", "#", "제목"]
+    tok = Tokenizer(models.WordLevel({w: i for i, w in enumerate(words)}, unk_token="[UNK]"))
+    tok.pre_tokenizer = pre_tokenizers.WhitespaceSplit()
+    tok.save(str(path))
+    return str(path)
+
+
+@pytest.fixture
+def counter():
+    with tempfile.TemporaryDirectory() as tmp:
+        yield TokenCounter.from_file(build_tokenizer_file(pathlib.Path(tmp) / "tokenizer.json"))
+
+
+def test_count_batch_is_cached(counter, monkeypatch):
+    calls = []
+    real = counter._encode_batch
+    monkeypatch.setattr(counter, "_encode_batch", lambda texts: calls.append(list(texts)) or real(texts))
+
+    assert counter.count_batch(["가나 다라", "alpha", "가나 다라"]) == [2, 1, 2]
+    assert counter.count_batch(["alpha", "beta beta beta"]) == [1, 3]
+    # duplicates and cached texts are never re-encoded; misses go out in one batch per call
+    assert calls == [["가나 다라", "alpha"], ["beta beta beta"]]
+
+
+def test_split_respects_token_budget_and_overlap(counter):
+    text = " ".join(["가나"] * 10)
+    pieces = counter.split(text, 4)
+    assert "".join(pieces) == text
+    assert [counter.count(p) for p in pieces] == [4, 4, 2]
+
+    overlapping = counter.split(text, 4, overlap=1)
+    assert [counter.count(p) for p in overlapping] == [4, 4, 4]
+
+
+def test_iter_chunks_max_tokens(counter):
+    body = "\n\n".join(["가나 다라 가나"] * 6)
+    md = "# 제목\n\n" + body + "\n"
+    chunks = list(iter_chunks(md.splitlines(keepends=True), max_tokens=8, counter=counter, min_chars=0))
+    assert len(chunks) > 1
+    # "# 제목" heading adds 2 tokens to each sub-chunk's body budget
+    assert all(counter.count(c["text"]) <= 8 + 2 for c in chunks)
+    assert all(c["text"].startswith("# 제목") for c in chunks)
+
+
+def test_rag_split_into_chunks_in_tokens(counter):
+    import rag_embedding
+
+    text = " ".join(["alpha"] * 25)
+    chunks = rag_embedding.split_into_chunks(text, 10, 2, counter=counter)
+    assert [counter.count(c) for c in chunks] == [10, 10, 9]
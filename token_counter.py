@@ -0,0 +1,116 @@
+"""
+Token counting helpers shared by md_chunker.py and rag_embedding.py.
+
+A TokenCounter wraps any HuggingFace `tokenizers` tokenizer (tokenizer.json or a
+WordPiece vocab.txt on local disk) and memoises per-text token counts so the same
+paragraph is never encoded twice. Counts for many texts are computed with a
+single encode_batch call.
+
+Usage:
+    counter = TokenCounter.from_file("tokenizer.json")
+    counter.count("안녕하세요")
+    counter.count_batch(["a", "b"])
+    counter.split("long text ...", max_tokens=512, overlap=64)
+"""
+
+import hashlib
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+
+def load_tokenizer(path: str):
+    """Load a tokenizer from a local tokenizer.json or a WordPiece vocab.txt file."""
+    from tokenizers import Tokenizer
+
+    if path.endswith(".json"):
+        return Tokenizer.from_file(path)
+
+    from tokenizers.implementations import BertWordPieceTokenizer
+
+    return BertWordPieceTokenizer(path, lowercase=False)
+
+
+class TokenCounter:
+    """Cached, batched token counter around a `tokenizers` tokenizer.
+
+    Special tokens ([CLS], [SEP], ...) are not counted, so counts add up across
+    concatenated pieces the same way character lengths do.
+    """
+
+    def __init__(self, tokenizer, cache_size: int = 100_000):
+        self.tokenizer = tokenizer
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[bytes, int]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_file(cls, path: str, cache_size: int = 100_000) -> "TokenCounter":
+        return cls(load_tokenizer(path), cache_size=cache_size)
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def _encode_batch(self, texts: Sequence[str]):
+        return self.tokenizer.encode_batch(list(texts), add_special_tokens=False)
+
+    def count_batch(self, texts: Iterable[str]) -> List[int]:
+        """Token counts for texts, in order; only cache misses are sent to the tokenizer (one batch)."""
+        texts = list(texts)
+        keys = [self._key(t) for t in texts]
+        counts: List[Optional[int]] = [None] * len(texts)
+        missing = {}
+        for i, key in enumerate(keys):
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                counts[i] = self._cache[key]
+                self.hits += 1
+            else:
+                missing.setdefault(key, []).append(i)
+
+        if missing:
+            self.misses += len(missing)
+            miss_keys = list(missing)
+            encodings = self._encode_batch([texts[missing[k][0]] for k in miss_keys])
+            for key, enc in zip(miss_keys, encodings):
+                n = len(enc.ids)
+                for i in missing[key]:
+                    counts[i] = n
+                self._cache[key] = n
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        return counts  # type: ignore[return-value]
+
+    def count(self, text: str) -> int:
+        return self.count_batch([text])[0]
+
+    def spans(self, text: str, max_tokens: int, overlap: int = 0) -> List[Tuple[int, int]]:
+        """Character (start, end) spans of consecutive windows of at most max_tokens tokens.
+
+        Windows overlap by `overlap` tokens. Spans follow token offsets, so
+        windows never cut a token in half.
+        """
+        if max_tokens <= 0:
+            raise ValueError("max_tokens must be positive")
+        if not 0 <= overlap < max_tokens:
+            raise ValueError("overlap must be in [0, max_tokens)")
+        offsets = [o for o in self._encode_batch([text])[0].offsets if o[1] > o[0]]
+        spans = []
+        start = 0
+        while start < len(offsets):
+            end = min(start + max_tokens, len(offsets))
+            # window starts right after the previous token so leading whitespace/joiners are kept
+            char_start = 0 if start == 0 else offsets[start - 1][1]
+            char_end = len(text) if end == len(offsets) else offsets[end - 1][1]
+            spans.append((char_start, char_end))
+            if end == len(offsets):
+                break
+            start = end - overlap
+        return spans
+
+    def split(self, text: str, max_tokens: int, overlap: int = 0) -> List[str]:
+        """Split text into pieces of at most max_tokens tokens (see spans)."""
+        return [text[s:e] for s, e in self.spans(text, max_tokens, overlap)]
+